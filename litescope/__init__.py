@@ -1,3 +1,4 @@
-from litescope.core import LiteScopeIO, LiteScopeAnalyzer
+from litescope.core import LiteScopeIO, LiteScopeTimestamp, LiteScopeAnalyzer, LiteScopeSniffer
 from litescope.software.driver.io import LiteScopeIODriver
-from litescope.software.driver.analyzer import LiteScopeAnalyzerDriver
+from litescope.software.driver.analyzer import LiteScopeAnalyzerDriver, LiteScopeMultiAnalyzerDriver
+from litescope.software.driver.streamer import LiteScopeStreamReceiver
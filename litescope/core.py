@@ -6,11 +6,13 @@
 # Copyright (c) 2016 Tim 'mithro' Ansell <mithro@mithis.com>
 # SPDX-License-Identifier: BSD-2-Clause
 
+import operator
+from functools import reduce
+
 from migen import *
-from migen.genlib.cdc import MultiReg, PulseSynchronizer
+from migen.genlib.cdc import MultiReg, PulseSynchronizer, GrayCounter, GrayDecoder
 
 from litex.gen import *
-from litex.gen.genlib.misc import WaitTimer
 
 from litex.build.tools import write_to_file
 
@@ -18,6 +20,7 @@ from litex.soc.interconnect.csr import *
 
 from litex.soc.cores.gpio   import GPIOInOut
 from litex.soc.interconnect import stream
+from litex.soc.interconnect import wishbone
 
 # LiteScope IO -------------------------------------------------------------------------------------
 
@@ -34,25 +37,133 @@ class LiteScopeIO(LiteXModule):
     def get_csrs(self):
         return self.gpio.get_csrs()
 
+# LiteScope Timestamp ------------------------------------------------------------------------------
+
+class LiteScopeTimestamp(LiteXModule):
+    # Global timestamp shared by analyzers in different clock domains: free-running Gray-coded counter
+    # (frequency: clock_domain frequency in Hz), resynchronized/decoded in each analyzer scope domain.
+    def __init__(self, frequency, clock_domain="sys", width=64):
+        self.frequency = int(frequency)
+        self.gray      = Signal(width)
+
+        # # #
+
+        self.counter = counter = ClockDomainsRenamer(clock_domain)(GrayCounter(width))
+        self.comb += [
+            counter.ce.eq(1),
+            self.gray.eq(counter.q),
+        ]
+
 # LiteScope Analyzer Constants/Layouts -------------------------------------------------------------
 
 def core_layout(data_width):
     return [("data", data_width), ("hit", 1)]
 
+# Delta encoding modes.
+DELTA_NONE = 0
+DELTA_XOR  = 1 # XOR with the previous sample (few toggling bits).
+DELTA_SUB  = 2 # Difference with the previous sample, modulo 2**data_width (counters, addresses).
+
+def trigger_fields(with_edges=False, with_range=False):
+    fields = ["mask", "value"]
+    if with_edges:
+        fields += ["rising", "falling", "change"]
+    if with_range:
+        fields += ["range_mask", "range_min", "range_max"]
+    return fields
+
+def trigger_match(data, data_d, condition):
+    # Level: (data & mask) == (value & mask).
+    m = (data & condition["mask"]) == (condition["value"] & condition["mask"])
+    # Edges vs previous sample (data_d): all rising/falling bits must rise/fall, any change bit must
+    # toggle (when change != 0).
+    if "rising" in condition:
+        m = m & (
+            ((~data_d & data & condition["rising"])  == condition["rising"]) &
+            ((data_d & ~data & condition["falling"]) == condition["falling"]) &
+            ((condition["change"] == 0) | (((data ^ data_d) & condition["change"]) != 0)))
+    # Range: unsigned magnitude compare of the masked field (a zero mask/min/max always matches).
+    if "range_mask" in condition:
+        field = data & condition["range_mask"]
+        m = m & (field >= condition["range_min"]) & (field <= condition["range_max"])
+    return m
+
+def trigger_match_terms(data, data_d, condition, chunk=32):
+    # Chunked partial results of trigger_match (for pipelined compares): the condition matches when
+    # all level terms match and, when any change term is set, when any toggle term is set.
+    level, change, toggle = [], [], []
+    for lo in range(0, len(data), chunk):
+        hi = min(lo + chunk, len(data))
+        c  = {name: value[lo:hi] for name, value in condition.items()}
+        d, d_d = data[lo:hi], data_d[lo:hi]
+        level.append((d & c["mask"]) == (c["value"] & c["mask"]))
+        if "rising" in c:
+            level.append(((~d_d & d & c["rising"])  == c["rising"]) &
+                         ((d_d & ~d & c["falling"]) == c["falling"]))
+            change.append(c["change"] != 0)
+            toggle.append(((d ^ d_d) & c["change"]) != 0)
+    if "range_mask" in condition:
+        # Magnitude compares are not split.
+        field = data & condition["range_mask"]
+        level.append((field >= condition["range_min"]) & (field <= condition["range_max"]))
+    return level, change, toggle
+
+def pipelined_reduce(module, ce, terms, op, stages):
+    # Reduce 1-bit terms with a registered tree (one tree level per stage, advancing on ce).
+    fanin = 2
+    while fanin**stages < len(terms):
+        fanin += 1
+    for stage in range(stages):
+        results = []
+        for i in range(0, len(terms), fanin):
+            result = Signal()
+            module.sync.scope += If(ce, result.eq(reduce(op, terms[i:i + fanin])))
+            results.append(result)
+        terms = results
+    return reduce(op, terms)
+
+def pipelined_delay(module, ce, signal, stages):
+    # Delay signal by stages registers (advancing on ce).
+    for stage in range(stages):
+        signal_d = Signal(len(signal))
+        module.sync.scope += If(ce, signal_d.eq(signal))
+        signal = signal_d
+    return signal
+
 # LiteScope Analyzer Trigger -----------------------------------------------------------------------
 
 class _Trigger(LiteXModule):
-    def __init__(self, data_width, depth=16):
-        self.sink   = sink   = stream.Endpoint(core_layout(data_width))
-        self.source = source = stream.Endpoint(core_layout(data_width))
+    def __init__(self, data_width, depth=16, with_retrigger=False, with_edges=False, with_range=False,
+        count_width=0, stages=0, lanes=1, with_compare=False):
+        assert (lanes == 1) or (stages == 0)
+        self.sink   = sink   = stream.Endpoint(core_layout(lanes*data_width))
+        self.source = source = stream.Endpoint(core_layout(lanes*data_width))
+
+        # Compared data (sink data, or a separate input aligned with sink with with_compare).
+        compare = sink.data
+        if with_compare:
+            self.compare = compare = Signal(lanes*data_width)
 
         self.enable = CSRStorage()
         self.done   = CSRStatus()
 
-        self.mem_write = CSR()
-        self.mem_mask  = CSRStorage(data_width)
-        self.mem_value = CSRStorage(data_width)
-        self.mem_full  = CSRStatus()
+        self.mem_write   = CSR()
+        self.mem_mask    = CSRStorage(data_width)
+        self.mem_value   = CSRStorage(data_width)
+        if with_edges:
+            self.mem_rising  = CSRStorage(data_width)
+            self.mem_falling = CSRStorage(data_width)
+            self.mem_change  = CSRStorage(data_width)
+        if with_range:
+            self.mem_range_mask = CSRStorage(data_width)
+            self.mem_range_min  = CSRStorage(data_width)
+            self.mem_range_max  = CSRStorage(data_width)
+        if count_width:
+            # Condition is consumed on its count-th occurrence (0/1: first occurrence).
+            self.mem_count = CSRStorage(count_width)
+        self.mem_full    = CSRStatus()
+        if lanes > 1:
+            self.lane = CSRStatus(bits_for(lanes - 1)) # Lane of the last condition hit.
 
         # # #
 
@@ -67,35 +178,328 @@ class _Trigger(LiteXModule):
         self.specials += MultiReg(done, self.done.status)
 
         # Memory and configuration.
-        mem = stream.AsyncFIFO([("mask", data_width), ("value", data_width)], depth)
-        mem = ClockDomainsRenamer({"write": "sys", "read": "scope"})(mem)
-        self.submodules += mem
+        # Conditions are written (while disabled) to a memory and walked with a read pointer: enabling
+        # rewinds the pointer and disabling clears the conditions, both in constant time.
+        fields = trigger_fields(with_edges, with_range)
+        layout = [(name, data_width) for name in fields]
+        if count_width:
+            layout += [("count", count_width)]
+        mem    = Memory(sum(width for _, width in layout), depth)
+        wrport = mem.get_port(write_capable=True)
+        rdport = mem.get_port(clock_domain="scope")
+        self.specials += mem, wrport, rdport
+
+        wr_count     = Signal(max=depth + 1)
+        sys_enable_d = Signal()
+        self.sync += [
+            sys_enable_d.eq(self.enable.storage),
+            If(~self.enable.storage & sys_enable_d,
+                wr_count.eq(0)
+            ).Elif(self.mem_write.wr_stb & (wr_count != depth),
+                wr_count.eq(wr_count + 1)
+            )
+        ]
         self.comb += [
-            mem.sink.valid.eq(self.mem_write.wr_stb),
-            mem.sink.mask.eq(self.mem_mask.storage),
-            mem.sink.value.eq(self.mem_value.storage),
-            self.mem_full.status.eq(~mem.sink.ready)
+            wrport.adr.eq(wr_count),
+            wrport.dat_w.eq(Cat(*[getattr(self, "mem_" + name).storage for name, _ in layout])),
+            wrport.we.eq(self.mem_write.wr_stb & (wr_count != depth)),
+            self.mem_full.status.eq(wr_count == depth),
         ]
 
-        # Hit and memory read/flush.
-        hit   = Signal()
-        flush = WaitTimer(2*depth)
-        flush = ClockDomainsRenamer("scope")(flush)
-        self.submodules += flush
+        # Current condition (read pointer rewound while disabled, count static once enabled).
+        count     = Signal(max=depth + 1)
+        rd_ptr    = Signal(max=depth + 1)
+        rd_next   = Signal(max=depth + 1)
+        valid     = Signal()
+        consume   = Signal()
+        condition = Record(layout)
+        self.specials += MultiReg(wr_count, count, "scope")
+        self.comb += [
+            If(~enable,
+                rd_next.eq(0)
+            ).Elif(consume,
+                rd_next.eq(rd_ptr + 1)
+            ).Else(
+                rd_next.eq(rd_ptr)
+            ),
+            rdport.adr.eq(rd_next),
+            condition.raw_bits().eq(rdport.dat_r),
+            valid.eq(rd_ptr < count),
+        ]
+        self.sync.scope += rd_ptr.eq(rd_next)
+
+        # Pipeline.
+        # Comparators can be split in registered stages: samples (and the read pointer they were
+        # compared with) are delayed accordingly and results of samples compared with an already
+        # consumed condition are discarded, so hits stay aligned with their sample.
+        ce      = Signal()
+        valid_o = Signal()
+        if stages:
+            ptr_o = Signal().like(rd_ptr)
+            self.comb += [
+                ce.eq(~source.valid | source.ready),
+                sink.ready.eq(ce),
+                source.valid.eq(pipelined_delay(self, ce, sink.valid, stages)),
+                source.data.eq(pipelined_delay(self, ce, sink.data, stages)),
+                ptr_o.eq(pipelined_delay(self, ce, rd_ptr, stages)),
+            ]
+        else:
+            self.comb += [
+                ce.eq(1),
+                sink.connect(source, omit={"hit"}),
+            ]
+        self.comb += valid_o.eq(source.valid)
+
+        # Lanes (samples of a word, oldest first) and previous sample (for edge comparators).
+        lane_data = [compare[n*data_width:(n + 1)*data_width] for n in range(lanes)]
+        data_d    = Signal(data_width)
+        if with_edges:
+            self.sync.scope += If(sink.valid & ce, data_d.eq(lane_data[-1]))
+
+        # Comparators.
+        def lane_matches(condition):
+            return [trigger_match(lane_data[n], lane_data[n - 1] if n else data_d, condition)
+                for n in range(lanes)]
+
+        def match(condition):
+            if lanes > 1:
+                return reduce(operator.or_, lane_matches(condition))
+            if not stages:
+                return trigger_match(compare, data_d, condition)
+            level, change, toggle = trigger_match_terms(compare, data_d, condition)
+            m = pipelined_reduce(self, ce, level, operator.and_, stages)
+            if change:
+                m = m & (~pipelined_reduce(self, ce, change, operator.or_, stages) |
+                          pipelined_reduce(self, ce, toggle, operator.or_, stages))
+            return m & (ptr_o == rd_ptr)
+
+        # Hit and condition consumption.
+        hit = Signal()
+        self.comb += hit.eq(match({name: getattr(condition, name) for name in fields}))
+        if count_width:
+            # Occurrence counter, cleared on each consumed condition and when re-enabling.
+            occurrences = Signal(count_width)
+            last_hit    = Signal()
+            self.comb += last_hit.eq((occurrences + 1) >= condition.count)
+            self.sync.scope += [
+                If((enable & ~enable_d) | consume,
+                    occurrences.eq(0)
+                ).Elif(enable & hit & valid_o & valid & ce,
+                    occurrences.eq(occurrences + 1)
+                )
+            ]
+            self.comb += consume.eq(enable & valid & hit & valid_o & last_hit & ce)
+        else:
+            self.comb += consume.eq(enable & valid & hit & valid_o & ce)
+
+        # Done when all triggers have been consumed.
+        self.comb += done.eq(~valid)
+
+        # Hit lane (first matching lane of the consumed condition).
+        if lanes > 1:
+            lane    = Signal(bits_for(lanes - 1))
+            matches = lane_matches({name: getattr(condition, name) for name in fields})
+            self.sync.scope += If(consume,
+                # Last assignment wins: first matching lane.
+                *[If(matches[n], lane.eq(n)) for n in reversed(range(lanes))]
+            )
+            self.specials += MultiReg(lane, self.lane.status)
+        if with_retrigger:
+            # Hit (pulse) on the first sample once done, then on each rising edge of the last condition
+            # match. The last condition is cleared to match-all on arm, which then hits continuously.
+            last       = {name: Signal(data_width) for name in fields}
+            last_any   = Signal()
+            last_hit   = Signal()
+            last_hit_d = Signal()
+            done_d     = Signal()
+            self.comb += [
+                last_any.eq(Cat(*[last[name] for name in fields if name != "value"]) == 0),
+                last_hit.eq(match(last)),
+            ]
+            self.sync.scope += [
+                If(enable & ~enable_d,
+                    done_d.eq(0),
+                    last_hit_d.eq(0),
+                    *[last[name].eq(0) for name in fields]
+                ).Else(
+                    done_d.eq(done),
+                    If(valid_o & ce,
+                        last_hit_d.eq(last_hit)
+                    ),
+                    If(consume,
+                        *[last[name].eq(getattr(condition, name)) for name in fields]
+                    )
+                )
+            ]
+            self.comb += source.hit.eq(done & (~done_d | (last_hit & (~last_hit_d | last_any))))
+        else:
+            self.comb += source.hit.eq(done)
+
+# LiteScope Analyzer Trigger Sequencer -------------------------------------------------------------
+
+class _TriggerSequencer(LiteXModule):
+    def __init__(self, data_width, states=8, count_width=16, timeout_width=32, with_edges=False,
+        with_compare=False):
+        self.sink   = sink   = stream.Endpoint(core_layout(data_width))
+        self.source = source = stream.Endpoint(core_layout(data_width))
+
+        # Compared data (sink data, or a separate input aligned with sink with with_compare).
+        compare = sink.data
+        if with_compare:
+            self.compare = compare = Signal(data_width)
+
+        state_width = bits_for(states - 1)
+
+        self.enable = CSRStorage()
+        self.done   = CSRStatus()
+        self.state  = CSRStatus(state_width)
+
+        # Each state: match on (data & mask) == (value & mask) (and rising/falling/change edges). After
+        # count matches, go to next state (or hit when final). After timeout cycles (0: no timeout)
+        # in state, go to timeout_next.
+        self.mem_write        = CSR()
+        self.mem_index        = CSRStorage(state_width)
+        self.mem_mask         = CSRStorage(data_width)
+        self.mem_value        = CSRStorage(data_width)
+        if with_edges:
+            self.mem_rising  = CSRStorage(data_width)
+            self.mem_falling = CSRStorage(data_width)
+            self.mem_change  = CSRStorage(data_width)
+        self.mem_count        = CSRStorage(count_width)
+        self.mem_next         = CSRStorage(state_width)
+        self.mem_final        = CSRStorage()
+        self.mem_timeout      = CSRStorage(timeout_width)
+        self.mem_timeout_next = CSRStorage(state_width)
+
+        # # #
+
+        # Control re-synchronization.
+        enable   = Signal()
+        enable_d = Signal()
+        self.specials += MultiReg(self.enable.storage, enable, "scope")
+        self.sync.scope += enable_d.eq(enable)
+
+        # Status re-synchronization.
+        done  = Signal()
+        state = Signal(state_width)
+        self.specials += MultiReg(done,  self.done.status)
+        self.specials += MultiReg(state, self.state.status)
+
+        # Memory and configuration.
+        layout = [
+            ("index",        state_width),
+            *[(name, data_width) for name in trigger_fields(with_edges)],
+            ("count",        count_width),
+            ("timeout",      timeout_width),
+            ("next",         state_width),
+            ("final",        1),
+            ("timeout_next", state_width),
+        ]
+        cdc = stream.AsyncFIFO(layout, 4)
+        cdc = ClockDomainsRenamer({"write": "sys", "read": "scope"})(cdc)
+        self.submodules += cdc
         self.comb += [
-            flush.wait.eq(~(~enable & enable_d)), # flush when disabling
-            hit.eq((sink.data & mem.source.mask) == (mem.source.value & mem.source.mask)),
-            mem.source.ready.eq((enable & hit) | ~flush.done),
+            cdc.sink.valid.eq(self.mem_write.wr_stb),
+            *[getattr(cdc.sink, name).eq(getattr(self, "mem_" + name).storage) for name, width in layout],
+            cdc.source.ready.eq(1),
+        ]
+        mem = {}
+        for name, width in layout[1:]:
+            mem[name] = Array(Signal(width) for i in range(states))
+        self.sync.scope += If(cdc.source.valid,
+            *[mem[name][cdc.source.index].eq(getattr(cdc.source, name)) for name, width in layout[1:]]
+        )
+
+        # Previous sample (for edge comparators).
+        data_d = Signal(data_width)
+        if with_edges:
+            self.sync.scope += If(sink.valid, data_d.eq(compare))
+
+        # Sequencer.
+        occurrences = Signal(count_width)
+        timer       = Signal(timeout_width)
+        match       = Signal()
+        self.comb += match.eq(trigger_match(compare, data_d,
+            {name: mem[name][state] for name in trigger_fields(with_edges)}))
+        self.sync.scope += [
+            If(enable & ~enable_d,
+                state.eq(0),
+                occurrences.eq(0),
+                timer.eq(0),
+                done.eq(0)
+            ).Elif(enable & ~done & sink.valid,
+                If(match & ((occurrences + 1) >= mem["count"][state]),
+                    If(mem["final"][state],
+                        done.eq(1)
+                    ).Else(
+                        state.eq(mem["next"][state]),
+                        occurrences.eq(0),
+                        timer.eq(0)
+                    )
+                ).Elif((mem["timeout"][state] != 0) & (timer >= (mem["timeout"][state] - 1)),
+                    state.eq(mem["timeout_next"][state]),
+                    occurrences.eq(0),
+                    timer.eq(0)
+                ).Else(
+                    If(match,
+                        occurrences.eq(occurrences + 1)
+                    ),
+                    timer.eq(timer + 1)
+                )
+            )
         ]
 
         # Output.
         self.comb += [
-            sink.connect(source),
-            # Done when all triggers have been consumed.
-            done.eq(~mem.source.valid),
+            sink.connect(source, omit={"hit"}),
             source.hit.eq(done)
         ]
 
+# LiteScope Analyzer Cross Trigger -----------------------------------------------------------------
+
+class _CrossTrigger(LiteXModule):
+    def __init__(self, data_width):
+        self.sink   = sink   = stream.Endpoint(core_layout(data_width))
+        self.source = source = stream.Endpoint(core_layout(data_width))
+
+        self.trigger_in  = Signal() # Level, from any clock domain.
+        self.trigger_out = Signal() # Level (scope domain), set on hit until re-arm.
+        self.arm         = Signal() # Trigger enable (scope domain).
+
+        self.enable = CSRStorage()        # Hit on trigger_in.
+        self.local  = CSRStorage(reset=1) # Hit on the local trigger.
+
+        # # #
+
+        # Control/Input re-synchronization.
+        enable     = Signal()
+        local      = Signal()
+        trigger_in = Signal()
+        self.specials += MultiReg(self.enable.storage, enable,     "scope")
+        self.specials += MultiReg(self.local.storage,  local,      "scope", reset=1)
+        self.specials += MultiReg(self.trigger_in,     trigger_in, "scope")
+
+        # External hit and trigger output, held until re-arm (levels, so they can cross clock
+        # domains with a MultiReg on the receiving side).
+        hit_in = Signal()
+        self.sync.scope += [
+            If(~self.arm,
+                hit_in.eq(0),
+                self.trigger_out.eq(0)
+            ).Else(
+                If(enable & trigger_in,
+                    hit_in.eq(1)
+                ),
+                If(source.valid & source.hit,
+                    self.trigger_out.eq(1)
+                )
+            )
+        ]
+        self.comb += [
+            sink.connect(source, omit={"hit"}),
+            source.hit.eq((local & sink.hit) | hit_in),
+        ]
+
 # LiteScope Analyzer SubSampler --------------------------------------------------------------------
 
 class _SubSampler(LiteXModule):
@@ -123,32 +527,160 @@ class _SubSampler(LiteXModule):
                 )
             )
 
+        # Hits on dropped samples are carried to the next kept sample (hit can be a pulse).
+        hit_pending = Signal()
+        self.sync.scope += \
+            If(source.valid & source.ready,
+                hit_pending.eq(0)
+            ).Elif(sink.valid & sink.hit,
+                hit_pending.eq(1)
+            )
+
         self.comb += [
             done.eq(counter == value),
-            sink.connect(source, omit={"valid"}),
-            source.valid.eq(sink.valid & done)
+            sink.connect(source, omit={"valid", "hit"}),
+            source.valid.eq(sink.valid & done),
+            source.hit.eq(sink.hit | hit_pending)
+        ]
+
+# LiteScope Analyzer Qualifier ---------------------------------------------------------------------
+
+class _Qualifier(LiteXModule):
+    def __init__(self, data_width, timestamp_width=16, with_change=False):
+        assert timestamp_width >= 1
+
+        self.sink   = sink   = stream.Endpoint(core_layout(data_width))
+        self.source = source = stream.Endpoint(core_layout(data_width + timestamp_width))
+
+        self.enable = CSRStorage()
+        self.mask   = CSRStorage(data_width)
+        self.value  = CSRStorage(data_width)
+        if with_change:
+            # Transitional mode: only store samples where change bits differ from the last stored one.
+            self.change = CSRStorage(data_width)
+
+        # # #
+
+        enable = Signal()
+        mask   = Signal(data_width)
+        value  = Signal(data_width)
+        change = Signal(data_width)
+        self.specials += MultiReg(self.enable.storage, enable, "scope")
+        self.specials += MultiReg(self.mask.storage,   mask,   "scope")
+        self.specials += MultiReg(self.value.storage,  value,  "scope")
+        if with_change:
+            self.specials += MultiReg(self.change.storage, change, "scope")
+
+        # Samples are only stored when qualified (the first sample of a hit always is), along with the
+        # number of samples elapsed since the previous stored one (saturated) to rebuild timing.
+        keep      = Signal()
+        level     = Signal()
+        match     = Signal()
+        hit_d     = Signal()
+        last      = Signal(data_width)
+        delta     = Signal(timestamp_width, reset=1)
+        delta_max = 2**timestamp_width - 1
+        self.comb += level.eq((sink.data & mask) == (value & mask))
+        if with_change:
+            # In transitional mode, a sample is also stored when the delta saturates so that gaps
+            # between changes are always rebuilt exactly.
+            self.comb += match.eq(level & (
+                (change == 0) | (((sink.data ^ last) & change) != 0) | (delta == delta_max)))
+        else:
+            self.comb += match.eq(level)
+        self.comb += [
+            keep.eq(~enable | (sink.hit & ~hit_d) | match),
+            source.valid.eq(sink.valid & keep),
+            source.data.eq(Cat(sink.data, delta)),
+            source.hit.eq(sink.hit),
+            sink.ready.eq(source.ready | ~keep),
+        ]
+        self.sync.scope += If(sink.valid & sink.ready,
+            hit_d.eq(sink.hit),
+            If(keep,
+                last.eq(sink.data),
+                delta.eq(1)
+            ).Elif(delta != delta_max,
+                delta.eq(delta + 1)
+            )
+        )
+
+# LiteScope Analyzer Delta Encoder -----------------------------------------------------------------
+
+class _Delta(LiteXModule):
+    def __init__(self, data_width):
+        self.sink   = sink   = stream.Endpoint(core_layout(data_width))
+        self.source = source = stream.Endpoint(core_layout(data_width))
+
+        self.mode = CSRStorage(2) # DELTA_NONE/DELTA_XOR/DELTA_SUB.
+        self.external_enable = Signal(reset=1)
+
+        # # #
+
+        mode   = Signal(2)
+        active = Signal()
+        self.specials += MultiReg(self.mode.storage, mode, "scope")
+        self.comb += active.eq((mode != DELTA_NONE) & self.external_enable)
+
+        # Samples following the first hit sample while active (the RLE anchor, stored raw) are
+        # replaced by their delta with the previous sample, so constant deltas become RLE runs.
+        prev    = Signal(data_width)
+        started = Signal()
+        self.sync.scope += [
+            If(sink.valid & sink.ready,
+                prev.eq(sink.data)
+            ),
+            If(~active,
+                started.eq(0)
+            ).Elif(sink.valid & sink.ready & sink.hit,
+                started.eq(1)
+            )
+        ]
+        self.comb += [
+            sink.connect(source, omit={"data"}),
+            source.data.eq(sink.data),
+            If(started,
+                Case(mode, {
+                    DELTA_XOR : source.data.eq(sink.data ^ prev),
+                    DELTA_SUB : source.data.eq(sink.data - prev),
+                })
+            )
         ]
 
 # LiteScope Analyzer Run Length Encoder -----------------------------------------------------------
 
 class _RLE(LiteXModule):
-    def __init__(self, data_width, storage_width, length):
+    def __init__(self, data_width, storage_width, length, stages=0):
         assert length >= 2
 
         self.sink   = sink   = stream.Endpoint(core_layout(data_width))
         self.source = source = stream.Endpoint(core_layout(storage_width))
 
         self.enable = CSRStorage()
+        self.ignore = CSRStorage(data_width) # Bits excluded from run detection.
+        self.zero   = CSRStorage()           # Store ignored bits as 0.
         self.external_enable = Signal(reset=1)
         self.flush = Signal()
 
         # # #
 
         enable = Signal()
+        ignore = Signal(data_width)
+        zero   = Signal()
         active_enable = Signal()
         self.specials += MultiReg(self.enable.storage, enable, "scope")
+        self.specials += MultiReg(self.ignore.storage, ignore, "scope")
+        self.specials += MultiReg(self.zero.storage,   zero,   "scope")
         self.comb += active_enable.eq(enable & self.external_enable)
 
+        # Input data (with ignored bits optionally zeroed).
+        data = Signal(data_width)
+        self.comb += If(zero,
+            data.eq(sink.data & ~ignore)
+        ).Else(
+            data.eq(sink.data)
+        )
+
         count_width  = bits_for(length - 1)
         marker_bit   = storage_width - 1
         max_count    = length - 1
@@ -163,6 +695,30 @@ class _RLE(LiteXModule):
             rle_data[marker_bit].eq(1),
         ]
 
+        # Run detection (optionally pipelined, samples are then compared with the previous input
+        # sample, which is always the last sample of the current run).
+        i     = stream.Endpoint(core_layout(data_width))
+        equal = Signal()
+        if stages:
+            ce    = Signal()
+            prev  = Signal(data_width)
+            terms = [((data ^ prev) & ~ignore)[n:n + 32] == 0 for n in range(0, data_width, 32)]
+            self.comb += [
+                ce.eq(~i.valid | i.ready),
+                sink.ready.eq(ce),
+                i.valid.eq(pipelined_delay(self, ce, sink.valid, stages)),
+                i.data.eq(pipelined_delay(self, ce, data, stages)),
+                i.hit.eq(pipelined_delay(self, ce, sink.hit, stages)),
+                equal.eq(pipelined_reduce(self, ce, terms, operator.and_, stages)),
+            ]
+            self.sync.scope += If(sink.valid & ce, prev.eq(data))
+        else:
+            self.comb += [
+                sink.connect(i, omit={"data"}),
+                i.data.eq(data),
+                equal.eq(((data ^ last_data) & ~ignore) == 0),
+            ]
+
         def emit_raw(data, hit):
             return [
                 source.valid.eq(1),
@@ -182,12 +738,12 @@ class _RLE(LiteXModule):
         self.submodules += fsm
 
         fsm.act("BYPASS",
-            source.valid.eq(sink.valid),
-            source.data.eq(sink.data),
-            source.hit.eq(sink.hit),
-            sink.ready.eq(source.ready),
-            If(sink.valid & source.ready & active_enable & sink.hit,
-                NextValue(last_data, sink.data),
+            source.valid.eq(i.valid),
+            source.data.eq(i.data),
+            source.hit.eq(i.hit),
+            i.ready.eq(source.ready),
+            If(i.valid & source.ready & active_enable & i.hit,
+                NextValue(last_data, i.data),
                 NextState("RUN")
             )
         )
@@ -205,25 +761,25 @@ class _RLE(LiteXModule):
                 If(source.ready,
                     NextValue(count, 0)
                 )
-            ).Elif(sink.valid,
-                If(sink.data == last_data,
-                    sink.ready.eq(1),
+            ).Elif(i.valid,
+                If(equal,
+                    i.ready.eq(1),
                     NextValue(count, count + 1)
                 ).Else(
                     If(count != 0,
                         emit_rle(),
-                        sink.ready.eq(source.ready),
+                        i.ready.eq(source.ready),
                         If(source.ready,
                             NextValue(count, 0),
-                            NextValue(pending_data, sink.data),
-                            NextValue(pending_hit,  sink.hit),
+                            NextValue(pending_data, i.data),
+                            NextValue(pending_hit,  i.hit),
                             NextState("EMIT_RAW")
                         )
                     ).Else(
-                        emit_raw(sink.data, sink.hit),
-                        sink.ready.eq(source.ready),
+                        emit_raw(i.data, i.hit),
+                        i.ready.eq(source.ready),
                         If(source.ready,
-                            NextValue(last_data, sink.data)
+                            NextValue(last_data, i.data)
                         )
                     )
                 )
@@ -237,6 +793,384 @@ class _RLE(LiteXModule):
             )
         )
 
+# LiteScope Analyzer Packer ------------------------------------------------------------------------
+
+class _Packer(LiteXModule):
+    def __init__(self, data_width, ratio):
+        assert ratio >= 2
+
+        self.sink   = sink   = stream.Endpoint(core_layout(data_width))
+        self.source = source = stream.Endpoint(core_layout(ratio*data_width))
+
+        self.hit_position = CSRStatus(bits_for(ratio - 1)) # Position of the first hit in its word.
+
+        # # #
+
+        # Consecutive samples are packed in words of ratio samples (oldest in LSBs), a word hits when
+        # one of its samples hits.
+        count    = Signal(max=ratio)
+        datas    = Array(Signal(data_width) for i in range(ratio - 1))
+        hit      = Signal()
+        position = Signal(bits_for(ratio - 1))
+        last     = Signal()
+        self.comb += [
+            last.eq(count == (ratio - 1)),
+            source.valid.eq(sink.valid & last),
+            source.data.eq(Cat(*[datas[i] for i in range(ratio - 1)], sink.data)),
+            source.hit.eq(hit | sink.hit),
+            sink.ready.eq(source.ready | ~last),
+        ]
+        self.sync.scope += If(sink.valid & sink.ready,
+            If(last,
+                count.eq(0),
+                hit.eq(0)
+            ).Else(
+                datas[count].eq(sink.data),
+                count.eq(count + 1),
+                If(sink.hit & ~hit,
+                    position.eq(count)
+                ),
+                hit.eq(hit | sink.hit)
+            )
+        )
+
+        # Hit position of the first word hit (following a word without hit).
+        word_hit_d   = Signal()
+        hit_position = Signal.like(position)
+        self.sync.scope += If(source.valid & source.ready,
+            word_hit_d.eq(source.hit),
+            If(source.hit & ~word_hit_d,
+                hit_position.eq(Mux(hit, position, ratio - 1))
+            )
+        )
+        self.specials += MultiReg(hit_position, self.hit_position.status)
+
+# LiteScope Analyzer Event Counters ----------------------------------------------------------------
+
+class _EventCounters(LiteXModule):
+    def __init__(self, data_width, n=4, counter_width=48, window_width=48):
+        assert n >= 1
+        self.sink = sink = stream.Endpoint(core_layout(data_width))
+
+        self.enable  = CSRStorage()
+        self.window  = CSRStorage(window_width) # Cycles to count (0: until disabled).
+        self.done    = CSRStatus()
+        self.elapsed = CSRStatus(window_width)
+        for i in range(n):
+            setattr(self, f"mask{i}",  CSRStorage(data_width,   name=f"mask{i}"))
+            setattr(self, f"value{i}", CSRStorage(data_width,   name=f"value{i}"))
+            setattr(self, f"count{i}", CSRStatus(counter_width, name=f"count{i}"))
+
+        # # #
+
+        # Control re-synchronization.
+        enable   = Signal()
+        enable_d = Signal()
+        window   = Signal(window_width)
+        self.specials += MultiReg(self.enable.storage, enable, "scope")
+        self.specials += MultiReg(self.window.storage, window, "scope")
+        self.sync.scope += enable_d.eq(enable)
+
+        # Window: enabling clears the counters and counts for window cycles (or until disabled).
+        run     = Signal()
+        started = Signal()
+        done    = Signal()
+        elapsed = Signal(window_width)
+        self.comb += done.eq(started & ~run)
+        self.sync.scope += [
+            If(~enable,
+                run.eq(0),
+                started.eq(0)
+            ).Elif(~enable_d,
+                run.eq(1),
+                started.eq(1),
+                elapsed.eq(0)
+            ).Elif(run,
+                elapsed.eq(elapsed + 1),
+                If((window != 0) & (elapsed == (window - 1)),
+                    run.eq(0)
+                )
+            )
+        ]
+
+        # Status re-synchronization (static when done).
+        self.specials += MultiReg(done,    self.done.status)
+        self.specials += MultiReg(elapsed, self.elapsed.status)
+
+        # Counters (saturating): count samples matching (data & mask) == (value & mask).
+        for i in range(n):
+            mask  = Signal(data_width)
+            value = Signal(data_width)
+            count = Signal(counter_width)
+            self.specials += MultiReg(getattr(self, f"mask{i}").storage,  mask,  "scope")
+            self.specials += MultiReg(getattr(self, f"value{i}").storage, value, "scope")
+            self.sync.scope += [
+                If(enable & ~enable_d,
+                    count.eq(0)
+                ).Elif(run & sink.valid & ((sink.data & mask) == (value & mask)),
+                    If(count != (2**counter_width - 1),
+                        count.eq(count + 1)
+                    )
+                )
+            ]
+            self.specials += MultiReg(count, getattr(self, f"count{i}").status)
+
+# LiteScope Analyzer Histogram ---------------------------------------------------------------------
+
+class _Histogram(LiteXModule):
+    def __init__(self, data_width, bins=256, count_width=32, window_width=48):
+        assert bins >= 2 and (bins & (bins - 1)) == 0
+        bins_width = log2_int(bins)
+        self.sink = sink = stream.Endpoint(core_layout(data_width))
+
+        self.enable  = CSRStorage()
+        self.window  = CSRStorage(window_width) # Cycles to accumulate (0: until disabled).
+        self.mask    = CSRStorage(data_width)   # Selected field.
+        self.shift   = CSRStorage(bits_for(data_width - 1)) # Field offset + bin shift.
+        self.done    = CSRStatus()
+        self.elapsed = CSRStatus(window_width)
+        self.index   = CSRStorage(bins_width)   # Bin to read (when done).
+        self.count   = CSRStatus(count_width)
+
+        # # #
+
+        # Control re-synchronization.
+        enable   = Signal()
+        enable_d = Signal()
+        window   = Signal(window_width)
+        mask     = Signal(data_width)
+        shift    = Signal(bits_for(data_width - 1))
+        self.specials += MultiReg(self.enable.storage, enable, "scope")
+        self.specials += MultiReg(self.window.storage, window, "scope")
+        self.specials += MultiReg(self.mask.storage,   mask,   "scope")
+        self.specials += MultiReg(self.shift.storage,  shift,  "scope")
+        self.sync.scope += enable_d.eq(enable)
+
+        # Memory (one count per bin).
+        mem     = Memory(count_width, bins)
+        wrport  = mem.get_port(write_capable=True, clock_domain="scope")
+        rdport  = mem.get_port(clock_domain="scope")
+        sysport = mem.get_port(clock_domain="sys")
+        self.specials += mem, wrport, rdport, sysport
+
+        # Window: enabling clears the bins (bins cycles) then accumulates for window cycles (or until
+        # disabled).
+        clear   = Signal()
+        clr_adr = Signal(bins_width)
+        run     = Signal()
+        started = Signal()
+        elapsed = Signal(window_width)
+        self.sync.scope += [
+            If(~enable,
+                clear.eq(0),
+                run.eq(0),
+                started.eq(0)
+            ).Elif(~enable_d,
+                clear.eq(1),
+                clr_adr.eq(0),
+                started.eq(1)
+            ).Elif(clear,
+                clr_adr.eq(clr_adr + 1),
+                If(clr_adr == (bins - 1),
+                    clear.eq(0),
+                    run.eq(1),
+                    elapsed.eq(0)
+                )
+            ).Elif(run,
+                elapsed.eq(elapsed + 1),
+                If((window != 0) & (elapsed == (window - 1)),
+                    run.eq(0)
+                )
+            )
+        ]
+
+        # Accumulation: consecutive samples of the same bin are counted in a register, the bin count
+        # is only read (at the start of the run) and written back (at its end) once per run, so a
+        # sample can be accumulated every cycle.
+        sample    = Signal()
+        bin_adr   = Signal(bins_width)
+        cur_valid = Signal()
+        cur_first = Signal() # Run started on the previous sample: base count is on the read port.
+        cur_bin   = Signal(bins_width)
+        cur_count = Signal(count_width)
+        cur_base  = Signal(count_width)
+        base      = Signal(count_width)
+        total     = Signal(count_width + 1)
+        flush     = Signal()
+        self.comb += [
+            sample.eq(run & sink.valid),
+            bin_adr.eq((sink.data & mask) >> shift),
+            rdport.adr.eq(bin_adr),
+            base.eq(Mux(cur_first, rdport.dat_r, cur_base)),
+            total.eq(base + cur_count),
+            flush.eq(cur_valid & (~sample | (bin_adr != cur_bin))),
+            If(clear,
+                wrport.adr.eq(clr_adr),
+                wrport.dat_w.eq(0),
+                wrport.we.eq(1)
+            ).Else(
+                wrport.adr.eq(cur_bin),
+                # Saturated.
+                wrport.dat_w.eq(Mux(total[-1], 2**count_width - 1, total)),
+                wrport.we.eq(flush)
+            )
+        ]
+        self.sync.scope += [
+            cur_first.eq(0),
+            If(cur_first,
+                cur_base.eq(rdport.dat_r)
+            ),
+            If(sample,
+                If(cur_valid & (bin_adr == cur_bin),
+                    If(cur_count != (2**count_width - 1),
+                        cur_count.eq(cur_count + 1)
+                    )
+                ).Else(
+                    cur_valid.eq(1),
+                    cur_first.eq(1),
+                    cur_bin.eq(bin_adr),
+                    cur_count.eq(1)
+                )
+            ).Elif(flush,
+                cur_valid.eq(0)
+            ),
+            If(clear,
+                cur_valid.eq(0)
+            )
+        ]
+
+        # Status re-synchronization (static when done).
+        done = Signal()
+        self.comb += done.eq(started & ~clear & ~run & ~cur_valid)
+        self.specials += MultiReg(done,    self.done.status)
+        self.specials += MultiReg(elapsed, self.elapsed.status)
+
+        # Bins read.
+        self.comb += [
+            sysport.adr.eq(self.index.storage),
+            self.count.status.eq(sysport.dat_r),
+        ]
+
+# LiteScope Analyzer Latency ----------------------------------------------------------------------
+
+class _Latency(LiteXModule):
+    def __init__(self, data_width, latency_width=32, count_width=48, window_width=48):
+        self.sink = sink = stream.Endpoint(core_layout(data_width))
+
+        self.enable      = CSRStorage()
+        self.window      = CSRStorage(window_width) # Cycles to measure (0: until disabled).
+        self.start_mask  = CSRStorage(data_width)
+        self.start_value = CSRStorage(data_width)
+        self.stop_mask   = CSRStorage(data_width)
+        self.stop_value  = CSRStorage(data_width)
+        self.done        = CSRStatus()
+        self.elapsed     = CSRStatus(window_width)
+        self.count       = CSRStatus(count_width)                 # Measured latencies.
+        self.min         = CSRStatus(latency_width)
+        self.max         = CSRStatus(latency_width)
+        self.sum         = CSRStatus(latency_width + count_width)
+
+        # # #
+
+        # Control re-synchronization.
+        enable      = Signal()
+        enable_d    = Signal()
+        window      = Signal(window_width)
+        start_mask  = Signal(data_width)
+        start_value = Signal(data_width)
+        stop_mask   = Signal(data_width)
+        stop_value  = Signal(data_width)
+        self.specials += MultiReg(self.enable.storage,      enable,      "scope")
+        self.specials += MultiReg(self.window.storage,      window,      "scope")
+        self.specials += MultiReg(self.start_mask.storage,  start_mask,  "scope")
+        self.specials += MultiReg(self.start_value.storage, start_value, "scope")
+        self.specials += MultiReg(self.stop_mask.storage,   stop_mask,   "scope")
+        self.specials += MultiReg(self.stop_value.storage,  stop_value,  "scope")
+        self.sync.scope += enable_d.eq(enable)
+
+        # Window: enabling clears the statistics and measures for window cycles (or until disabled).
+        run     = Signal()
+        started = Signal()
+        done    = Signal()
+        elapsed = Signal(window_width)
+        self.comb += done.eq(started & ~run)
+        self.sync.scope += [
+            If(~enable,
+                run.eq(0),
+                started.eq(0)
+            ).Elif(~enable_d,
+                run.eq(1),
+                started.eq(1),
+                elapsed.eq(0)
+            ).Elif(run,
+                elapsed.eq(elapsed + 1),
+                If((window != 0) & (elapsed == (window - 1)),
+                    run.eq(0)
+                )
+            )
+        ]
+
+        # Start/Stop events: rising edges of (data & mask) == (value & mask).
+        start   = Signal()
+        start_d = Signal()
+        stop    = Signal()
+        stop_d  = Signal()
+        self.comb += [
+            start.eq((sink.data & start_mask) == (start_value & start_mask)),
+            stop.eq((sink.data & stop_mask) == (stop_value & stop_mask)),
+        ]
+        self.sync.scope += If(sink.valid,
+            start_d.eq(start),
+            stop_d.eq(stop)
+        )
+
+        # Measurement: cycles from a start event to the next stop event (saturated). One measurement
+        # at a time: start events are ignored while measuring (unless on the stop event cycle).
+        latency   = Signal(latency_width)
+        measuring = Signal()
+        count     = Signal(count_width)
+        lmin      = Signal(latency_width)
+        lmax      = Signal(latency_width)
+        lsum      = Signal(latency_width + count_width)
+        self.sync.scope += [
+            If(enable & ~enable_d,
+                measuring.eq(0),
+                count.eq(0),
+                lmin.eq(2**latency_width - 1),
+                lmax.eq(0),
+                lsum.eq(0)
+            ).Elif(run & sink.valid,
+                If(latency != (2**latency_width - 1),
+                    latency.eq(latency + 1)
+                ),
+                If(measuring & stop & ~stop_d,
+                    measuring.eq(0),
+                    count.eq(count + 1),
+                    If(latency < lmin,
+                        lmin.eq(latency)
+                    ),
+                    If(latency > lmax,
+                        lmax.eq(latency)
+                    ),
+                    lsum.eq(lsum + latency)
+                ),
+                If(start & ~start_d & (~measuring | (stop & ~stop_d)),
+                    measuring.eq(1),
+                    latency.eq(1)
+                )
+            ).Elif(~run,
+                measuring.eq(0)
+            )
+        ]
+
+        # Status re-synchronization (static when done).
+        self.specials += MultiReg(done,    self.done.status)
+        self.specials += MultiReg(elapsed, self.elapsed.status)
+        self.specials += MultiReg(count,   self.count.status)
+        self.specials += MultiReg(lmin,    self.min.status)
+        self.specials += MultiReg(lmax,    self.max.status)
+        self.specials += MultiReg(lsum,    self.sum.status)
+
 # LiteScope Analyzer Mux ---------------------------------------------------------------------------
 
 class _Mux(LiteXModule):
@@ -259,18 +1193,30 @@ class _Mux(LiteXModule):
 # LiteScope Analyzer Storage -----------------------------------------------------------------------
 
 class _Storage(LiteXModule):
-    def __init__(self, data_width, depth):
+    def __init__(self, data_width, depth, with_wishbone=False, segments=1, with_pingpong=False,
+        read_width=32):
+        assert (segments == 1) or not with_pingpong
+        if with_pingpong:
+            segments = 2 # One bank per segment.
+        assert depth % segments == 0
         self.sink = sink = stream.Endpoint(core_layout(data_width))
-        self.post_hit = Signal()
-        self.flush = Signal()
+        self.post_hit  = Signal()
+        self.flush     = Signal()
+        self.timestamp = Signal(64) # Free-running timestamp (scope domain).
 
         self.enable    = CSRStorage()
         self.done      = CSRStatus()
+        self.armed     = CSRStatus()
 
         self.length    = CSRStorage(bits_for(depth))
         self.offset    = CSRStorage(bits_for(depth))
 
-        read_width = min(32, data_width)
+        # Capture metadata (of the selected segment/bank).
+        self.pre_trigger       = CSRStatus(bits_for(depth)) # Words stored before the trigger word.
+        self.cycles            = CSRStatus(32)              # Scope cycles from arm to capture end.
+        self.trigger_timestamp = CSRStatus(64)              # Timestamp at trigger.
+
+        read_width = min(read_width, data_width) # Up to the CSR data width: one CSR read per word.
         self.mem_level = CSRStatus(bits_for(depth))
         self.mem_data  = CSRStatus(read_width)
 
@@ -289,102 +1235,758 @@ class _Storage(LiteXModule):
 
         # Status re-synchronization.
         done  = Signal()
-        level = Signal().like(self.mem_level.status)
-        self.specials += MultiReg(done, self.done.status)
-        self.specials += MultiReg(level, self.mem_level.status)
+        armed = Signal()
+        self.specials += MultiReg(done,  self.done.status)
+        self.specials += MultiReg(armed, self.armed.status)
+
+        # Armed: set once the storage has taken the arm request, cleared on disable (done is only
+        # meaningful for the current capture when armed).
+        self.sync.scope += If(~enable,
+            armed.eq(0)
+        ).Elif(enable & ~enable_d,
+            armed.eq(1)
+        )
 
         # Memory.
-        mem = stream.SyncFIFO([("data", data_width)], depth, buffered=True)
-        mem = ClockDomainsRenamer("scope")(mem)
-        cdc = stream.AsyncFIFO([("data", data_width)], 4)
-        cdc = ClockDomainsRenamer({"write": "scope", "read": "sys"})(cdc)
-        self.submodules += mem, cdc
+        mem_source = stream.Endpoint([("data", data_width)])
+        self.add_circular_memory(data_width, depth, segments, with_wishbone, done, enable, enable_d,
+            length, offset, mem_source, with_pingpong)
+
+        # Memory read.
+        read_source = stream.Endpoint([("data", data_width)])
+        if data_width > read_width:
+            pad_bits = - data_width % read_width
+            w_conv = stream.Converter(data_width + pad_bits, read_width)
+            self.submodules += w_conv
+            self.comb += mem_source.connect(w_conv.sink)
+            self.comb += w_conv.source.connect(read_source)
+        else:
+            self.comb += mem_source.connect(read_source)
+
+        self.comb += [
+            read_source.ready.eq(self.mem_data.rd_stb | ~self.enable.storage),
+            self.mem_data.status.eq(read_source.data)
+        ]
+
+    def add_circular_memory(self, data_width, depth, segments, with_wishbone, done, enable, enable_d,
+        length, offset, mem_source, with_pingpong=False):
+        # Samples are written to a circular buffer (one per segment). Arming only resets the sample
+        # count (constant time, whatever the depth) and each capture is then read linearly (oldest
+        # sample first) from its start pointer, either sequentially through mem_data or randomly
+        # through the Wishbone window.
+        # In ping-pong mode, captures alternate between two banks: a completed bank is ready until
+        # released by the host, the next capture starts as soon as the other bank is free.
+        sink = self.sink
+
+        seg_depth = depth//segments
+        stride    = 2**log2_int((data_width + 31)//32, need_pow2=False) # 32-bit words per sample.
+
+        if with_pingpong:
+            self.bank_sel     = CSRStorage() # Bank to read/release.
+            self.bank_ready   = CSRStatus(2) # Banks holding a capture not yet released.
+            self.bank_release = CSR()        # Release the selected bank for a new capture.
+        elif segments > 1:
+            self.segment_sel       = CSRStorage(bits_for(segments - 1))
+            self.segment_count     = CSRStatus(bits_for(segments))
+            self.segment_trigger   = CSRStatus(bits_for(seg_depth))
+            self.segment_timestamp = CSRStatus(32)
 
-        self.comb += level.eq(mem.level)
+        # Memory.
+        mem    = Memory(data_width, depth)
+        wrport = mem.get_port(write_capable=True, clock_domain="scope")
+        rdport = mem.get_port(clock_domain="sys")
+        self.specials += mem, wrport, rdport
+
+        # Write pointer/count (in current segment).
+        seg       = Signal(max=max(segments, 2))
+        seg_base  = Signal(max=max(depth, 2))
+        wr_adr    = Signal(max=max(seg_depth, 2))
+        count     = Signal(max=seg_depth + 1)
+        start     = Signal(max=max(seg_depth, 2))
+        trigger   = Signal(max=seg_depth + 1)
+        timestamp = Signal(32)
+        trig_time = Signal(64)
+        write     = Signal()
+        arm       = Signal()
+        save      = Signal()
+        self.comb += [
+            wrport.adr.eq(seg_base + wr_adr),
+            wrport.dat_w.eq(sink.data),
+            wrport.we.eq(write),
+            If(wr_adr >= count,
+                start.eq(wr_adr - count)
+            ).Else(
+                start.eq(wr_adr + seg_depth - count)
+            )
+        ]
+        self.sync.scope += [
+            If(write,
+                If(wr_adr == (seg_depth - 1),
+                    wr_adr.eq(0)
+                ).Else(
+                    wr_adr.eq(wr_adr + 1)
+                )
+            ),
+            If(arm,
+                timestamp.eq(0)
+            ).Else(
+                timestamp.eq(timestamp + 1)
+            )
+        ]
 
-        # Flush.
-        mem_flush = WaitTimer(depth)
-        mem_flush = ClockDomainsRenamer("scope")(mem_flush)
-        self.submodules += mem_flush
+        # Segments information (saved when a segment is complete).
+        seg_starts     = Array(Signal(max=max(seg_depth, 2)) for i in range(segments))
+        seg_counts     = Array(Signal(max=seg_depth + 1)     for i in range(segments))
+        seg_triggers   = Array(Signal(max=seg_depth + 1)     for i in range(segments))
+        seg_timestamps = Array(Signal(32)                    for i in range(segments))
+        seg_cycles     = Array(Signal(32)                    for i in range(segments))
+        seg_trig_times = Array(Signal(64)                    for i in range(segments))
+        seg_completed  = Signal(max=segments + 1)
+        seg_timestamp  = Signal(32)
+        self.sync.scope += [
+            If(arm,
+                seg_completed.eq(0)
+            ).Elif(save,
+                seg_starts[seg].eq(start),
+                seg_counts[seg].eq(count),
+                seg_triggers[seg].eq(trigger),
+                seg_timestamps[seg].eq(seg_timestamp),
+                seg_cycles[seg].eq(timestamp),
+                seg_trig_times[seg].eq(trig_time),
+                seg_completed.eq(seg_completed + 1)
+            )
+        ]
+
+        # Banks status (ping-pong): a bank is ready while its filled (scope) and released (sys)
+        # toggles differ, arming marks both banks free.
+        if with_pingpong:
+            filled         = Signal(2)
+            released       = Signal(2)
+            scope_released = Signal(2)
+            ready          = Signal(2)
+            free           = Signal() # Other bank free.
+            self.specials += MultiReg(released, scope_released, "scope")
+            self.comb += [
+                ready.eq(filled ^ scope_released),
+                free.eq(Mux(seg, ~ready[0], ~ready[1])),
+            ]
+            self.sync.scope += If(arm,
+                filled.eq(scope_released)
+            ).Elif(save,
+                If(seg,
+                    filled[1].eq(~filled[1])
+                ).Else(
+                    filled[0].eq(~filled[0])
+                )
+            )
 
         # FSM.
         fsm = FSM(reset_state="IDLE")
         fsm = ClockDomainsRenamer("scope")(fsm)
         self.submodules += fsm
+        if with_pingpong:
+            next_capture = NextState("SWAP")
+        else:
+            next_capture = If(seg == (segments - 1),
+                NextState("IDLE")
+            ).Else(
+                NextValue(seg, seg + 1),
+                NextValue(seg_base, seg_base + seg_depth),
+                NextState("WAIT")
+            )
         fsm.act("IDLE",
             done.eq(1),
+            sink.ready.eq(1),
             If(enable & ~enable_d,
-                NextState("FLUSH")
-            ),
+                arm.eq(1),
+                NextValue(seg, 0),
+                NextValue(seg_base, 0),
+                NextValue(count, 0),
+                NextState("WAIT")
+            )
+        )
+        fsm.act("WAIT",
             sink.ready.eq(1),
-            mem.source.connect(cdc.sink)
+            write.eq(sink.valid),
+            If(sink.valid,
+                If(sink.hit,
+                    NextValue(trigger, count),
+                    NextValue(seg_timestamp, timestamp),
+                    NextValue(trig_time, self.timestamp),
+                    NextValue(count, count + 1),
+                    NextState("RUN")
+                ).Elif(count < offset,
+                    NextValue(count, count + 1)
+                )
+            )
+        )
+        fsm.act("RUN",
+            self.post_hit.eq(1),
+            self.flush.eq((length != 0) & (count >= (length - 1))),
+            If(count < length,
+                sink.ready.eq(1),
+                write.eq(sink.valid),
+                If(sink.valid,
+                    NextValue(count, count + 1)
+                )
+            ).Else(
+                save.eq(1),
+                NextValue(count, 0),
+                next_capture
+            )
         )
-        fsm.act("FLUSH",
+        if with_pingpong:
+            # Wait for the other bank to be released, then capture in it (until disabled).
+            fsm.act("SWAP",
+                sink.ready.eq(1),
+                If(free,
+                    NextValue(seg, ~seg),
+                    NextValue(seg_base, Mux(seg, 0, seg_depth)),
+                    NextState("WAIT")
+                )
+            )
+            for state in ["WAIT", "RUN", "SWAP"]:
+                fsm.act(state, If(~enable, NextState("IDLE")))
+
+        # Status re-synchronization (static when done).
+        sys_done   = Signal()
+        sys_done_d = Signal()
+        sys_base   = Signal().like(seg_base)
+        sys_count  = Signal().like(count)
+        sys_start  = Signal().like(start)
+        self.specials += MultiReg(done, sys_done)
+        self.sync += sys_done_d.eq(sys_done)
+        if segments > 1:
+            sel_csr   = self.bank_sel if with_pingpong else self.segment_sel
+            sel       = sel_csr.storage
+            sel_count = Signal().like(count)
+            sel_start = Signal().like(start)
+            self.comb += [
+                sys_base.eq(sel*seg_depth),
+                sel_count.eq(seg_counts[sel]),
+                sel_start.eq(seg_starts[sel]),
+            ]
+            self.specials += MultiReg(sel_count, sys_count)
+            self.specials += MultiReg(sel_start, sys_start)
+        if with_pingpong:
+            sys_filled = Signal(2)
+            sys_ready  = Signal(2)
+            sel_ready  = Signal()
+            self.specials += MultiReg(filled, sys_filled)
+            self.comb += [
+                sys_ready.eq(sys_filled ^ released),
+                sel_ready.eq(Mux(sel, sys_ready[1], sys_ready[0])),
+                self.bank_ready.status.eq(sys_ready),
+            ]
+            self.sync += If(self.bank_release.re & sel_ready,
+                If(sel,
+                    released[1].eq(~released[1])
+                ).Else(
+                    released[0].eq(~released[0])
+                )
+            )
+        elif segments > 1:
+            sel_stamp = Signal(32)
+            self.comb += [
+                sel_stamp.eq(seg_timestamps[sel]),
+                self.segment_trigger.status.eq(self.pre_trigger.status),
+            ]
+            self.specials += MultiReg(sel_stamp,     self.segment_timestamp.status)
+            self.specials += MultiReg(seg_completed, self.segment_count.status)
+        else:
+            sel = 0
+            self.specials += MultiReg(seg_counts[0], sys_count)
+            self.specials += MultiReg(seg_starts[0], sys_start)
+
+        # Capture metadata re-synchronization (static when done/ready).
+        sel_trigger   = Signal().like(trigger)
+        sel_cycles    = Signal(32)
+        sel_trig_time = Signal(64)
+        self.comb += [
+            sel_trigger.eq(seg_triggers[sel]),
+            sel_cycles.eq(seg_cycles[sel]),
+            sel_trig_time.eq(seg_trig_times[sel]),
+        ]
+        self.specials += MultiReg(sel_trigger,   self.pre_trigger.status)
+        self.specials += MultiReg(sel_cycles,    self.cycles.status)
+        self.specials += MultiReg(sel_trig_time, self.trigger_timestamp.status)
+
+        # Sequential read (reloaded at the end of the capture or on segment/bank selection).
+        rd_adr  = Signal().like(wr_adr)
+        rd_left = Signal().like(count)
+        load    = Signal()
+        reload  = Signal(2)
+        pop     = Signal()
+        rd_next = Signal().like(wr_adr)
+        if segments > 1:
+            self.sync += If(sel_csr.re,
+                reload.eq(3)
+            ).Elif(reload != 0,
+                reload.eq(reload - 1)
+            )
+        if with_pingpong:
+            self.comb += load.eq(~sel_ready | (reload != 0))
+        else:
+            self.comb += load.eq(~sys_done_d | (reload != 0))
+        self.comb += [
+            pop.eq(mem_source.valid & mem_source.ready),
+            If(rd_adr == (seg_depth - 1),
+                rd_next.eq(0)
+            ).Else(
+                rd_next.eq(rd_adr + 1)
+            ),
+            If(load,
+                rdport.adr.eq(sys_base + sys_start)
+            ).Elif(pop,
+                rdport.adr.eq(sys_base + rd_next)
+            ).Else(
+                rdport.adr.eq(sys_base + rd_adr)
+            ),
+            mem_source.valid.eq((rd_left != 0) & ~load),
+            mem_source.data.eq(rdport.dat_r),
+            self.mem_level.status.eq(rd_left),
+        ]
+        self.sync += [
+            If(~self.enable.storage,
+                rd_left.eq(0)
+            ).Elif(load,
+                rd_adr.eq(sys_start),
+                rd_left.eq(sys_count)
+            ).Elif(pop,
+                rd_adr.eq(rd_next),
+                rd_left.eq(rd_left - 1)
+            )
+        ]
+
+        if with_wishbone:
+            self.add_wishbone_window(mem, stride, seg_depth, sys_base, sys_start)
+
+    def add_wishbone_window(self, mem, stride, seg_depth, sys_base, sys_start):
+        # Wishbone window: sample N (of the selected segment) is mapped at word address N*stride.
+        self.bus      = bus = wishbone.Interface(data_width=32, address_width=32, addressing="word")
+        self.bus_size = 4*stride*mem.depth
+        wbport = mem.get_port(clock_domain="sys")
+        self.specials += wbport
+
+        stride_bits = log2_int(stride)
+        wb_sample   = Signal(bits_for(seg_depth))
+        wb_adr      = Signal(bits_for(2*seg_depth))
+        wb_data     = Signal(32*stride)
+        self.comb += [
+            wb_sample.eq(bus.adr[stride_bits:]),
+            wb_adr.eq(sys_start + wb_sample),
+            If(wb_adr >= seg_depth,
+                wbport.adr.eq(sys_base + wb_adr - seg_depth)
+            ).Else(
+                wbport.adr.eq(sys_base + wb_adr)
+            ),
+            wb_data.eq(wbport.dat_r),
+        ]
+        if stride > 1:
+            self.comb += Case(bus.adr[:stride_bits], {
+                i: bus.dat_r.eq(wb_data[32*i:32*(i+1)]) for i in range(stride)
+            })
+        else:
+            self.comb += bus.dat_r.eq(wb_data)
+        self.sync += [
+            bus.ack.eq(0),
+            If(bus.cyc & bus.stb & ~bus.ack,
+                bus.ack.eq(1)
+            )
+        ]
+
+# LiteScope Analyzer DMA Storage -------------------------------------------------------------------
+
+class _DMAStorage(LiteXModule):
+    def __init__(self, data_width, depth, base=0x00000000, fifo_depth=64):
+        self.sink = sink = stream.Endpoint(core_layout(data_width))
+        self.post_hit  = Signal()
+        self.flush     = Signal()
+        self.timestamp = Signal(64) # Free-running timestamp (scope domain).
+
+        self.enable    = CSRStorage()
+        self.done      = CSRStatus()
+        self.armed     = CSRStatus()
+
+        self.length    = CSRStorage(bits_for(depth))
+        self.offset    = CSRStorage(bits_for(depth))
+
+        # Capture metadata.
+        self.pre_trigger       = CSRStatus(bits_for(depth)) # Words stored before the trigger word.
+        self.trigger_timestamp = CSRStatus(64)              # Timestamp at trigger.
+
+        self.mem_level = CSRStatus(bits_for(depth))
+        self.mem_start = CSRStatus(bits_for(depth))
+        self.overflow  = CSRStatus()
+
+        # Samples are written as one bus word each (power-of-2 multiple of 32-bit).
+        stride = 2**log2_int((data_width + 31)//32, need_pow2=False)
+        assert base % (4*stride) == 0
+        self.bus = bus = wishbone.Interface(data_width=32*stride, address_width=32, addressing="word")
+
+        # # #
+
+        # Control re-synchronization.
+        enable   = Signal()
+        enable_d = Signal()
+        self.specials += MultiReg(self.enable.storage, enable, "scope")
+        self.sync.scope += enable_d.eq(enable)
+
+        sys_enable_d = Signal()
+        self.sync += sys_enable_d.eq(self.enable.storage)
+
+        # Armed: set once the storage has taken the arm request, cleared on disable.
+        self.sync += If(~self.enable.storage,
+            self.armed.status.eq(0)
+        ).Elif(~sys_enable_d,
+            self.armed.status.eq(1)
+        )
+
+        # CDC.
+        cdc = stream.AsyncFIFO(core_layout(data_width), fifo_depth, buffered=True)
+        cdc = ClockDomainsRenamer({"write": "scope", "read": "sys"})(cdc)
+        self.submodules += cdc
+
+        # Overflow (samples lost when the bus can't keep up with the sample rate).
+        overflow = Signal()
+        self.comb += [
+            sink.connect(cdc.sink, omit={"valid", "ready"}),
+            cdc.sink.valid.eq(sink.valid & enable),
             sink.ready.eq(1),
-            mem_flush.wait.eq(1),
-            mem.source.ready.eq(1),
-            If(mem_flush.done,
+        ]
+        self.sync.scope += [
+            If(enable & ~enable_d,
+                overflow.eq(0)
+            ).Elif(cdc.sink.valid & ~cdc.sink.ready,
+                overflow.eq(1)
+            )
+        ]
+        self.specials += MultiReg(overflow, self.overflow.status)
+
+        # Timestamp at trigger (first hit entering the CDC once armed).
+        triggered = Signal()
+        trig_time = Signal(64)
+        self.sync.scope += [
+            If(enable & ~enable_d,
+                triggered.eq(0)
+            ).Elif(cdc.sink.valid & cdc.sink.ready & cdc.sink.hit & ~triggered,
+                triggered.eq(1),
+                trig_time.eq(self.timestamp)
+            )
+        ]
+        self.specials += MultiReg(trig_time, self.trigger_timestamp.status)
+
+        # Ring buffer pointer/count.
+        length = self.length.storage
+        offset = self.offset.storage
+        wr_adr = Signal(max=max(depth, 2))
+        count  = Signal(max=depth + 1)
+        start  = Signal(max=max(depth, 2))
+        write  = Signal()
+        self.comb += [
+            If(wr_adr >= count,
+                start.eq(wr_adr - count)
+            ).Else(
+                start.eq(wr_adr + depth - count)
+            ),
+            self.mem_level.status.eq(count),
+            self.mem_start.status.eq(start),
+        ]
+        self.sync += If(write,
+            If(wr_adr == (depth - 1),
+                wr_adr.eq(0)
+            ).Else(
+                wr_adr.eq(wr_adr + 1)
+            )
+        )
+
+        # Bus writes.
+        self.comb += [
+            bus.adr.eq((base//(4*stride)) + wr_adr),
+            bus.dat_w.eq(cdc.source.data),
+            bus.sel.eq(2**len(bus.sel) - 1),
+            bus.we.eq(1),
+            write.eq(bus.cyc & bus.stb & bus.ack),
+        ]
+
+        # FSM.
+        post_hit = Signal()
+        flush    = Signal()
+        fsm = FSM(reset_state="IDLE")
+        self.submodules += fsm
+        fsm.act("IDLE",
+            self.done.status.eq(1),
+            cdc.source.ready.eq(1),
+            If(self.enable.storage & ~sys_enable_d,
+                NextValue(count, 0),
                 NextState("WAIT")
             )
         )
         fsm.act("WAIT",
-            sink.connect(mem.sink, omit={"hit"}),
-            If(sink.valid & sink.hit,
-                NextState("RUN")
-            ),
-            mem.source.ready.eq(mem.level >= offset)
+            bus.cyc.eq(cdc.source.valid),
+            bus.stb.eq(cdc.source.valid),
+            cdc.source.ready.eq(bus.ack),
+            If(write,
+                If(cdc.source.hit,
+                    NextValue(self.pre_trigger.status, count),
+                    NextValue(count, count + 1),
+                    NextState("RUN")
+                ).Elif(count < offset,
+                    NextValue(count, count + 1)
+                )
+            )
         )
         fsm.act("RUN",
-            self.post_hit.eq(1),
-            self.flush.eq((length != 0) & (mem.level >= (length - 1))),
-            If(mem.level < length,
-                sink.connect(mem.sink, omit={"hit"})
-            ),
-            If(mem.level >= length,
-                NextState("IDLE"),
+            post_hit.eq(1),
+            flush.eq((length != 0) & (count >= (length - 1))),
+            If(count < length,
+                bus.cyc.eq(cdc.source.valid),
+                bus.stb.eq(cdc.source.valid),
+                cdc.source.ready.eq(bus.ack),
+                If(write,
+                    NextValue(count, count + 1)
+                )
+            ).Else(
+                NextState("IDLE")
             )
         )
+        self.specials += MultiReg(post_hit, self.post_hit, "scope")
+        self.specials += MultiReg(flush,    self.flush,    "scope")
 
-        # Memory read.
-        read_source = stream.Endpoint([("data", data_width)])
-        if data_width > read_width:
-            pad_bits = - data_width % read_width
-            w_conv = stream.Converter(data_width + pad_bits, read_width)
-            self.submodules += w_conv
-            self.comb += cdc.source.connect(w_conv.sink)
-            self.comb += w_conv.source.connect(read_source)
-        else:
-            self.comb += cdc.source.connect(read_source)
+# LiteScope Analyzer Streamer ----------------------------------------------------------------------
 
+STREAM_MAGIC = 0x5c
+
+class _Streamer(LiteXModule):
+    def __init__(self, data_width, packet_length=64, fifo_depth=256):
+        assert fifo_depth >= packet_length + 2
+        self.sink   = sink   = stream.Endpoint(core_layout(data_width))
+        self.source = source = stream.Endpoint([("data", 32)])
+
+        self.enable   = CSRStorage()
+        self.overflow = CSRStatus(32)
+
+        # # #
+
+        # Packets: [MAGIC(8) | SEQUENCE(24)], [OVERFLOW(32)], packet_length samples (32-bit words,
+        # LSW first). A packet is only started once all its samples are buffered, so disabling never
+        # truncates a packet: the current one is completed, the remaining samples are flushed and
+        # a sequence number is skipped so the receiver sees the discontinuity.
+        enable   = Signal()
+        enable_d = Signal()
+        self.specials += MultiReg(self.enable.storage, enable, "scope")
+        self.sync.scope += enable_d.eq(enable)
+
+        flush = Signal()
+
+        # Sample buffering (sink is a tap of the pipeline, never back-pressured).
+        fifo = stream.SyncFIFO([("data", data_width)], fifo_depth, buffered=True)
+        fifo = ClockDomainsRenamer("scope")(ResetInserter()(fifo))
+        self.submodules += fifo
         self.comb += [
-            read_source.ready.eq(self.mem_data.rd_stb | ~self.enable.storage),
-            self.mem_data.status.eq(read_source.data)
+            fifo.reset.eq(flush),
+            fifo.sink.valid.eq(sink.valid & enable),
+            fifo.sink.data.eq(sink.data),
+            sink.ready.eq(1),
         ]
 
+        # Overflow counter (samples dropped when FIFO is full, cumulative).
+        overflow = Signal(32)
+        self.sync.scope += If(fifo.sink.valid & ~fifo.sink.ready,
+            overflow.eq(overflow + 1)
+        )
+        self.specials += MultiReg(overflow, self.overflow.status)
+
+        # Sample to 32-bit words conversion.
+        swpw   = (data_width + 31)//32
+        w_conv = stream.Converter(32*swpw, 32)
+        w_conv = ClockDomainsRenamer("scope")(ResetInserter()(w_conv))
+        self.submodules += w_conv
+        self.comb += [
+            w_conv.reset.eq(flush),
+            fifo.source.connect(w_conv.sink),
+        ]
+
+        # Packetizer.
+        sequence = Signal(24)
+        count    = Signal(max=packet_length*swpw)
+        end      = Signal()
+        self.sync.scope += sequence.eq(sequence + end + (enable_d & ~enable))
+        fsm = FSM(reset_state="SEQUENCE")
+        fsm = ClockDomainsRenamer("scope")(fsm)
+        self.submodules += fsm
+        fsm.act("SEQUENCE",
+            flush.eq(~enable),
+            source.valid.eq(enable & (fifo.level >= packet_length)),
+            source.data.eq(Cat(sequence, Constant(STREAM_MAGIC, 8))),
+            If(source.valid & source.ready,
+                NextState("OVERFLOW")
+            )
+        )
+        fsm.act("OVERFLOW",
+            source.valid.eq(1),
+            source.data.eq(overflow),
+            If(source.ready,
+                NextValue(count, 0),
+                NextState("DATA")
+            )
+        )
+        fsm.act("DATA",
+            w_conv.source.connect(source, omit={"last"}),
+            source.last.eq(count == (packet_length*swpw - 1)),
+            If(source.valid & source.ready,
+                NextValue(count, count + 1),
+                If(source.last,
+                    end.eq(1),
+                    NextState("SEQUENCE")
+                )
+            )
+        )
+
+# LiteScope Analyzer Sniffer -----------------------------------------------------------------------
+
+class LiteScopeSniffer:
+    # Transaction-mode capture of a bus in an analyzer group: a beat signal (valid & ready for a
+    # stream.Endpoint, cyc & stb & ack for a Wishbone interface) followed by the selected fields
+    # (payload/param and first/last, or adr/dat_w/dat_r/sel/we by default). The analyzer only
+    # stores the beats (with the storage qualifier). The bus must be in the analyzer clock domain.
+    def __init__(self, bus, fields=None):
+        if isinstance(bus, stream.Endpoint):
+            self.kind = "stream"
+            default   = ["first", "last"]
+            default  += [name for name, *_ in bus.description.payload_layout]
+            default  += [name for name, *_ in bus.description.param_layout]
+            condition = bus.valid & bus.ready
+        elif isinstance(bus, wishbone.Interface):
+            self.kind = "wishbone"
+            default   = ["adr", "dat_w", "dat_r", "sel", "we"]
+            condition = bus.cyc & bus.stb & bus.ack
+        else:
+            raise TypeError("LiteScopeSniffer only supports stream.Endpoint/wishbone.Interface")
+        self.bus       = bus
+        self.beat      = Signal(name=bus.name + "_beat")
+        self.condition = condition
+        self.fields    = {name: getattr(bus, name) for name in (fields or default)}
+
 # LiteScope Analyzer -------------------------------------------------------------------------------
 
 class LiteScopeAnalyzer(LiteXModule):
     def __init__(self, groups, depth,
-        samplerate       = 1e12,
-        clock_domain     = "sys",
-        trigger_depth    = 16,
-        subsampler_width = 16,
-        register         = False,
-        with_rle         = False,
-        rle_length       = 256,
-        csr_csv          = "analyzer.csv",
+        samplerate                = 1e12,
+        clock_domain              = "sys",
+        trigger_depth             = 16,
+        with_trigger_edges        = False,
+        with_trigger_range        = False,
+        with_trigger_count        = False,
+        with_trigger_group        = False,
+        with_cross_trigger        = False,
+        timestamp                 = None,
+        comparator_stages         = 0,
+        subsampler_width          = 16,
+        register                  = False,
+        lanes                     = 1,
+        with_qualifier            = False,
+        with_transitional         = False,
+        qualifier_timestamp_width = 16,
+        with_rle                  = False,
+        rle_length                = 256,
+        with_delta                = False,
+        pack                      = 1,
+        with_wishbone             = False,
+        with_dma                  = False,
+        dma_base                  = 0x00000000,
+        dma_fifo_depth            = 64,
+        with_streaming            = False,
+        stream_packet_length      = 64,
+        stream_fifo_depth         = 256,
+        segments                  = 1,
+        with_pingpong             = False,
+        with_sequencer            = False,
+        sequencer_states          = 8,
+        counters                  = 0,
+        counter_width             = 48,
+        with_latency              = False,
+        latency_width             = 32,
+        with_histogram            = False,
+        histogram_bins            = 256,
+        histogram_width           = 32,
+        csr_data_width            = 32,
+        csr_csv                   = "analyzer.csv",
     ):
         self.groups           = groups = self.format_groups(groups)
         self.depth            = depth
         self.samplerate       = int(samplerate)
         self.subsampler_width = subsampler_width
 
-        self.data_width = data_width = max([sum([len(s) for s in g]) for g in groups.values()])
+        # Lanes: each signal carries lanes samples per scope clock cycle (oldest in LSBs), samples
+        # are stored as words of lanes samples.
+        self.lanes = lanes
+        assert all(len(s) % lanes == 0 for g in groups.values() for s in g)
+        self.data_width = data_width = max([sum([len(s)//lanes for s in g]) for g in groups.values()])
+        word_width = lanes*data_width
         self.with_rle   = with_rle
         self.rle_length = rle_length
-        self.storage_width = storage_width = data_width
+        self.with_delta = with_delta # Delta encoding before RLE.
+        # Transaction sniffers only store the bus beats (with the storage qualifier).
+        with_qualifier = with_qualifier or bool(self.sniffers)
+        self.with_qualifier            = with_qualifier = with_qualifier or with_transitional
+        self.with_transitional         = with_transitional
+        self.qualifier_timestamp_width = qualifier_timestamp_width
+        self.storage_width = storage_width = word_width
+        if with_qualifier:
+            self.storage_width = storage_width = data_width + qualifier_timestamp_width
         if with_rle:
-            self.storage_width = storage_width = max(data_width, bits_for(rle_length - 1)) + 1
+            self.storage_width = storage_width = max(word_width, bits_for(rle_length - 1)) + 1
+        self.with_wishbone = with_wishbone
+        self.with_dma      = with_dma
+        self.dma_base      = dma_base
+        self.segments      = segments
+        self.with_pingpong = with_pingpong
+        self.pack          = pack # Samples per storage word.
+        self.read_width    = min(csr_data_width, pack*storage_width)
+        assert not (with_wishbone and with_dma)
+        assert not (with_qualifier and with_rle)
+        assert (lanes == 1) or not (with_qualifier or with_sequencer)
+        assert (segments == 1) or not (with_rle or with_dma)
+        assert with_rle or not with_delta
+        assert (comparator_stages == 0) or not with_delta
+        assert not with_pingpong or not (segments > 1 or with_rle or with_dma)
+
+        self.with_sequencer   = with_sequencer
+        self.sequencer_states = sequencer_states
+
+        # Trigger occurrence counter width (0: no counter).
+        self.trigger_count_width = 16 if (with_trigger_count or with_sequencer) else 0
+        assert (segments == 1 and not with_pingpong) or not with_sequencer
+        assert (comparator_stages == 0) or not with_sequencer
+
+        # Trigger group (selected independently of the captured group).
+        self.with_trigger_group = with_trigger_group
+
+        # Cross-trigger (level trigger_in/trigger_out, not for retriggered captures) and global
+        # timestamp (LiteScopeTimestamp, 0: local scope cycles).
+        self.with_cross_trigger  = with_cross_trigger
+        self.timestamp_frequency = 0 if timestamp is None else timestamp.frequency
+        assert (segments == 1 and not with_pingpong) or not with_cross_trigger
+
+        self.with_streaming       = with_streaming
+        self.stream_packet_length = stream_packet_length
+
+        # Event counters (0: none).
+        self.counters      = counters
+        self.counter_width = counter_width
+        assert (lanes == 1) or not counters
+
+        # Histogram.
+        self.with_histogram  = with_histogram
+        self.histogram_bins  = histogram_bins
+        self.histogram_width = histogram_width
+        assert (lanes == 1) or not with_histogram
+
+        # Latency.
+        self.with_latency  = with_latency
+        self.latency_width = latency_width
+        assert (lanes == 1) or not with_latency
 
         self.csr_csv = csr_csv
 
@@ -396,12 +1998,18 @@ class LiteScopeAnalyzer(LiteXModule):
 
         # Mux.
         # ----
-        self.mux = _Mux(data_width, len(groups))
+        self.mux = _Mux(word_width, len(groups))
+        if with_trigger_group:
+            self.trigger_mux = _Mux(word_width, len(groups))
         sd = getattr(self.sync, clock_domain)
         for i, signals in groups.items():
-            s = Cat(signals)
-            if len(s) < data_width:
-                s = Cat(s, Constant(0, data_width - len(s)))
+            s = []
+            for n in range(lanes):
+                lane = Cat(*[signal[n*len(signal)//lanes:(n + 1)*len(signal)//lanes] for signal in signals])
+                if len(lane) < data_width:
+                    lane = Cat(lane, Constant(0, data_width - len(lane)))
+                s.append(lane)
+            s = Cat(*s)
             if register:
                 s_d = Signal(len(s))
                 sd += s_d.eq(s)
@@ -410,38 +2018,150 @@ class LiteScopeAnalyzer(LiteXModule):
                 self.mux.sinks[i].valid.eq(1),
                 self.mux.sinks[i].data.eq(s)
             ]
+            if with_trigger_group:
+                self.comb += [
+                    self.trigger_mux.sinks[i].valid.eq(1),
+                    self.trigger_mux.sinks[i].data.eq(s)
+                ]
 
         # Frontend.
         # ---------
-        self.trigger    = _Trigger(data_width, depth=trigger_depth)
-        self.subsampler = _SubSampler(data_width, value_width=subsampler_width)
+        if with_sequencer:
+            self.trigger = _TriggerSequencer(data_width,
+                states       = sequencer_states,
+                count_width  = self.trigger_count_width,
+                with_edges   = with_trigger_edges,
+                with_compare = with_trigger_group)
+        else:
+            self.trigger = _Trigger(data_width,
+                depth          = trigger_depth,
+                with_retrigger = (segments > 1) or with_pingpong,
+                with_edges     = with_trigger_edges,
+                with_range     = with_trigger_range,
+                count_width    = self.trigger_count_width,
+                stages         = comparator_stages,
+                lanes          = lanes,
+                with_compare   = with_trigger_group)
+        if with_trigger_group:
+            self.comb += [
+                self.trigger_mux.source.ready.eq(1),
+                self.trigger.compare.eq(self.trigger_mux.source.data),
+            ]
+        if with_cross_trigger:
+            self.cross_trigger = _CrossTrigger(word_width)
+            self.trigger_in    = self.cross_trigger.trigger_in
+            self.trigger_out   = self.cross_trigger.trigger_out
+            self.specials += MultiReg(self.trigger.enable.storage, self.cross_trigger.arm, "scope")
+        self.subsampler = _SubSampler(word_width, value_width=subsampler_width)
+        if with_qualifier:
+            self.qualifier = _Qualifier(data_width,
+                timestamp_width = qualifier_timestamp_width,
+                with_change     = with_transitional)
 
         # Storage.
         # --------
+        if with_delta:
+            self.delta = _Delta(word_width)
         if with_rle:
-            self.rle = _RLE(data_width, storage_width, rle_length)
-        self.storage = _Storage(storage_width, depth)
+            self.rle = _RLE(word_width, storage_width, rle_length, stages=comparator_stages)
+        if pack > 1:
+            self.packer = _Packer(storage_width, pack)
+        if with_dma:
+            self.storage = _DMAStorage(pack*storage_width, depth, base=dma_base, fifo_depth=dma_fifo_depth)
+        else:
+            self.storage = _Storage(pack*storage_width, depth,
+                with_wishbone = with_wishbone,
+                segments      = segments,
+                with_pingpong = with_pingpong,
+                read_width    = csr_data_width)
+        if with_wishbone or with_dma:
+            self.bus = self.storage.bus
+
+        # Free-running timestamp (latched by the storage at trigger), local or global.
+        self.timestamp = Signal(64)
+        if timestamp is None:
+            self.sync.scope += self.timestamp.eq(self.timestamp + 1)
+        else:
+            gray = Signal(len(timestamp.gray))
+            self.specials += MultiReg(timestamp.gray, gray, "scope")
+            self.timestamp_decoder = ClockDomainsRenamer("scope")(GrayDecoder(len(gray)))
+            self.comb += [
+                self.timestamp_decoder.i.eq(gray),
+                self.timestamp.eq(self.timestamp_decoder.o),
+            ]
+        self.comb += self.storage.timestamp.eq(self.timestamp)
+        if with_delta:
+            self.comb += self.delta.external_enable.eq(self.storage.post_hit)
         if with_rle:
             self.comb += [
                 self.rle.external_enable.eq(self.storage.post_hit),
                 self.rle.flush.eq(self.storage.flush),
             ]
 
-        # Pipeline: Mux -> Trigger -> Subsampler -> Storage.
-        # --------------------------------------------------
+        # Pipeline: Mux -> Trigger -> [CrossTrigger] -> Subsampler -> [Qualifier] -> [Delta] -> [RLE]
+        # -> [Packer] -> Storage.
+        # ---------------------------------------------------------------------------------------------
         pipeline = [
             self.mux,
             self.trigger,
-            self.subsampler,
         ]
+        if with_cross_trigger:
+            pipeline.append(self.cross_trigger)
+        pipeline.append(self.subsampler)
+        if with_qualifier:
+            pipeline.append(self.qualifier)
+        if with_delta:
+            pipeline.append(self.delta)
         if with_rle:
             pipeline.append(self.rle)
+        if pack > 1:
+            pipeline.append(self.packer)
         pipeline.append(self.storage)
         self.pipeline = stream.Pipeline(*pipeline)
 
+        # Event counters (tap the selected group, count every scope cycle).
+        # -----------------------------------------------------------------
+        if counters:
+            self.counter = _EventCounters(data_width, n=counters, counter_width=counter_width)
+            self.comb += [
+                self.counter.sink.valid.eq(self.mux.source.valid),
+                self.counter.sink.data.eq(self.mux.source.data),
+            ]
+
+        # Histogram (tap the selected group, accumulate every scope cycle).
+        # ------------------------------------------------------------------
+        if with_histogram:
+            self.histogram = _Histogram(data_width, bins=histogram_bins, count_width=histogram_width)
+            self.comb += [
+                self.histogram.sink.valid.eq(self.mux.source.valid),
+                self.histogram.sink.data.eq(self.mux.source.data),
+            ]
+
+        # Latency (tap the selected group, measure in scope cycles).
+        # ----------------------------------------------------------
+        if with_latency:
+            self.latency = _Latency(data_width, latency_width=latency_width)
+            self.comb += [
+                self.latency.sink.valid.eq(self.mux.source.valid),
+                self.latency.sink.data.eq(self.mux.source.data),
+            ]
+
+        # Streamer (taps samples accepted by Storage).
+        # --------------------------------------------
+        if with_streaming:
+            self.streamer = _Streamer(pack*storage_width,
+                packet_length = stream_packet_length,
+                fifo_depth    = stream_fifo_depth)
+            self.source = self.streamer.source
+            self.comb += [
+                self.streamer.sink.valid.eq(self.storage.sink.valid & self.storage.sink.ready),
+                self.streamer.sink.data.eq(self.storage.sink.data),
+            ]
+
     def format_groups(self, groups):
         if not isinstance(groups, dict):
             groups = {0 : groups}
+        self.sniffers = {}
         new_groups = {}
         for n, signals in groups.items():
             if not isinstance(signals, list):
@@ -449,7 +2169,13 @@ class LiteScopeAnalyzer(LiteXModule):
 
             split_signals = []
             for s in signals:
-                if isinstance(s, Record):
+                if isinstance(s, LiteScopeSniffer):
+                    assert n not in self.sniffers # One sniffer per group.
+                    self.sniffers[n] = s
+                    self.comb += s.beat.eq(s.condition)
+                    split_signals.append(s.beat)
+                    split_signals.extend(s.fields.values())
+                elif isinstance(s, Record):
                     split_signals.extend(s.flatten())
                 elif isinstance(s, FSM):
                     s.do_finalize()
@@ -471,12 +2197,62 @@ class LiteScopeAnalyzer(LiteXModule):
         r += format_line("config", "None", "subsampler_width", str(self.subsampler_width))
         r += format_line("config", "None", "with_rle", str(int(self.with_rle)))
         r += format_line("config", "None", "rle_length", str(self.rle_length))
+        if self.with_delta:
+            r += format_line("config", "None", "with_delta", str(int(self.with_delta)))
+        if self.lanes > 1:
+            r += format_line("config", "None", "lanes", str(self.lanes))
+        if self.pack > 1:
+            r += format_line("config", "None", "pack", str(self.pack))
+        if self.with_qualifier:
+            r += format_line("config", "None", "with_qualifier", str(int(self.with_qualifier)))
+            r += format_line("config", "None", "qualifier_timestamp_width", str(self.qualifier_timestamp_width))
+        if self.with_transitional:
+            r += format_line("config", "None", "with_transitional", str(int(self.with_transitional)))
+        if self.with_wishbone:
+            r += format_line("config", "None", "with_wishbone", str(int(self.with_wishbone)))
+        if self.with_dma:
+            r += format_line("config", "None", "with_dma", str(int(self.with_dma)))
+            r += format_line("config", "None", "dma_base", str(self.dma_base))
+        if self.read_width > 32:
+            r += format_line("config", "None", "read_width", str(self.read_width))
+        if self.segments > 1:
+            r += format_line("config", "None", "segments", str(self.segments))
+        if self.with_pingpong:
+            r += format_line("config", "None", "with_pingpong", str(int(self.with_pingpong)))
+        if self.with_sequencer:
+            r += format_line("config", "None", "with_sequencer", str(int(self.with_sequencer)))
+            r += format_line("config", "None", "sequencer_states", str(self.sequencer_states))
+        if self.trigger_count_width:
+            r += format_line("config", "None", "trigger_count_width", str(self.trigger_count_width))
+        if self.with_trigger_group:
+            r += format_line("config", "None", "with_trigger_group", str(int(self.with_trigger_group)))
+        if self.with_cross_trigger:
+            r += format_line("config", "None", "with_cross_trigger", str(int(self.with_cross_trigger)))
+        if self.timestamp_frequency:
+            r += format_line("config", "None", "timestamp_frequency", str(self.timestamp_frequency))
+        if self.counters:
+            r += format_line("config", "None", "counters", str(self.counters))
+            r += format_line("config", "None", "counter_width", str(self.counter_width))
+        if self.with_histogram:
+            r += format_line("config", "None", "with_histogram", str(int(self.with_histogram)))
+            r += format_line("config", "None", "histogram_bins", str(self.histogram_bins))
+            r += format_line("config", "None", "histogram_width", str(self.histogram_width))
+        if self.with_latency:
+            r += format_line("config", "None", "with_latency", str(int(self.with_latency)))
+            r += format_line("config", "None", "latency_width", str(self.latency_width))
+        if self.with_streaming:
+            r += format_line("config", "None", "with_streaming", str(int(self.with_streaming)))
+            r += format_line("config", "None", "stream_packet_length", str(self.stream_packet_length))
         for i, signals in self.groups.items():
             for s in signals:
                 name = vns.get_name(s)
-                r += format_line("signal", str(i), name, str(len(s)))
+                r += format_line("signal", str(i), name, str(len(s)//self.lanes))
                 for value, label in sorted(getattr(s, "_enumeration", {}).items()):
                     r += format_line("enum", str(i), name, str(value), str(label))
+        for i, sniffer in self.sniffers.items():
+            r += format_line("transaction", str(i), vns.get_name(sniffer.beat), sniffer.kind)
+            for field, s in sniffer.fields.items():
+                r += format_line("transaction_field", str(i), vns.get_name(s), field)
         write_to_file(filename, r)
 
     def do_exit(self, vns):
@@ -19,6 +19,22 @@ from litescope.software.dump import *
 import csv
 
 
+def new_dump(filename, samplerate):
+    name, ext = os.path.splitext(filename)
+    if ext == ".vcd":
+        return VCDDump(samplerate=samplerate)
+    elif ext == ".csv":
+        return CSVDump()
+    elif ext == ".py":
+        return PythonDump()
+    elif ext == ".json":
+        return JSONDump()
+    elif ext == ".sr":
+        return SigrokDump(samplerate=samplerate)
+    else:
+        raise NotImplementedError
+
+
 class LiteScopeAnalyzerDriver:
     # Logging / UI helpers -------------------------------------------------------------------------
     def _log(self, msg):
@@ -51,31 +67,44 @@ class LiteScopeAnalyzerDriver:
             raise ValueError("max_samples must be >= 0")
         limited = DumpData(data.width)
         limited.extend(list(data)[:max_samples])
+        if hasattr(data, "timestamps"):
+            limited.timestamps = data.timestamps[:max_samples]
         return limited
 
     # Driver --------------------------------------------------------------------------------------
-    def __init__(self, regs, name, config_csv=None, debug=False):
+    def __init__(self, regs, name, config_csv=None, debug=False, mem_base=None):
         self.regs = regs
         self.name = name
         self.config_csv = config_csv
         if self.config_csv is None:
             self.config_csv = name + ".csv"
         self.debug = debug
+        self.mem_base = mem_base
         self.get_config()
         self.get_layouts()
         self.build()
         self.group = 0
+        self.trigger_group = 0
         self.rle_enabled = False
+        self.delta_enabled = None
+        self.transitional_enabled = False
+        self.sequence = []
         self.data = DumpData(self.data_width)
 
         self.offset = 0
         self.length = None
+        self.storage_data = None
+        self.timestamps   = None
 
         # Disable trigger and storage
         self.trigger_enable.write(0)
         self.storage_enable.write(0)
         if hasattr(self, "rle_enable"):
             self.rle_enable.write(0)
+        if hasattr(self, "delta_mode"):
+            self.delta_mode.write(0)
+        if hasattr(self, "qualifier_enable"):
+            self.qualifier_enable.write(0)
 
     def get_config(self):
         csv_reader = csv.reader(open(self.config_csv), delimiter=',', quotechar='#')
@@ -88,11 +117,38 @@ class LiteScopeAnalyzerDriver:
         self.storage_width     = getattr(self, "storage_width", self.data_width)
         self.with_rle          = getattr(self, "with_rle", 0)
         self.rle_length        = getattr(self, "rle_length", 0)
+        self.with_delta        = getattr(self, "with_delta", 0)
+        self.with_qualifier    = getattr(self, "with_qualifier", 0)
+        self.with_transitional = getattr(self, "with_transitional", 0)
+        self.qualifier_timestamp_width = getattr(self, "qualifier_timestamp_width", 0)
         self.subsampler_width = getattr(self, "subsampler_width", 16)
+        self.with_wishbone     = getattr(self, "with_wishbone", 0)
+        self.with_dma          = getattr(self, "with_dma", 0)
+        self.dma_base          = getattr(self, "dma_base", 0)
+        self.segments          = getattr(self, "segments", 1)
+        self.with_pingpong     = getattr(self, "with_pingpong", 0)
+        self.with_sequencer    = getattr(self, "with_sequencer", 0)
+        self.sequencer_states  = getattr(self, "sequencer_states", 0)
+        self.trigger_count_width = getattr(self, "trigger_count_width", 16)
+        self.with_trigger_group  = getattr(self, "with_trigger_group", 0)
+        self.with_cross_trigger  = getattr(self, "with_cross_trigger", 0)
+        self.timestamp_frequency = getattr(self, "timestamp_frequency", 0) # 0: local timestamp.
+        self.counters          = getattr(self, "counters", 0)
+        self.counter_width     = getattr(self, "counter_width", 48)
+        self.with_histogram    = getattr(self, "with_histogram", 0)
+        self.histogram_bins    = getattr(self, "histogram_bins", 256)
+        self.histogram_width   = getattr(self, "histogram_width", 32)
+        self.with_latency      = getattr(self, "with_latency", 0)
+        self.latency_width     = getattr(self, "latency_width", 32)
+        self.lanes             = getattr(self, "lanes", 1)
+        self.read_width        = getattr(self, "read_width", 32) # mem_data CSR width.
+        self.pack              = getattr(self, "pack", 1)        # Samples per storage word.
+        self.mem_width         = self.pack*self.storage_width
 
     def get_layouts(self):
-        self.layouts = {}
-        self.enums   = {}
+        self.layouts      = {}
+        self.enums        = {}
+        self.transactions = {}
         csv_reader = csv.reader(open(self.config_csv), delimiter=',', quotechar='#')
         for item in csv_reader:
             if len(item) < 4:
@@ -105,6 +161,10 @@ class LiteScopeAnalyzerDriver:
                     self.layouts[int(g)] = [(n, int(v))]
             if t == "enum" and len(item) >= 5:
                 self.enums.setdefault((int(g), n), {})[int(v, 0)] = item[4]
+            if t == "transaction":
+                self.transactions[int(g)] = {"kind": v, "beat": n, "fields": {}}
+            if t == "transaction_field":
+                self.transactions[int(g)]["fields"][n] = v
 
     def build(self):
         for key, value in self.regs.d.items():
@@ -126,11 +186,18 @@ class LiteScopeAnalyzerDriver:
         self.group = value
         self.mux_value.write(value)
 
-    def add_trigger(self, value=0, mask=0, cond=None):
-        if self.trigger_mem_full.read():
-            raise ValueError("Trigger memory full, too much conditions")
+    def configure_trigger_group(self, value):
+        # Trigger on another group than the captured one (trigger conditions then refer to the
+        # signals of the trigger group).
+        if not self.with_trigger_group or not hasattr(self, "trigger_mux_value"):
+            raise ValueError("Trigger group is not available on this analyzer")
+        self.trigger_group = value
+        self.trigger_mux_value.write(value)
+
+    def parse_cond(self, value=0, mask=0, cond=None):
         if cond is not None:
             for k, v in cond.items():
+                v = str(v) # Accept int values.
                 # Check for binary/hexa expressions
                 mb = re.match("0b([01x]+)",  v)
                 mx = re.match("0x([0-fx]+)", v)
@@ -151,17 +218,168 @@ class LiteScopeAnalyzerDriver:
                 else:
                     value |= getattr(self, k + "_o")*int(v, 0)
                     mask  |= getattr(self, k + "_m")
+        return value, mask
+
+    def parse_edges(self, cond=None, rising=0, falling=0, change=0):
+        # Split {"name": "rising"/"falling"/"change"} entries from a condition into edge masks.
+        edges = {"rising": rising, "falling": falling, "change": change}
+        level = {}
+        for k, v in (cond or {}).items():
+            if v in edges:
+                edges[v] |= getattr(self, k + "_m")
+            else:
+                level[k] = v
+        return level, edges
+
+    def parse_range(self, cond=None):
+        # Split a magnitude entry (">N", ">=N", "<N", "<=N", "[a,b)", "[a,b]") from a condition into
+        # a (mask, min, max) range on the field (a single range per condition).
+        level = {}
+        found = None
+        for k, v in (cond or {}).items():
+            m = re.fullmatch(r"\s*(>=|<=|>|<)\s*(\w+)\s*", str(v))
+            i = re.fullmatch(r"\s*\[\s*(\w+)\s*,\s*(\w+)\s*([\])])\s*", str(v))
+            if m is None and i is None:
+                level[k] = v
+                continue
+            if found is not None:
+                raise ValueError("Only one range condition is supported per trigger")
+            field_max = getattr(self, k + "_m") // getattr(self, k + "_o")
+            lo, hi = 0, field_max
+            if m is not None:
+                op, n = m.group(1), int(m.group(2), 0)
+                lo, hi = {
+                    ">=" : (n, hi),
+                    ">"  : (n + 1, hi),
+                    "<=" : (lo, n),
+                    "<"  : (lo, n - 1),
+                }[op]
+            else:
+                lo, hi = int(i.group(1), 0), int(i.group(2), 0) - (i.group(3) == ")")
+            if lo < 0 or hi > field_max or lo > hi:
+                raise ValueError(f"Empty or out of bounds range condition on {k}: {v}")
+            found = k
+            ranges = (getattr(self, k + "_m"), lo*getattr(self, k + "_o"), hi*getattr(self, k + "_o"))
+        if found is None:
+            ranges = (0, 0, 0)
+        return level, ranges
+
+    def has_edge_triggers(self):
+        return hasattr(self, "trigger_mem_rising")
+
+    def has_range_triggers(self):
+        return hasattr(self, "trigger_mem_range_mask")
+
+    def add_trigger(self, value=0, mask=0, cond=None, rising=0, falling=0, change=0, count=1):
+        # count: trigger on the count-th occurrence of the condition.
+        if self.with_sequencer:
+            self.add_sequencer_state(value, mask, cond, count=count,
+                rising=rising, falling=falling, change=change)
+            return
+        cond, edges  = self.parse_edges(cond, rising, falling, change)
+        cond, ranges = self.parse_range(cond)
+        if any(edges.values()) and not self.has_edge_triggers():
+            raise ValueError("Edge triggers are not available on this analyzer")
+        if ranges[0] and not self.has_range_triggers():
+            raise ValueError("Range triggers are not available on this analyzer")
+        if count < 1:
+            raise ValueError("Trigger count must be >= 1")
+        if count >= 2**self.trigger_count_width:
+            raise ValueError(f"Trigger count must be < {2**self.trigger_count_width}")
+        if count > 1 and not hasattr(self, "trigger_mem_count"):
+            raise ValueError("Trigger occurrence counting is not available on this analyzer")
+        if self.trigger_mem_full.read():
+            raise ValueError("Trigger memory full, too much conditions")
+        value, mask = self.parse_cond(value, mask, cond)
         self.trigger_mem_mask.write(mask)
         self.trigger_mem_value.write(value)
+        if self.has_edge_triggers():
+            self.trigger_mem_rising.write(edges["rising"])
+            self.trigger_mem_falling.write(edges["falling"])
+            self.trigger_mem_change.write(edges["change"])
+        if self.has_range_triggers():
+            self.trigger_mem_range_mask.write(ranges[0])
+            self.trigger_mem_range_min.write(ranges[1])
+            self.trigger_mem_range_max.write(ranges[2])
+        if hasattr(self, "trigger_mem_count"):
+            self.trigger_mem_count.write(count)
         self.trigger_mem_write.write(1)
 
+    def add_sequencer_state(self, value=0, mask=0, cond=None, count=1, next=None, final=False,
+        timeout=0, timeout_next=0, rising=0, falling=0, change=0):
+        # States are programmed at run(). By default, a state goes to the following one after count
+        # matches and the last state hits; timeout (in scope cycles) branches to timeout_next.
+        if not self.with_sequencer:
+            raise ValueError("Trigger sequencer is not available on this analyzer")
+        if len(self.sequence) >= self.sequencer_states:
+            raise ValueError("Trigger sequencer memory full, too much states")
+        if count < 1:
+            raise ValueError("Sequencer state count must be >= 1")
+        if count >= 2**self.trigger_count_width:
+            raise ValueError(f"Sequencer state count must be < {2**self.trigger_count_width}")
+        cond, edges  = self.parse_edges(cond, rising, falling, change)
+        cond, ranges = self.parse_range(cond)
+        if ranges[0]:
+            raise ValueError("Range conditions are not available on the trigger sequencer")
+        if any(edges.values()) and not self.has_edge_triggers():
+            raise ValueError("Edge triggers are not available on this analyzer")
+        value, mask = self.parse_cond(value, mask, cond)
+        self.sequence.append({
+            "value"        : value,
+            "mask"         : mask,
+            **edges,
+            "count"        : count,
+            "next"         : next,
+            "final"        : final,
+            "timeout"      : timeout,
+            "timeout_next" : timeout_next,
+        })
+        return len(self.sequence) - 1
+
+    def program_sequencer(self):
+        sequence = self.sequence
+        if not sequence:
+            sequence = [{"value": 0, "mask": 0, "rising": 0, "falling": 0, "change": 0, "count": 1,
+                "next": None, "final": True, "timeout": 0, "timeout_next": 0}] # Immediate hit.
+        for i, state in enumerate(sequence):
+            final = state["final"] or (state["next"] is None and i == (len(sequence) - 1))
+            self.trigger_mem_index.write(i)
+            self.trigger_mem_mask.write(state["mask"])
+            self.trigger_mem_value.write(state["value"])
+            if self.has_edge_triggers():
+                self.trigger_mem_rising.write(state["rising"])
+                self.trigger_mem_falling.write(state["falling"])
+                self.trigger_mem_change.write(state["change"])
+            self.trigger_mem_count.write(state["count"])
+            if final:
+                next = 0
+            elif state["next"] is None:
+                next = i + 1
+            else:
+                next = state["next"]
+            self.trigger_mem_next.write(next)
+            self.trigger_mem_final.write(int(final))
+            self.trigger_mem_timeout.write(state["timeout"])
+            self.trigger_mem_timeout_next.write(state["timeout_next"])
+            self.trigger_mem_write.write(1)
+
     def add_rising_edge_trigger(self, name):
-        self.add_trigger(getattr(self, name + "_o")*0, getattr(self, name + "_m"))
-        self.add_trigger(getattr(self, name + "_o")*1, getattr(self, name + "_m"))
+        if self.has_edge_triggers():
+            self.add_trigger(cond={name: "rising"})
+        else:
+            # Older gateware without edge comparators: emulate with two sequential conditions.
+            self.add_trigger(getattr(self, name + "_o")*0, getattr(self, name + "_m"))
+            self.add_trigger(getattr(self, name + "_o")*1, getattr(self, name + "_m"))
 
     def add_falling_edge_trigger(self, name):
-        self.add_trigger(getattr(self, name + "_o")*1, getattr(self, name + "_m"))
-        self.add_trigger(getattr(self, name + "_o")*0, getattr(self, name + "_m"))
+        if self.has_edge_triggers():
+            self.add_trigger(cond={name: "falling"})
+        else:
+            self.add_trigger(getattr(self, name + "_o")*1, getattr(self, name + "_m"))
+            self.add_trigger(getattr(self, name + "_o")*0, getattr(self, name + "_m"))
+
+    def add_change_trigger(self, name):
+        self.add_trigger(cond={name: "change"})
 
     def configure_trigger(self, value=0, mask=0, cond=None):
         self.add_trigger(value, mask, cond)
@@ -175,41 +393,264 @@ class LiteScopeAnalyzerDriver:
         self.subsampling = value
         self.subsampler_value.write(value-1)
 
-    def configure_rle(self, enable=True):
+    def configure_rle(self, enable=True, ignore=None, zero=False):
+        # ignore: signals excluded from run detection (stored as 0 when zero, else repeated samples
+        # decode with the values of the first sample of the run).
         if not self.with_rle or not hasattr(self, "rle_enable"):
             if enable:
                 raise ValueError("RLE is not available on this analyzer")
             self.rle_enabled = False
             return
+        mask = 0
+        for name in ignore or []:
+            mask |= getattr(self, name + "_m")
+        if hasattr(self, "rle_ignore"):
+            self.rle_ignore.write(mask)
+            self.rle_zero.write(int(zero))
+        elif mask:
+            raise ValueError("RLE ignore mask is not available on this analyzer")
         self.rle_enabled = bool(enable)
         self.rle_enable.write(int(enable))
 
-    def run(self, offset=0, length=None):
+    def configure_delta(self, mode="sub"):
+        # Delta-encode post-trigger samples before RLE: "sub" (difference with the previous sample,
+        # for counters/addresses), "xor" (XOR with the previous sample, for few toggling bits) or
+        # None (disabled).
+        modes = {None: 0, "xor": 1, "sub": 2}
+        if mode not in modes:
+            raise ValueError("Delta mode must be one of {}".format(list(modes)))
+        if not self.with_delta or not hasattr(self, "delta_mode"):
+            if mode is not None:
+                raise ValueError("Delta encoding is not available on this analyzer")
+            return
+        self.delta_mode.write(modes[mode])
+        self.delta_enabled = mode
+
+    def configure_qualifier(self, value=0, mask=0, cond=None, enable=True):
+        # Only store samples matching the condition (trigger samples are always stored).
+        if not self.with_qualifier or not hasattr(self, "qualifier_enable"):
+            if enable:
+                raise ValueError("Storage qualifier is not available on this analyzer")
+            return
+        value, mask = self.parse_cond(value, mask, cond)
+        self.qualifier_mask.write(mask)
+        self.qualifier_value.write(value)
+        self.qualifier_enable.write(int(enable))
+
+    def configure_transitional(self, names=None, change=0, enable=True):
+        # Only store samples where the selected signals (all by default) change, upload() then
+        # rebuilds the sample-indexed view from the stored deltas.
+        if not self.with_transitional or not hasattr(self, "qualifier_change"):
+            if enable:
+                raise ValueError("Transitional storage is not available on this analyzer")
+            self.transitional_enabled = False
+            return
+        for name in names or []:
+            change |= getattr(self, name + "_m")
+        if not change:
+            change = 2**self.data_width - 1
+        self.transitional_enabled = bool(enable)
+        self.qualifier_change.write(change if enable else 0)
+        self.qualifier_enable.write(int(enable))
+
+    def configure_transactions(self, enable=True):
+        # Only store the bus beats of the current group's transaction sniffer.
+        if self.group not in self.transactions:
+            raise ValueError("Group {:d} has no transaction sniffer".format(self.group))
+        beat = self.transactions[self.group]["beat"]
+        self.configure_qualifier(cond={beat: 1}, enable=enable)
+
+    def get_transactions(self):
+        # Rebuild the transactions of the current group from the uploaded beats: stream packets
+        # (beats up to last) or Wishbone accesses (with data from dat_w/dat_r depending on we), each
+        # with the timestamp (in sample periods) of its first beat.
+        if self.group not in self.transactions:
+            raise ValueError("Group {:d} has no transaction sniffer".format(self.group))
+        sniffer    = self.transactions[self.group]
+        timestamps = getattr(self.data, "timestamps", None) or range(len(self.data))
+
+        def field(name, data):
+            return (data & getattr(self, name + "_m")) // getattr(self, name + "_o")
+
+        transactions = []
+        packet       = None
+        for timestamp, data in zip(timestamps, self.data):
+            if not field(sniffer["beat"], data):
+                continue # Trigger sample stored outside of a beat.
+            beat = {f: field(name, data) for name, f in sniffer["fields"].items()}
+            if sniffer["kind"] == "wishbone":
+                if "dat_w" in beat and "dat_r" in beat and "we" in beat:
+                    beat["data"] = beat["dat_w"] if beat["we"] else beat["dat_r"]
+                transactions.append({"timestamp": timestamp, **beat})
+                continue
+            if packet is None:
+                packet = {"timestamp": timestamp, "beats": []}
+                transactions.append(packet)
+            packet["beats"].append(beat)
+            if beat.get("last", 1):
+                packet = None
+        return transactions
+
+    def configure_cross_trigger(self, trigger_in=True, local=True):
+        # Select the hit sources: trigger_in (another analyzer's trigger_out) and/or the local trigger.
+        if not self.with_cross_trigger or not hasattr(self, "cross_trigger_enable"):
+            raise ValueError("Cross-trigger is not available on this analyzer")
+        self.cross_trigger_enable.write(int(trigger_in))
+        self.cross_trigger_local.write(int(local))
+
+    def configure_counter(self, n, value=0, mask=0, cond=None):
+        # Event counter n counts the samples matching the condition (in the current group).
+        if not self.counters:
+            raise ValueError("Event counters are not available on this analyzer")
+        if not (0 <= n < self.counters):
+            raise ValueError("Event counter must be < {:d}".format(self.counters))
+        value, mask = self.parse_cond(value, mask, cond)
+        getattr(self, f"counter_mask{n}").write(mask)
+        getattr(self, f"counter_value{n}").write(value)
+
+    def count(self, window, delay=0.2):
+        # Count the event counters matches over window scope cycles, returns the counts (saturated
+        # at 2**counter_width - 1).
+        if not self.counters:
+            raise ValueError("Event counters are not available on this analyzer")
+        if window < 1:
+            raise ValueError("Window must be >= 1")
+        if self.debug:
+            self._log(f"count (window={window})")
+        self.counter_enable.write(0)
+        self.counter_window.write(window)
+        self.counter_enable.write(1)
+        while not self.counter_done.read():
+            if delay:
+                time.sleep(delay)
+        counts = [getattr(self, f"counter_count{n}").read() for n in range(self.counters)]
+        self.counter_enable.write(0)
+        return counts
+
+    def histogram(self, name, window, shift=0, delay=0.2):
+        # Accumulate the occupancy of each value of signal name (in the current group) over window
+        # scope cycles, values are binned by 2**shift. Returns {value: count} (bins lower value) for
+        # non-empty bins, keyed by label (and including empty states) for enumerated signals.
+        if not self.with_histogram or not hasattr(self, "histogram_enable"):
+            raise ValueError("Histogram is not available on this analyzer")
+        widths = dict(self.layouts[self.group])
+        if name not in widths:
+            raise ValueError("Signal {} is not in group {:d}".format(name, self.group))
+        width = widths[name]
+        if not (0 <= shift < width):
+            raise ValueError("Histogram shift must be < {:d}".format(width))
+        bins = 2**(width - shift)
+        if bins > self.histogram_bins:
+            raise ValueError("Histogram has {:d} bins, use a shift >= {:d}".format(
+                self.histogram_bins, width - log2_int(self.histogram_bins)))
+        if window < 1:
+            raise ValueError("Window must be >= 1")
+        if self.debug:
+            self._log(f"histogram (name={name}, window={window}, shift={shift})")
+        self.histogram_enable.write(0)
+        self.histogram_mask.write(getattr(self, name + "_m"))
+        self.histogram_shift.write(log2_int(getattr(self, name + "_o")) + shift)
+        self.histogram_window.write(window)
+        self.histogram_enable.write(1)
+        while not self.histogram_done.read():
+            if delay:
+                time.sleep(delay)
+        counts = []
+        for n in range(bins):
+            self.histogram_index.write(n)
+            counts.append(self.histogram_count.read())
+        self.histogram_enable.write(0)
+
+        enum      = self.enums.get((self.group, name), {}) if shift == 0 else {}
+        histogram = {label: 0 for label in enum.values()}
+        for n, count in enumerate(counts):
+            if count:
+                histogram[enum.get(n, n << shift)] = count
+        return histogram
+
+    def configure_latency(self, start=None, stop=None):
+        # Measure latencies from the start condition to the stop condition (rising edges).
+        if not self.with_latency or not hasattr(self, "latency_enable"):
+            raise ValueError("Latency unit is not available on this analyzer")
+        start_value, start_mask = self.parse_cond(cond=start)
+        stop_value,  stop_mask  = self.parse_cond(cond=stop)
+        self.latency_start_mask.write(start_mask)
+        self.latency_start_value.write(start_value)
+        self.latency_stop_mask.write(stop_mask)
+        self.latency_stop_value.write(stop_value)
+
+    def latency(self, window, delay=0.2):
+        # Measure latencies over window scope cycles, returns count/min/max/sum/mean statistics (in
+        # scope cycles, min/max/mean are None without measurement).
+        if not self.with_latency or not hasattr(self, "latency_enable"):
+            raise ValueError("Latency unit is not available on this analyzer")
+        if window < 1:
+            raise ValueError("Window must be >= 1")
+        if self.debug:
+            self._log(f"latency (window={window})")
+        self.latency_enable.write(0)
+        self.latency_window.write(window)
+        self.latency_enable.write(1)
+        while not self.latency_done.read():
+            if delay:
+                time.sleep(delay)
+        count = self.latency_count.read()
+        stats = {
+            "count" : count,
+            "min"   : self.latency_min.read() if count else None,
+            "max"   : self.latency_max.read() if count else None,
+            "sum"   : self.latency_sum.read(),
+        }
+        stats["mean"] = stats["sum"]/count if count else None
+        self.latency_enable.write(0)
+        return stats
+
+    def run(self, offset=0, length=None, arm=True):
+        # Configure/enable the storage and (with arm) enable the trigger.
+        depth = self.depth // (2 if self.with_pingpong else self.segments)
         if length is None:
-            length = self.depth
-        assert offset < self.depth
-        assert length <= self.depth
+            length = depth
+        assert offset < depth
+        assert length <= depth
         self.offset = offset
         self.length = length
         if self.debug:
             self._log(f"run (offset={offset}, length={length})")
+        if self.with_sequencer:
+            self.program_sequencer()
         self.storage_offset.write(offset)
         self.storage_length.write(length)
         self.storage_enable.write(1)
-        self.trigger_enable.write(1)
+        if arm:
+            self.trigger_enable.write(1)
 
     def clear(self):
         self.data = DumpData(self.data_width)
+        self.sequence = []
         self.offset = 0
         self.length = None
+        self.storage_data = None
+        self.timestamps   = None
         self.rle_enabled = False
+        self.delta_enabled = None
+        self.transitional_enabled = False
         self.trigger_enable.write(0)
         self.storage_enable.write(0)
         if hasattr(self, "rle_enable"):
             self.rle_enable.write(0)
+        if hasattr(self, "delta_mode"):
+            self.delta_mode.write(0)
+        if hasattr(self, "qualifier_enable"):
+            self.qualifier_enable.write(0)
+
+    def armed(self):
+        # Storage has taken the last arm request (always True on gateware without armed status).
+        if not hasattr(self, "storage_armed"):
+            return True
+        return bool(self.storage_armed.read())
 
     def done(self):
-        return self.storage_done.read()
+        return self.armed() and self.storage_done.read()
 
     def wait_done(self, delay=0.2):
         if self.debug:
@@ -218,15 +659,95 @@ class LiteScopeAnalyzerDriver:
             if delay:
                 time.sleep(delay)
 
+    def read_storage(self, start=0, length=None):
+        # Random-access read of storage words through the Wishbone window or the DMA ring buffer
+        # (incrementing bursts).
+        if self.with_dma:
+            base  = self.dma_base
+            first = self.storage_mem_start.read()
+        elif self.with_wishbone and self.mem_base is not None:
+            base  = self.mem_base
+            first = 0 # Window is already linear.
+        else:
+            raise ValueError("Wishbone readout window is not available on this analyzer")
+        if length is None:
+            length = self.storage_mem_level.read() - start
+        if start < 0 or length < 0 or (start + length) > self.depth:
+            raise ValueError("Storage range must be within analyzer depth")
+
+        swpw   = (self.mem_width + 31) // 32              # Sub-Words per word
+        stride = 2**log2_int(swpw, need_pow2=False)       # Bus words per word
+        mwbl   = 192 // stride                            # Max Burst len (in # of words)
+        storage_data = DumpData(self.mem_width)
+
+        cur = 0
+        self._progress(0, length)
+        while cur < length:
+            index = (first + start + cur) % self.depth
+            rdw   = min(length - cur, mwbl, self.depth - index)
+            addr  = base + 4*stride*index
+            datas = self.storage_mem_level.readfn(addr, length=rdw*stride, burst="incr")
+            for i in range(rdw):
+                v = 0
+                for j in range(swpw):
+                    v |= datas[i*stride + j] << (32 * j)
+                storage_data.append(v)
+            cur += rdw
+            self._progress(cur, length)
+        self._progress_end()
+        return storage_data
+
     def upload(self, max_samples=None):
         length = self.storage_mem_level.read()
         if self.debug:
             self._log(f"upload (words={length})")
 
+        if self.with_dma or (self.with_wishbone and self.mem_base is not None):
+            storage_data = self.read_storage(0, length)
+        else:
+            storage_data = self._upload_csr(length)
+        if self.pack > 1:
+            storage_data = storage_data.split_lanes(self.pack, self.storage_width)
+        self.storage_data = storage_data
+
+        word_width = self.lanes*self.data_width
+        if self.with_rle:
+            if self.rle_enabled:
+                self.data = storage_data.decode_rle(data_width=word_width)
+            else:
+                data_mask = 2**word_width - 1
+                self.data = DumpData(word_width)
+                self.data.extend([d & data_mask for d in storage_data])
+            if self.delta_enabled is not None:
+                # Deltas follow the sample after the trigger sample.
+                self.data = self.data.decode_delta(self._trigger_sample_index() + 1,
+                    xor = self.delta_enabled == "xor")
+        elif self.with_qualifier:
+            # Qualified samples, with timestamps (in sample periods) in data.timestamps.
+            self.data = storage_data.decode_timestamps(data_width=self.data_width)
+            self.timestamps = self.data.timestamps
+            if self.transitional_enabled:
+                self.data = self.data.expand_timestamps()
+        else:
+            self.data = storage_data
+        if self.lanes > 1:
+            self.data = self.data.split_lanes(self.lanes, self.data_width)
+        self.data = self._limit_samples(self.data, max_samples)
+
+        # Capture metadata.
+        self.data.trigger = self.trigger_index()
+        if hasattr(self, "storage_cycles"):
+            self.data.cycles = self.storage_cycles.read()
+        if hasattr(self, "storage_trigger_timestamp"):
+            self.data.trigger_timestamp = self.storage_trigger_timestamp.read()
+        return self.data
+
+    def _upload_csr(self, length):
         remaining = length
-        swpw = (self.storage_width + 31) // 32 # Sub-Words per word
+        rw   = self.read_width
+        swpw = (self.mem_width + rw - 1) // rw # Sub-Words per word
         mwbl = 192 // swpw                     # Max Burst len (in # of words)
-        storage_data = DumpData(self.storage_width)
+        storage_data = DumpData(self.mem_width)
 
         cur = 0
         self._progress(0, length)
@@ -240,7 +761,7 @@ class LiteScopeAnalyzerDriver:
                 j = i % swpw
                 if j == 0:
                     v = 0
-                v |= sv << (32 * j)
+                v |= sv << (rw * j)
                 if j == (swpw - 1):
                     storage_data.append(v)
 
@@ -249,37 +770,72 @@ class LiteScopeAnalyzerDriver:
             self._progress(cur, length)
 
         self._progress_end()
-        if self.with_rle:
-            if self.rle_enabled:
-                self.data = storage_data.decode_rle(data_width=self.data_width)
-            else:
-                data_mask = 2**self.data_width - 1
-                self.data = DumpData(self.data_width)
-                self.data.extend([d & data_mask for d in storage_data])
-        else:
-            self.data = storage_data
-        self.data = self._limit_samples(self.data, max_samples)
-        return self.data
+        return storage_data
+
+    def upload_segments(self, max_samples=None):
+        # Upload each captured segment, returns a list of DumpData with trigger (trigger sample
+        # index) and timestamp (scope cycles from arm to trigger) attributes.
+        if self.segments <= 1:
+            raise ValueError("Segmented capture is not available on this analyzer")
+        captures = []
+        for n in range(self.storage_segment_count.read()):
+            self.storage_segment_sel.write(n)
+            data = self.upload(max_samples=max_samples)
+            data.trigger   = self.storage_segment_trigger.read()
+            data.timestamp = self.storage_segment_timestamp.read()
+            captures.append(data)
+        return captures
+
+    def captures(self, count=None, max_samples=None, delay=0.2):
+        # Yield consecutive ping-pong captures (from bank 0 after run): each bank is released for a
+        # new capture as soon as uploaded, while the other bank keeps capturing.
+        if not self.with_pingpong:
+            raise ValueError("Ping-pong storage is not available on this analyzer")
+        bank = 0
+        n    = 0
+        while (count is None) or (n < count):
+            while not (self.storage_bank_ready.read() >> bank) & 0b1:
+                if delay:
+                    time.sleep(delay)
+            self.storage_bank_sel.write(bank)
+            data = self.upload(max_samples=max_samples)
+            self.storage_bank_release.write(1)
+            yield data
+            bank ^= 1
+            n    += 1
+
+    def trigger_index(self):
+        # Trigger sample index in the capture, from the stored pre-trigger word count (offset on
+        # gateware without capture metadata). Sample-accurate with packing, RLE and transitional
+        # storage, lane-accurate with multiple lanes.
+        index = self._trigger_sample_index()
+        if self.transitional_enabled and self.timestamps:
+            index = self.timestamps[min(index, len(self.timestamps) - 1)]
+        if self.lanes > 1:
+            index = max((index - 1)*self.lanes + self.trigger_lane.read() + 1, 0)
+        return index
+
+    def _trigger_sample_index(self):
+        # Trigger index in the stored (unpacked, RLE-decoded) samples/words.
+        index = self.offset
+        if hasattr(self, "storage_pre_trigger"):
+            index = self.storage_pre_trigger.read()
+        if self.pack > 1:
+            index = index*self.pack + self.packer_hit_position.read()
+        if self.rle_enabled and self.storage_data is not None:
+            words = DumpData(self.storage_width)
+            words.extend(list(self.storage_data)[:index])
+            index = len(words.decode_rle())
+        return index
 
     def save(self, filename, samplerate=None, flatten=False):
         if samplerate is None:
-            samplerate = self.samplerate / self.subsampling
+            samplerate = self.lanes * self.samplerate / self.subsampling
         if self.debug:
             self._log(f"write {filename}")
 
         name, ext = os.path.splitext(filename)
-        if ext == ".vcd":
-            dump = VCDDump(samplerate=samplerate)
-        elif ext == ".csv":
-            dump = CSVDump()
-        elif ext == ".py":
-            dump = PythonDump()
-        elif ext == ".json":
-            dump = JSONDump()
-        elif ext == ".sr":
-            dump = SigrokDump(samplerate=samplerate)
-        else:
-            raise NotImplementedError
+        dump = new_dump(filename, samplerate)
         if not flatten:
             enums = {
                 name: self.enums[(self.group, name)]
@@ -290,7 +846,7 @@ class LiteScopeAnalyzerDriver:
         else:
             dump.add_from_layout_flatten(self.layouts[self.group], self.data)
         dump.add_scope_clk()
-        dump.add_scope_trig(self.offset)
+        dump.add_scope_trig(self.trigger_index())
 
         if ext == ".vcd" and not flatten:
             gtkw_filters = self.write_gtkw_filters(filename)
@@ -329,3 +885,69 @@ class LiteScopeAnalyzerDriver:
         min_idx = log2_int(getattr(self, name + "_o"))
         max_idx = min_idx + log2_int((getattr(self, name + "_m") >> min_idx) + 1)
         return self.data[min_idx:max_idx][0]
+
+
+class LiteScopeMultiAnalyzerDriver:
+    # Coherent captures on several analyzers (cross-triggered and/or sharing a LiteScopeTimestamp),
+    # exported as one time-aligned dump.
+    def __init__(self, analyzers):
+        self.analyzers = analyzers
+
+    def run(self, offset=0, length=None):
+        # Disarm all analyzers (clearing their trigger_out), configure their storage, then enable all
+        # the triggers back-to-back.
+        for analyzer in self.analyzers:
+            analyzer.trigger_enable.write(0)
+        for analyzer in self.analyzers:
+            analyzer.run(offset, length, arm=False)
+        for analyzer in self.analyzers:
+            analyzer.trigger_enable.write(1)
+
+    def done(self):
+        return all(analyzer.done() for analyzer in self.analyzers)
+
+    def wait_done(self, delay=0.2):
+        while not self.done():
+            if delay:
+                time.sleep(delay)
+
+    def upload(self, max_samples=None):
+        return [analyzer.upload(max_samples=max_samples) for analyzer in self.analyzers]
+
+    def save(self, filename):
+        # Place the uploaded samples of each analyzer on the global timestamp (from their trigger
+        # timestamp and sample period) and resample them at the fastest sample rate, signals are
+        # prefixed with the analyzer name and scope_trig marks the first trigger.
+        captures = []
+        for analyzer in self.analyzers:
+            data = analyzer.data
+            if not analyzer.timestamp_frequency or not hasattr(data, "trigger_timestamp"):
+                raise ValueError("{} has no global timestamp".format(analyzer.name))
+            if not len(data):
+                raise ValueError("{} has no uploaded samples".format(analyzer.name))
+            period  = getattr(analyzer, "subsampling", 1)/(analyzer.lanes*analyzer.samplerate)
+            trigger = data.trigger_timestamp/analyzer.timestamp_frequency
+            captures.append((analyzer, trigger - data.trigger*period, period, trigger))
+        period = min(p for _, _, p, _ in captures)
+        start  = min(s for _, s, _, _ in captures)
+        end    = max(s + len(a.data)*p for a, s, p, _ in captures)
+        length = int(round((end - start)/period))
+
+        dump = new_dump(filename, 1/period)
+        for analyzer, first, sample_period, _ in captures:
+            values  = list(analyzer.data)
+            samples = DumpData(analyzer.data.width)
+            for n in range(length):
+                index = int((start + (n + 0.5)*period - first)//sample_period)
+                samples.append(values[min(max(index, 0), len(values) - 1)])
+            layout = analyzer.layouts[analyzer.group]
+            enums  = {
+                f"{analyzer.name}_{name}": analyzer.enums[(analyzer.group, name)]
+                for name, width in layout
+                if (analyzer.group, name) in analyzer.enums
+            }
+            dump.add_from_layout([(f"{analyzer.name}_{name}", width) for name, width in layout],
+                samples, enums=enums)
+        dump.add_scope_clk()
+        dump.add_scope_trig(int(round((min(t for _, _, _, t in captures) - start)/period)))
+        dump.write(filename)
@@ -0,0 +1,97 @@
+#
+# This file is part of LiteScope.
+#
+# Copyright (c) 2026 Florent Kermarrec <florent@enjoy-digital.fr>
+# SPDX-License-Identifier: BSD-2-Clause
+
+import csv
+import struct
+
+from litescope.software.dump.common import DumpData
+
+STREAM_MAGIC = 0x5c
+
+
+class LiteScopeStreamReceiver:
+    def __init__(self, config_csv, byteorder="little"):
+        self.config_csv = config_csv
+        self.byteorder  = byteorder
+        self.get_config()
+
+        self.swpw         = (self.pack*self.storage_width + 31) // 32 # Sub-Words per word
+        self.packet_words = 2 + self.stream_packet_length*self.swpw
+        self.clear()
+
+    def get_config(self):
+        csv_reader = csv.reader(open(self.config_csv), delimiter=',', quotechar='#')
+        for item in csv_reader:
+            if len(item) < 4:
+                continue
+            t, g, n, v = item[:4]
+            if t == "config":
+                setattr(self, n, int(v))
+        self.storage_width        = getattr(self, "storage_width", self.data_width)
+        self.with_rle             = getattr(self, "with_rle", 0)
+        self.stream_packet_length = getattr(self, "stream_packet_length", 64)
+        self.lanes                = getattr(self, "lanes", 1)
+        self.pack                 = getattr(self, "pack", 1)
+
+    def clear(self):
+        self.data      = DumpData(self.data_width)
+        self.sequence  = None
+        self.lost      = 0 # Lost packets (sequence gaps).
+        self.overflow  = 0 # Samples dropped by the gateware.
+        self.resyncs   = 0 # Words skipped to find a packet header.
+        self.last_data = 0
+        self._bytes    = b""
+        self._words    = []
+
+    def feed(self, data):
+        # Accepts raw bytes (any chunking, e.g. UDP datagrams or TCP reads) or 32-bit words and
+        # returns the newly decoded samples (also accumulated in self.data).
+        if isinstance(data, (bytes, bytearray)):
+            self._bytes += bytes(data)
+            n = len(self._bytes) // 4
+            fmt = ("<" if self.byteorder == "little" else ">") + f"{n}I"
+            self._words.extend(struct.unpack(fmt, self._bytes[:4*n]))
+            self._bytes = self._bytes[4*n:]
+        else:
+            self._words.extend(data)
+
+        storage_data = DumpData(self.storage_width)
+        while len(self._words) >= self.packet_words:
+            header = self._words[0]
+            if (header >> 24) != STREAM_MAGIC:
+                self._words.pop(0)
+                self.resyncs += 1
+                continue
+            sequence = header & 0xffffff
+            if self.sequence is not None:
+                self.lost += (sequence - self.sequence - 1) % 2**24
+            self.sequence = sequence
+            self.overflow = self._words[1]
+
+            payload = self._words[2:self.packet_words]
+            for i in range(0, len(payload), self.swpw):
+                v = 0
+                for j in range(self.swpw):
+                    v |= payload[i + j] << (32 * j)
+                storage_data.append(v)
+            self._words = self._words[self.packet_words:]
+        if self.pack > 1:
+            storage_data = storage_data.split_lanes(self.pack, self.storage_width)
+
+        word_width = self.lanes*self.data_width
+        if self.with_rle:
+            # Raw samples have a 0 marker bit, so decoding is valid whether RLE is active or not.
+            data = storage_data.decode_rle(data_width=word_width, last_data=self.last_data)
+        else:
+            data_mask = 2**word_width - 1
+            data = DumpData(word_width)
+            data.extend([d & data_mask for d in storage_data])
+        if len(data):
+            self.last_data = list.__getitem__(data, -1) # DumpData indexing slices bits.
+        if self.lanes > 1:
+            data = data.split_lanes(self.lanes, self.data_width)
+        self.data.extend(data)
+        return data
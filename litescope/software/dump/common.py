@@ -52,14 +52,13 @@ class DumpData(list):
         else:
             raise KeyError
 
-    def decode_rle(self, data_width=None):
+    def decode_rle(self, data_width=None, last_data=0):
         marker_bit = self.width - 1
         data_width = marker_bit if data_width is None else data_width
         data_mask  = 2**data_width - 1
         rle_mask   = 2**marker_bit - 1
 
         datas = DumpData(data_width)
-        last_data = 0
         for data in self:
             rle = data >> marker_bit
             payload = data & rle_mask
@@ -70,6 +69,55 @@ class DumpData(list):
                 datas.append(last_data)
         return datas
 
+    def decode_delta(self, start, xor=False):
+        # Rebuild samples following start from their delta (difference, or XOR) with the previous
+        # sample, samples up to start are raw.
+        data_mask = 2**self.width - 1
+
+        datas = DumpData(self.width)
+        last  = 0
+        for i, data in enumerate(self):
+            if i > start:
+                data = (last ^ data) if xor else ((last + data) & data_mask)
+            datas.append(data)
+            last = data
+        return datas
+
+    def split_lanes(self, lanes, data_width):
+        # Un-interleave words of lanes samples (oldest sample in LSBs).
+        data_mask = 2**data_width - 1
+
+        datas = DumpData(data_width)
+        for data in self:
+            for n in range(lanes):
+                datas.append((data >> (n*data_width)) & data_mask)
+        return datas
+
+    def decode_timestamps(self, data_width):
+        # Split qualified samples from their delta (samples elapsed since the previous stored sample)
+        # and accumulate deltas in timestamps (in sample periods, first sample at 0).
+        data_mask = 2**data_width - 1
+
+        datas = DumpData(data_width)
+        datas.timestamps = []
+        timestamp = 0
+        for i, data in enumerate(self):
+            if i:
+                timestamp += data >> data_width
+            datas.append(data & data_mask)
+            datas.timestamps.append(timestamp)
+        return datas
+
+    def expand_timestamps(self):
+        # Rebuild the sample-indexed view of timestamped samples (each sample held until the next).
+        datas = DumpData(self.width)
+        for i, data in enumerate(self):
+            if i < (len(self) - 1):
+                datas.extend([data]*(self.timestamps[i + 1] - self.timestamps[i]))
+            else:
+                datas.append(data)
+        return datas
+
 
 class DumpVariable:
     def __init__(self, name, width, values=[], enum=None):
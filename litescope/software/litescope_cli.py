@@ -67,6 +67,11 @@ def add_triggers(args, analyzer, signals):
         analyzer.add_falling_edge_trigger(finder[signal])
         print(f"Falling edge: {name}")
         added = True
+    for signal in args.change or []:
+        name = finder[signal]
+        analyzer.add_change_trigger(name)
+        print(f"Any change: {name}")
+        added = True
     cond = {}
     for signal, value in args.value_trigger or []:
         name = finder[signal]
@@ -83,12 +88,15 @@ def run_batch(args):
     bus = RemoteClient(host=args.host, port=args.port, csr_csv=args.csr_csv)
     bus.open()
 
-    basename = os.path.splitext(os.path.basename(args.csv))[0]
-    signals  = get_signals(args.csv, args.group)
+    basename      = os.path.splitext(os.path.basename(args.csv))[0]
+    trigger_group = args.group if args.trigger_group is None else args.trigger_group
+    signals       = get_signals(args.csv, trigger_group)
 
     # Configure and run LiteScope analyzer.
     analyzer = LiteScopeAnalyzerDriver(bus.regs, basename, config_csv=args.csv, debug=True)
     analyzer.configure_group(args.group)
+    if args.trigger_group is not None:
+        analyzer.configure_trigger_group(args.trigger_group)
     analyzer.configure_subsampler(args.subsampling)
     analyzer.configure_rle(args.rle)
     if not add_triggers(args, analyzer, signals):
@@ -104,6 +112,26 @@ def run_batch(args):
     # Close remove control.
     bus.close()
 
+def run_histogram(args):
+    bus = RemoteClient(host=args.host, port=args.port, csr_csv=args.csr_csv)
+    bus.open()
+
+    basename = os.path.splitext(os.path.basename(args.csv))[0]
+
+    # Accumulate and print LiteScope analyzer histogram.
+    analyzer = LiteScopeAnalyzerDriver(bus.regs, basename, config_csv=args.csv, debug=True)
+    analyzer.configure_group(args.group)
+    histogram = analyzer.histogram(args.histogram,
+        window = int(args.histogram_window, 0),
+        shift  = args.histogram_shift
+    )
+    total = sum(histogram.values())
+    for value, count in histogram.items():
+        print("{:>20}: {:d} ({:.2f}%)".format(str(value), count, 100*count/total if total else 0))
+
+    # Close remove control.
+    bus.close()
+
 def run_gui(args):
     import dearpygui.dearpygui as dpg
 
@@ -172,6 +200,8 @@ def parse_args():
               --group selects the analyzer capture group. Groups are created by passing
                       a dict to LiteScopeAnalyzer on the SoC side. Use --list --group=N
                       to show the signals available in a group.
+              --trigger-group selects the group the triggers are evaluated on (analyzers
+                      built with with_trigger_group=True), defaults to the capture group.
               --subsampling keeps one sample every N scope clock cycles. 1 means no
                       subsampling. The effective dump sample rate is samplerate / N.
               --offset selects how many pre-trigger samples are kept in the dump, so
@@ -183,6 +213,7 @@ def parse_args():
         """))
     parser.add_argument("-r", "--rising-edge",   action="append",          help="Add rising edge trigger.")
     parser.add_argument("-f", "--falling-edge",  action="append",          help="Add falling edge trigger.")
+    parser.add_argument("-c", "--change",        action="append",          help="Add any-change trigger.")
     parser.add_argument("-v", "--value-trigger", action="append", nargs=2, help="Add conditional trigger with given value.",
         metavar=("TRIGGER", "VALUE"))
     parser.add_argument("-l", "--list",          action="store_true",      help="List signal choices.")
@@ -191,12 +222,16 @@ def parse_args():
     parser.add_argument("--csv",                 default="analyzer.csv",   help="Analyzer CSV file.")
     parser.add_argument("--csr-csv",             default="csr.csv",        help="SoC CSV file.")
     parser.add_argument("--group",               default=0, type=int,      help="Capture group to use from analyzer.csv.")
+    parser.add_argument("--trigger-group",       default=None, type=int,   help="Trigger group to use from analyzer.csv (default: capture group).")
     parser.add_argument("--subsampling",         default=1, type=int,      help="Keep one sample every N scope clock cycles.")
     parser.add_argument("--rle",                 action="store_true",      help="Enable analyzer run-length encoding.")
     parser.add_argument("--offset",              default="32",             help="Pre-trigger sample count.")
     parser.add_argument("--length",              default=None,             help="Stored sample/word count to capture; default is analyzer depth.")
     parser.add_argument("--dump",                default="dump.vcd",       help="Capture Filename.")
     parser.add_argument("--gui",                 action="store_true",      help="Run Gui.")
+    parser.add_argument("--histogram",           default=None,             help="Print the occupancy histogram of a signal (instead of capturing).")
+    parser.add_argument("--histogram-window",    default="100000000",      help="Histogram window (in scope clock cycles).")
+    parser.add_argument("--histogram-shift",     default=0, type=int,      help="Histogram bin shift (2**N values per bin).")
     args = parser.parse_args()
     return args
 
@@ -221,8 +256,10 @@ def main():
         raise ValueError("{} not found. This is necessary to load the 'regs' of the remote. Try setting --csr-csv here to "
                          "the path to the --csr-csv argument of the SoC build.".format(args.csr_csv))
 
-    # Run Batch/Gui.
-    if args.gui:
+    # Run Histogram/Batch/Gui.
+    if args.histogram is not None:
+        run_histogram(args)
+    elif args.gui:
         run_gui(args)
     else:
         run_batch(args)
@@ -9,7 +9,11 @@ import tempfile
 
 from migen import *
 
-from litescope import LiteScopeAnalyzer
+from litex.soc.interconnect import stream
+from litex.soc.interconnect import wishbone
+
+from litescope import LiteScopeAnalyzer, LiteScopeSniffer, LiteScopeTimestamp
+from litescope.core import DELTA_SUB
 from litescope.software.dump.common import DumpData
 
 
@@ -29,6 +33,30 @@ def read_capture_words(analyzer, length):
     return data
 
 
+def read_segments(analyzer, timeout=4096):
+    seen_busy = False
+    for i in range(timeout):
+        done = (yield from analyzer.storage.done.read())
+        if not done:
+            seen_busy = True
+        elif seen_busy:
+            break
+        yield
+    else:
+        raise TimeoutError("Segmented capture did not complete")
+    segments = []
+    for n in range((yield from analyzer.storage.segment_count.read())):
+        yield from analyzer.storage.segment_sel.write(n)
+        for i in range(8):
+            yield
+        level     = (yield from analyzer.storage.mem_level.read())
+        trigger   = (yield from analyzer.storage.segment_trigger.read())
+        timestamp = (yield from analyzer.storage.segment_timestamp.read())
+        data      = (yield from read_capture_words(analyzer, level))
+        segments.append((data, trigger, timestamp))
+    return segments
+
+
 class TestAnalyzer(unittest.TestCase):
     def test_analyzer(self):
         def generator(dut):
@@ -45,10 +73,11 @@ class TestAnalyzer(unittest.TestCase):
             yield from dut.analyzer.storage.length.write(256)
             yield from dut.analyzer.storage.offset.write(8)
             yield from dut.analyzer.storage.enable.write(1)
+            yield from dut.analyzer.trigger.enable.write(1)
             yield
-            for i in range(16):
-                yield
             # Wait capture
+            while not (yield from dut.analyzer.storage.armed.read()):
+                yield
             while not (yield from dut.analyzer.storage.done.read()):
                 yield
             # Read captured datas
@@ -64,7 +93,11 @@ class TestAnalyzer(unittest.TestCase):
         generators = {"sys" : [generator(dut)]}
         clocks     = {"sys": 10, "scope": 10}
         run_simulation(dut, generators, clocks, vcd_name="sim.vcd")
-        self.assertEqual(dut.data, [524 + 3*i for i in range(len(dut.data))])
+        # Arming is immediate (no depth-cycle flush): the capture holds the pre-trigger samples
+        # taken since arm and the subsampled trigger sample (0x10 hit seen on 0x11..0x13).
+        self.assertEqual(len(dut.data), 256)
+        self.assertEqual(dut.data, [dut.data[0] + 3*i for i in range(len(dut.data))])
+        self.assertTrue(any(0x11 <= d <= 0x13 for d in dut.data[:9]))
 
     def test_analyzer_group_mux(self):
         def generator(dut):
@@ -105,7 +138,57 @@ class TestAnalyzer(unittest.TestCase):
         generators = {"sys" : [generator(dut)]}
         clocks     = {"sys": 10, "scope": 10}
         run_simulation(dut, generators, clocks)
-        self.assertEqual(dut.data, [132 + 3*i for i in range(len(dut.data))])
+        # Trigger conditions are no longer flushed at reset: hit on the sample after 0xb0.
+        self.assertEqual(dut.data, [0xb3 + 3*i for i in range(len(dut.data))])
+
+    def test_analyzer_trigger_group(self):
+        def generator(dut):
+            yield from dut.analyzer.mux.value.write(1)
+            yield from dut.analyzer.trigger_mux.value.write(0)
+
+            # Trigger on the first group while capturing the second one.
+            yield from dut.analyzer.trigger.mem_value.write(0x10)
+            yield from dut.analyzer.trigger.mem_mask.write(0xff)
+            yield from dut.analyzer.trigger.mem_write.write(1)
+
+            yield from dut.analyzer.subsampler.value.write(0)
+            yield from dut.analyzer.storage.length.write(16)
+            yield from dut.analyzer.storage.offset.write(0)
+            yield from dut.analyzer.storage.enable.write(1)
+            yield from dut.analyzer.trigger.enable.write(1)
+            yield
+
+            seen_busy = False
+            for i in range(1024):
+                done = (yield from dut.analyzer.storage.done.read())
+                if not done:
+                    seen_busy = True
+                elif seen_busy:
+                    break
+                yield
+            else:
+                raise TimeoutError("Trigger group capture did not complete")
+            dut.data = (yield from read_capture(dut.analyzer))
+
+        class DUT(Module):
+            def __init__(self):
+                counter = Signal(8)
+                other   = Signal(8, reset=0xa0)
+                self.sync += [
+                    counter.eq(counter + 1),
+                    other.eq(other + 3),
+                ]
+                self.submodules.analyzer = LiteScopeAnalyzer({
+                    0: counter,
+                    1: other,
+                }, 64, with_trigger_group=True, csr_csv=None)
+
+        dut = DUT()
+        generators = {"sys" : [generator(dut)]}
+        clocks     = {"sys": 10, "scope": 10}
+        run_simulation(dut, generators, clocks)
+        # Hit on the sample after counter == 0x10 (other == 0xa0 + 3*0x11, modulo 256).
+        self.assertEqual(dut.data, [(0xd3 + 3*i) % 256 for i in range(16)])
 
     def test_analyzer_raw_msb_data_without_rle(self):
         def generator(dut):
@@ -197,6 +280,53 @@ class TestAnalyzer(unittest.TestCase):
         decoded = encoded.decode_rle(data_width=dut.analyzer.data_width)
         self.assertEqual(list(decoded), [5]*6)
 
+    def test_analyzer_rle_ignore_mask(self):
+        def generator(dut):
+            yield from dut.analyzer.trigger.mem_value.write(0)
+            yield from dut.analyzer.trigger.mem_mask.write(0)
+            yield from dut.analyzer.trigger.mem_write.write(1)
+
+            # Ignore (and zero) the toggling bit.
+            yield from dut.analyzer.rle.ignore.write(0x1)
+            yield from dut.analyzer.rle.zero.write(1)
+            yield from dut.analyzer.rle.enable.write(1)
+            yield from dut.analyzer.subsampler.value.write(0)
+            yield from dut.analyzer.storage.length.write(4)
+            yield from dut.analyzer.storage.offset.write(0)
+            yield from dut.analyzer.storage.enable.write(1)
+            yield from dut.analyzer.trigger.enable.write(1)
+            yield
+
+            seen_busy = False
+            for i in range(128):
+                done = (yield from dut.analyzer.storage.done.read())
+                if not done:
+                    seen_busy = True
+                elif seen_busy:
+                    break
+                yield
+            else:
+                raise TimeoutError("RLE capture did not complete")
+
+            dut.data = (yield from read_capture_words(dut.analyzer, 4))
+
+        class DUT(Module):
+            def __init__(self):
+                toggle = Signal()
+                value  = Signal(4)
+                self.sync += toggle.eq(~toggle)
+                self.comb += value.eq(Cat(toggle, Constant(5, 3)))
+                self.submodules.analyzer = LiteScopeAnalyzer(value, 16,
+                    with_rle   = True,
+                    rle_length = 4,
+                    csr_csv    = None)
+
+        dut = DUT()
+        generators = {"sys" : [generator(dut)]}
+        clocks     = {"sys": 10, "scope": 10}
+        run_simulation(dut, generators, clocks)
+        self.assertEqual(dut.data, [0xa, 0xa, 0x10 | 3, 0x10 | 1])
+
     def test_analyzer_rle_changing_runs(self):
         def generator(dut):
             yield from dut.analyzer.trigger.mem_value.write(0)
@@ -250,6 +380,66 @@ class TestAnalyzer(unittest.TestCase):
         self.assertGreater(len(set(decoded_samples)), 3)
         self.assertTrue(all(b in (a, a + 1) for a, b in zip(decoded_samples, decoded_samples[1:])))
 
+    def test_analyzer_delta_rle(self):
+        def generator(dut):
+            yield from dut.analyzer.trigger.mem_value.write(0x20)
+            yield from dut.analyzer.trigger.mem_mask.write(0xff)
+            yield from dut.analyzer.trigger.mem_write.write(1)
+
+            yield from dut.analyzer.delta.mode.write(DELTA_SUB)
+            yield from dut.analyzer.rle.enable.write(1)
+            yield from dut.analyzer.subsampler.value.write(0)
+            yield from dut.analyzer.storage.length.write(8)
+            yield from dut.analyzer.storage.offset.write(2)
+            yield from dut.analyzer.storage.enable.write(1)
+            yield from dut.analyzer.trigger.enable.write(1)
+            yield
+
+            seen_busy = False
+            for i in range(1024):
+                done = (yield from dut.analyzer.storage.done.read())
+                if not done:
+                    seen_busy = True
+                elif seen_busy:
+                    break
+                yield
+            else:
+                raise TimeoutError("Delta capture did not complete")
+
+            dut.pre_trigger = (yield from dut.analyzer.storage.pre_trigger.read())
+            dut.data        = (yield from read_capture_words(dut.analyzer, 8))
+
+        class DUT(Module):
+            def __init__(self):
+                counter = Signal(8)
+                self.sync += counter.eq(counter + 1)
+                self.submodules.analyzer = LiteScopeAnalyzer(counter, 16,
+                    with_rle   = True,
+                    rle_length = 64,
+                    with_delta = True,
+                    csr_csv    = None)
+
+        dut = DUT()
+        generators = {"sys" : [generator(dut)]}
+        clocks     = {"sys": 10, "scope": 10}
+        run_simulation(dut, generators, clocks)
+
+        # Pre-trigger, trigger and anchor samples are raw, then constant deltas are RLE runs.
+        encoded = DumpData(dut.analyzer.storage_width)
+        encoded.extend(dut.data)
+        decoded = encoded.decode_rle(data_width=dut.analyzer.data_width)
+        words   = DumpData(dut.analyzer.storage_width)
+        words.extend(dut.data[:dut.pre_trigger])
+        trigger = len(words.decode_rle())
+        samples = list(decoded.decode_delta(trigger + 1))
+        self.assertEqual(dut.data[trigger + 2], 1)
+        self.assertGreater(len(samples), 4*len(dut.data))
+        self.assertEqual(samples[trigger - 1], 0x20)
+        # Samples are consecutive, except the ones dropped while RLE emits a full run.
+        deltas = [(b - a) % 256 for a, b in zip(samples, samples[1:])]
+        self.assertTrue(set(deltas) <= {1, 2})
+        self.assertEqual(deltas.count(2), len([d for d in dut.data if d == 0x100 | 63]))
+
     def test_analyzer_rle_disabled_keeps_raw_capture(self):
         def generator(dut):
             yield from dut.analyzer.trigger.mem_value.write(0)
@@ -293,46 +483,1394 @@ class TestAnalyzer(unittest.TestCase):
         self.assertEqual(dut.analyzer.storage_width, 9)
         self.assertEqual(dut.data, list(range(dut.data[0], dut.data[0] + len(dut.data))))
 
-    def test_format_groups_splits_records_and_deduplicates(self):
-        signal = Signal(1)
-        record = Record([("field0", 3), ("field1", 5)])
+    def test_analyzer_wide_csr_read_width(self):
+        def generator(dut):
+            yield from dut.analyzer.trigger.mem_value.write(0)
+            yield from dut.analyzer.trigger.mem_mask.write(0)
+            yield from dut.analyzer.trigger.mem_write.write(1)
 
-        analyzer = LiteScopeAnalyzer([signal, signal, record], 16, csr_csv=None)
+            yield from dut.analyzer.subsampler.value.write(0)
+            yield from dut.analyzer.storage.length.write(4)
+            yield from dut.analyzer.storage.offset.write(0)
+            yield from dut.analyzer.storage.enable.write(1)
+            yield from dut.analyzer.trigger.enable.write(1)
+            yield
+            while not (yield from dut.analyzer.storage.armed.read()):
+                yield
+            while not (yield from dut.analyzer.storage.done.read()):
+                yield
+            dut.data = (yield from read_capture(dut.analyzer))
 
-        self.assertEqual(analyzer.groups[0], [signal, record.field0, record.field1])
-        self.assertEqual(analyzer.data_width, 9)
+        class DUT(Module):
+            def __init__(self):
+                counter = Signal(8)
+                wide    = Signal(72)
+                self.sync += counter.eq(counter + 1)
+                self.comb += wide.eq(Cat(counter, Constant(0, 56), counter))
+                self.submodules.analyzer = LiteScopeAnalyzer(wide, 16,
+                    csr_data_width = 64,
+                    csr_csv        = None)
 
-    def test_export_csv(self):
-        signal_a = Signal(3)
-        signal_b = Signal(5)
-        analyzer = LiteScopeAnalyzer({
-            0: signal_a,
-            1: signal_b,
-        }, depth=32, samplerate=125e6, subsampler_width=20, csr_csv=None)
+        dut = DUT()
+        generators = {"sys" : [generator(dut)]}
+        clocks     = {"sys": 10, "scope": 10}
+        run_simulation(dut, generators, clocks)
+        self.assertEqual(dut.analyzer.read_width, 64)
+        self.assertEqual(len(dut.analyzer.storage.mem_data.status), 64)
 
-        class VNS:
-            def get_name(self, signal):
-                return {
-                    signal_a: "signal_a",
-                    signal_b: "signal_b",
-                }[signal]
+        # 2 64-bit reads per 72-bit sample (LSW first).
+        self.assertEqual(len(dut.data), 8)
+        samples = [dut.data[i] | (dut.data[i + 1] << 64) for i in range(0, len(dut.data), 2)]
+        self.assertTrue(all((s & 0xff) == (s >> 64) for s in samples))
+        self.assertEqual([s & 0xff for s in samples], list(range(samples[0] & 0xff, (samples[0] & 0xff) + 4)))
 
-        with tempfile.NamedTemporaryFile() as f:
-            analyzer.export_csv(VNS(), f.name)
-            with open(f.name) as csv_file:
-                lines = csv_file.read().splitlines()
+    def test_analyzer_qualifier(self):
+        def generator(dut):
+            yield from dut.analyzer.trigger.mem_value.write(0)
+            yield from dut.analyzer.trigger.mem_mask.write(0)
+            yield from dut.analyzer.trigger.mem_write.write(1)
 
-        self.assertEqual(lines, [
-            "config,None,data_width,5",
-            "config,None,storage_width,5",
-            "config,None,depth,32",
-            "config,None,samplerate,125000000",
-            "config,None,subsampler_width,20",
-            "config,None,with_rle,0",
-            "config,None,rle_length,256",
-            "signal,0,signal_a,3",
-            "signal,1,signal_b,5",
-        ])
+            # Only store samples with the 2 LSBs at 0.
+            yield from dut.analyzer.qualifier.mask.write(0x3)
+            yield from dut.analyzer.qualifier.value.write(0x0)
+            yield from dut.analyzer.qualifier.enable.write(1)
+            yield from dut.analyzer.subsampler.value.write(0)
+            yield from dut.analyzer.storage.length.write(8)
+            yield from dut.analyzer.storage.offset.write(0)
+            yield from dut.analyzer.storage.enable.write(1)
+            yield from dut.analyzer.trigger.enable.write(1)
+            yield
+
+            seen_busy = False
+            for i in range(256):
+                done = (yield from dut.analyzer.storage.done.read())
+                if not done:
+                    seen_busy = True
+                elif seen_busy:
+                    break
+                yield
+            else:
+                raise TimeoutError("Qualified capture did not complete")
+
+            dut.data = (yield from read_capture_words(dut.analyzer, 8))
+
+        class DUT(Module):
+            def __init__(self):
+                counter = Signal(8)
+                self.sync += counter.eq(counter + 1)
+                self.submodules.analyzer = LiteScopeAnalyzer(counter, 16,
+                    with_qualifier            = True,
+                    qualifier_timestamp_width = 8,
+                    csr_csv                   = None)
+
+        dut = DUT()
+        generators = {"sys" : [generator(dut)]}
+        clocks     = {"sys": 10, "scope": 10}
+        run_simulation(dut, generators, clocks)
+        self.assertEqual(dut.analyzer.storage_width, 16)
+
+        encoded = DumpData(dut.analyzer.storage_width)
+        encoded.extend(dut.data)
+        decoded = encoded.decode_timestamps(data_width=dut.analyzer.data_width)
+        samples = list(decoded)
+
+        # Trigger sample is always stored, then only qualified samples, timestamps following data.
+        self.assertTrue(all(d & 0x3 == 0 for d in samples[1:]))
+        self.assertEqual(samples[1:], [samples[1] + 4*i for i in range(len(samples) - 1)])
+        for i in range(1, len(samples)):
+            delta = decoded.timestamps[i] - decoded.timestamps[i - 1]
+            self.assertEqual(delta, (samples[i] - samples[i - 1]) % 256)
+
+    def test_analyzer_transitional(self):
+        def generator(dut):
+            yield from dut.analyzer.trigger.mem_value.write(0)
+            yield from dut.analyzer.trigger.mem_mask.write(0)
+            yield from dut.analyzer.trigger.mem_write.write(1)
+
+            # Only store changes of value (and saturated deltas, every 15 samples).
+            yield from dut.analyzer.qualifier.change.write(0xf)
+            yield from dut.analyzer.qualifier.enable.write(1)
+            yield from dut.analyzer.subsampler.value.write(0)
+            yield from dut.analyzer.storage.length.write(12)
+            yield from dut.analyzer.storage.offset.write(0)
+            yield from dut.analyzer.storage.enable.write(1)
+            yield from dut.analyzer.trigger.enable.write(1)
+            yield
+
+            seen_busy = False
+            for i in range(512):
+                done = (yield from dut.analyzer.storage.done.read())
+                if not done:
+                    seen_busy = True
+                elif seen_busy:
+                    break
+                yield
+            else:
+                raise TimeoutError("Transitional capture did not complete")
+
+            dut.data = (yield from read_capture_words(dut.analyzer, 12))
+
+        class DUT(Module):
+            def __init__(self):
+                counter = Signal(8)
+                value   = Signal(4)
+                self.sync += counter.eq(counter + 1)
+                self.comb += value.eq(counter[4:8])
+                self.submodules.analyzer = LiteScopeAnalyzer(value, 16,
+                    with_transitional         = True,
+                    qualifier_timestamp_width = 4,
+                    csr_csv                   = None)
+
+        dut = DUT()
+        generators = {"sys" : [generator(dut)]}
+        clocks     = {"sys": 10, "scope": 10}
+        run_simulation(dut, generators, clocks)
+
+        encoded = DumpData(dut.analyzer.storage_width)
+        encoded.extend(dut.data)
+        samples = encoded.decode_timestamps(data_width=dut.analyzer.data_width).expand_timestamps()
+        samples = list(samples)
+
+        # 12 stored words rebuild ~6 changes of a value held for 16 cycles.
+        self.assertGreater(len(samples), 64)
+        runs = [1]
+        for a, b in zip(samples, samples[1:]):
+            if a == b:
+                runs[-1] += 1
+            else:
+                self.assertEqual(b, (a + 1) % 16)
+                runs.append(1)
+        self.assertEqual(runs[1:-1], [16]*(len(runs) - 2))
+
+    def test_analyzer_sniffer(self):
+        def generator(dut):
+            yield from dut.analyzer.trigger.mem_value.write(0)
+            yield from dut.analyzer.trigger.mem_mask.write(0)
+            yield from dut.analyzer.trigger.mem_write.write(1)
+
+            # Only store stream beats.
+            yield from dut.analyzer.qualifier.mask.write(0b1)
+            yield from dut.analyzer.qualifier.value.write(0b1)
+            yield from dut.analyzer.qualifier.enable.write(1)
+            yield from dut.analyzer.subsampler.value.write(0)
+            yield from dut.analyzer.storage.length.write(8)
+            yield from dut.analyzer.storage.offset.write(0)
+            yield from dut.analyzer.storage.enable.write(1)
+            yield from dut.analyzer.trigger.enable.write(1)
+            yield
+
+            seen_busy = False
+            for i in range(256):
+                done = (yield from dut.analyzer.storage.done.read())
+                if not done:
+                    seen_busy = True
+                elif seen_busy:
+                    break
+                yield
+            else:
+                raise TimeoutError("Sniffer capture did not complete")
+
+            dut.data = (yield from read_capture_words(dut.analyzer, 8))
+
+        class DUT(Module):
+            def __init__(self):
+                endpoint = stream.Endpoint([("data", 8)])
+                counter  = Signal(8)
+                self.sync += counter.eq(counter + 1)
+                self.comb += [
+                    endpoint.valid.eq(counter[0]),
+                    endpoint.ready.eq(counter[1]),
+                    endpoint.last.eq(counter[2]),
+                    endpoint.data.eq(counter),
+                ]
+                self.submodules.analyzer = LiteScopeAnalyzer(LiteScopeSniffer(endpoint), 16,
+                    qualifier_timestamp_width = 8,
+                    csr_csv                   = None)
+
+        dut = DUT()
+        generators = {"sys" : [generator(dut)]}
+        clocks     = {"sys": 10, "scope": 10}
+        run_simulation(dut, generators, clocks)
+        self.assertTrue(dut.analyzer.with_qualifier)
+        self.assertEqual(dut.analyzer.data_width, 1 + 2 + 8) # beat, first/last, data.
+
+        encoded = DumpData(dut.analyzer.storage_width)
+        encoded.extend(dut.data)
+        decoded = encoded.decode_timestamps(data_width=dut.analyzer.data_width)
+        samples = list(decoded)
+
+        # Trigger sample is always stored, then only beats (valid & ready), 4 samples apart.
+        beats = [(d >> 3) & 0xff for d in samples[1:]]
+        self.assertTrue(all(d & 0b1 for d in samples[1:]))
+        self.assertTrue(all(b & 0b11 == 0b11 for b in beats))
+        self.assertEqual(beats, [beats[0] + 4*i for i in range(len(beats))])
+        self.assertEqual([(d >> 2) & 0b1 for d in samples[1:]], [(b >> 2) & 0b1 for b in beats])
+        self.assertEqual([b - a for a, b in zip(decoded.timestamps[1:], decoded.timestamps[2:])],
+            [4]*(len(beats) - 1))
+
+    def test_analyzer_wishbone_window(self):
+        def generator(dut):
+            # Wait trigger memory reset flush.
+            for i in range(64):
+                yield
+            yield from dut.analyzer.trigger.mem_value.write(0xc0)
+            yield from dut.analyzer.trigger.mem_mask.write(0xff)
+            yield from dut.analyzer.trigger.mem_write.write(1)
+
+            yield from dut.analyzer.subsampler.value.write(0)
+            yield from dut.analyzer.storage.length.write(12)
+            yield from dut.analyzer.storage.offset.write(4)
+            yield from dut.analyzer.storage.enable.write(1)
+            yield from dut.analyzer.trigger.enable.write(1)
+            yield
+
+            seen_busy = False
+            for i in range(512):
+                done = (yield from dut.analyzer.storage.done.read())
+                if not done:
+                    seen_busy = True
+                elif seen_busy:
+                    break
+                yield
+            else:
+                raise TimeoutError("Wishbone window capture did not complete")
+            for i in range(4):
+                yield
+
+            dut.level = (yield from dut.analyzer.storage.mem_level.read())
+            # Random access: read samples backwards, 2 words per 40-bit sample.
+            dut.window = []
+            for i in reversed(range(dut.level)):
+                lsb = (yield from dut.analyzer.bus.read(2*i + 0))
+                msb = (yield from dut.analyzer.bus.read(2*i + 1))
+                dut.window.insert(0, (msb << 32) | lsb)
+            dut.data = (yield from read_capture_words(dut.analyzer, 2*dut.level))
+
+        class DUT(Module):
+            def __init__(self):
+                counter = Signal(40, reset=0xab00000000)
+                self.sync += counter.eq(counter + 1)
+                self.submodules.analyzer = LiteScopeAnalyzer(counter, 16,
+                    with_wishbone = True,
+                    csr_csv       = None)
+
+        dut = DUT()
+        generators = {"sys" : [generator(dut)]}
+        clocks     = {"sys": 10, "scope": 10}
+        run_simulation(dut, generators, clocks)
+        self.assertEqual(dut.level, 12)
+        self.assertEqual(dut.analyzer.storage.bus_size, 4*2*16)
+        self.assertEqual(dut.window, [0xab000000c1 + i - 4 for i in range(12)])
+        self.assertEqual([dut.data[2*i] | (dut.data[2*i + 1] << 32) for i in range(12)], dut.window)
+
+    def test_analyzer_dma_ring_buffer(self):
+        def generator(dut):
+            # Wait trigger memory reset flush.
+            for i in range(64):
+                yield
+            yield from dut.analyzer.trigger.mem_value.write(0xc0)
+            yield from dut.analyzer.trigger.mem_mask.write(0xff)
+            yield from dut.analyzer.trigger.mem_write.write(1)
+
+            yield from dut.analyzer.subsampler.value.write(3)
+            yield from dut.analyzer.storage.length.write(10)
+            yield from dut.analyzer.storage.offset.write(6)
+            yield from dut.analyzer.storage.enable.write(1)
+            yield from dut.analyzer.trigger.enable.write(1)
+            yield
+
+            seen_busy = False
+            for i in range(1024):
+                done = (yield from dut.analyzer.storage.done.read())
+                if not done:
+                    seen_busy = True
+                elif seen_busy:
+                    break
+                yield
+            else:
+                raise TimeoutError("DMA capture did not complete")
+
+            dut.level    = (yield from dut.analyzer.storage.mem_level.read())
+            dut.start    = (yield from dut.analyzer.storage.mem_start.read())
+            dut.overflow = (yield from dut.analyzer.storage.overflow.read())
+            dut.ring     = []
+            for i in range(16):
+                dut.ring.append((yield dut.sram.mem[i]))
+
+        class DUT(Module):
+            def __init__(self):
+                counter = Signal(40, reset=0xab00000000)
+                self.sync += counter.eq(counter + 1)
+                self.submodules.analyzer = LiteScopeAnalyzer(counter, 16,
+                    with_dma = True,
+                    dma_base = 0x00000000,
+                    csr_csv  = None)
+                self.submodules.sram = wishbone.SRAM(16*8,
+                    bus=wishbone.Interface(data_width=64, address_width=32, addressing="word"))
+                self.comb += self.analyzer.bus.connect(self.sram.bus)
+
+        dut = DUT()
+        generators = {"sys" : [generator(dut)]}
+        clocks     = {"sys": 10, "scope": 10}
+        run_simulation(dut, generators, clocks)
+        self.assertEqual(dut.level, 10)
+        self.assertEqual(dut.overflow, 0)
+        self.assertNotEqual(dut.start, 0) # Pre-trigger samples wrapped around the ring buffer.
+        data = [dut.ring[(dut.start + i) % 16] for i in range(dut.level)]
+        # Subsampled by 4, trigger sample at offset.
+        self.assertIn(data[6] & 0xff, range(0xc1, 0xc5))
+        self.assertEqual(data, [data[0] + 4*i for i in range(10)])
+
+    def test_analyzer_streaming(self):
+        def generator(dut):
+            yield from dut.analyzer.subsampler.value.write(0)
+            yield from dut.analyzer.streamer.enable.write(1)
+            dut.words = []
+            dut.lasts = []
+            yield dut.analyzer.source.ready.eq(1)
+            while len(dut.words) < 3*(2 + 4*2):
+                if (yield dut.analyzer.source.valid):
+                    dut.words.append((yield dut.analyzer.source.data))
+                    dut.lasts.append((yield dut.analyzer.source.last))
+                yield
+            dut.overflow = (yield from dut.analyzer.streamer.overflow.read())
+
+        class DUT(Module):
+            def __init__(self):
+                counter = Signal(40, reset=0xab00000000)
+                self.sync += counter.eq(counter + 1)
+                self.submodules.analyzer = LiteScopeAnalyzer(counter, 16,
+                    with_streaming       = True,
+                    stream_packet_length = 4,
+                    csr_csv              = None)
+
+        dut = DUT()
+        generators = {"sys" : [generator(dut)]}
+        clocks     = {"sys": 10, "scope": 10}
+        run_simulation(dut, generators, clocks)
+        self.assertEqual(dut.overflow, 0)
+        samples = []
+        for n in range(3):
+            packet = dut.words[10*n:10*(n + 1)]
+            self.assertEqual(packet[0], (0x5c << 24) | n)
+            self.assertEqual(packet[1], 0)
+            self.assertEqual(dut.lasts[10*n:10*(n + 1)], [0]*9 + [1])
+            samples += [packet[2 + 2*i] | (packet[2 + 2*i + 1] << 32) for i in range(4)]
+        self.assertEqual(samples, [samples[0] + i for i in range(12)])
+
+    def test_analyzer_streaming_disable_completes_packet(self):
+        def generator(dut):
+            yield from dut.analyzer.subsampler.value.write(0)
+            yield from dut.analyzer.streamer.enable.write(1)
+            while len(dut.words) < 5:
+                yield
+            # Disable in the middle of the first packet, then re-enable.
+            yield from dut.analyzer.streamer.enable.write(0)
+            for i in range(32):
+                yield
+            yield from dut.analyzer.streamer.enable.write(1)
+            while len(dut.words) < 2*(2 + 4*2):
+                yield
+
+        @passive
+        def monitor(dut):
+            yield dut.analyzer.source.ready.eq(1)
+            while True:
+                if (yield dut.analyzer.source.valid):
+                    dut.words.append((yield dut.analyzer.source.data))
+                    dut.lasts.append((yield dut.analyzer.source.last))
+                yield
+
+        class DUT(Module):
+            def __init__(self):
+                counter = Signal(40, reset=0xab00000000)
+                self.sync += counter.eq(counter + 1)
+                self.submodules.analyzer = LiteScopeAnalyzer(counter, 16,
+                    with_streaming       = True,
+                    stream_packet_length = 4,
+                    csr_csv              = None)
+
+        dut = DUT()
+        dut.words  = []
+        dut.lasts  = []
+        generators = {"sys" : [generator(dut), monitor(dut)]}
+        clocks     = {"sys": 10, "scope": 10}
+        run_simulation(dut, generators, clocks)
+        self.assertGreaterEqual(len(dut.words), 20)
+        packets = []
+        for n in range(2):
+            packet = dut.words[10*n:10*(n + 1)]
+            self.assertEqual(dut.lasts[10*n:10*(n + 1)], [0]*9 + [1])
+            samples = [packet[2 + 2*i] | (packet[2 + 2*i + 1] << 32) for i in range(4)]
+            self.assertEqual(samples, [samples[0] + i for i in range(4)])
+            packets.append((packet[0], samples))
+        # First packet completed, sequence skipped on disable, no stale samples after re-enable.
+        self.assertEqual(packets[0][0], (0x5c << 24) | 0)
+        self.assertEqual(packets[1][0], (0x5c << 24) | 2)
+        self.assertGreater(packets[1][1][0], packets[0][1][-1] + 32)
+
+    def test_analyzer_segmented_capture(self):
+        def generator(dut):
+            # Wait trigger memory reset flush.
+            for i in range(64):
+                yield
+            yield from dut.analyzer.trigger.mem_value.write(0x5)
+            yield from dut.analyzer.trigger.mem_mask.write(0xf)
+            yield from dut.analyzer.trigger.mem_write.write(1)
+
+            yield from dut.analyzer.subsampler.value.write(0)
+            yield from dut.analyzer.storage.length.write(6)
+            yield from dut.analyzer.storage.offset.write(2)
+            yield from dut.analyzer.storage.enable.write(1)
+            yield from dut.analyzer.trigger.enable.write(1)
+            yield
+
+            seen_busy = False
+            for i in range(1024):
+                done = (yield from dut.analyzer.storage.done.read())
+                if not done:
+                    seen_busy = True
+                elif seen_busy:
+                    break
+                yield
+            else:
+                raise TimeoutError("Segmented capture did not complete")
+
+            dut.count    = (yield from dut.analyzer.storage.segment_count.read())
+            dut.segments = []
+            for n in range(dut.count):
+                yield from dut.analyzer.storage.segment_sel.write(n)
+                for i in range(8):
+                    yield
+                level     = (yield from dut.analyzer.storage.mem_level.read())
+                trigger   = (yield from dut.analyzer.storage.segment_trigger.read())
+                timestamp = (yield from dut.analyzer.storage.segment_timestamp.read())
+                data      = (yield from read_capture_words(dut.analyzer, level))
+                dut.segments.append((data, trigger, timestamp))
+
+        class DUT(Module):
+            def __init__(self):
+                counter = Signal(16)
+                self.sync += counter.eq(counter + 1)
+                self.submodules.analyzer = LiteScopeAnalyzer(counter, 64,
+                    segments = 4,
+                    csr_csv  = None)
+
+        dut = DUT()
+        generators = {"sys" : [generator(dut)]}
+        clocks     = {"sys": 10, "scope": 10}
+        run_simulation(dut, generators, clocks)
+        self.assertEqual(dut.count, 4)
+        for n, (data, trigger, timestamp) in enumerate(dut.segments):
+            self.assertEqual(len(data), 6)
+            self.assertEqual(trigger, 2)
+            self.assertEqual(data, [data[0] + i for i in range(6)])
+            if n > 0:
+                # Re-triggered on each new match, without host intervention.
+                self.assertEqual(data[trigger] & 0xf, 0x5)
+            if n > 1:
+                self.assertEqual(data[trigger], dut.segments[n - 1][0][trigger] + 16)
+                self.assertEqual(timestamp, dut.segments[n - 1][2] + 16)
+
+    def test_analyzer_segmented_capture_retrigger(self):
+        def generator(dut):
+            # Held level condition (bit 6 set for 64 cycles every 128), subsampled by 4.
+            yield from dut.analyzer.trigger.mem_value.write(0x40)
+            yield from dut.analyzer.trigger.mem_mask.write(0x40)
+            yield from dut.analyzer.trigger.mem_write.write(1)
+
+            yield from dut.analyzer.subsampler.value.write(3)
+            yield from dut.analyzer.storage.length.write(4)
+            yield from dut.analyzer.storage.offset.write(0)
+            yield from dut.analyzer.storage.enable.write(1)
+            yield from dut.analyzer.trigger.enable.write(1)
+            yield
+            dut.segments = (yield from read_segments(dut.analyzer))
+
+            # Re-arm without conditions: segments are captured immediately.
+            yield from dut.analyzer.trigger.enable.write(0)
+            yield from dut.analyzer.storage.enable.write(0)
+            for i in range(8):
+                yield
+            yield from dut.analyzer.storage.enable.write(1)
+            yield from dut.analyzer.trigger.enable.write(1)
+            yield
+            dut.free_segments = (yield from read_segments(dut.analyzer))
+
+        class DUT(Module):
+            def __init__(self):
+                counter = Signal(16)
+                self.sync += counter.eq(counter + 1)
+                self.submodules.analyzer = LiteScopeAnalyzer(counter, 16,
+                    segments = 4,
+                    csr_csv  = None)
+
+        dut = DUT()
+        generators = {"sys" : [generator(dut)]}
+        clocks     = {"sys": 10, "scope": 10}
+        run_simulation(dut, generators, clocks)
+        self.assertEqual(len(dut.segments), 4)
+        for n, (data, trigger, timestamp) in enumerate(dut.segments):
+            self.assertEqual(data[trigger] & 0x40, 0x40)
+            if n > 0:
+                # One segment per rising edge of the condition, not one per segment while held.
+                delta = data[trigger] - dut.segments[n - 1][0][trigger]
+                self.assertTrue(124 <= delta <= 132)
+        self.assertEqual(len(dut.free_segments), 4)
+        self.assertLess(dut.free_segments[-1][2], 128)
+
+    def test_analyzer_pingpong(self):
+        def generator(dut):
+            # Wait trigger memory reset flush.
+            for i in range(64):
+                yield
+            yield from dut.analyzer.trigger.mem_value.write(0x5)
+            yield from dut.analyzer.trigger.mem_mask.write(0xf)
+            yield from dut.analyzer.trigger.mem_write.write(1)
+
+            yield from dut.analyzer.subsampler.value.write(0)
+            yield from dut.analyzer.storage.length.write(6)
+            yield from dut.analyzer.storage.offset.write(2)
+            yield from dut.analyzer.storage.enable.write(1)
+            yield from dut.analyzer.trigger.enable.write(1)
+            yield
+
+            dut.captures = []
+            dut.ready    = []
+            for n in range(4):
+                bank = n % 2
+                for i in range(1024):
+                    if ((yield from dut.analyzer.storage.bank_ready.read()) >> bank) & 0b1:
+                        break
+                    yield
+                else:
+                    raise TimeoutError("Ping-pong capture did not complete")
+                yield from dut.analyzer.storage.bank_sel.write(bank)
+                for i in range(8):
+                    yield
+                dut.captures.append((yield from read_capture(dut.analyzer)))
+                # Slow host: the other bank captures meanwhile.
+                for i in range(64):
+                    yield
+                dut.ready.append((yield from dut.analyzer.storage.bank_ready.read()))
+                yield from dut.analyzer.storage.bank_release.write(1)
+
+        class DUT(Module):
+            def __init__(self):
+                counter = Signal(16)
+                self.sync += counter.eq(counter + 1)
+                self.submodules.analyzer = LiteScopeAnalyzer(counter, 32,
+                    with_pingpong = True,
+                    csr_csv       = None)
+
+        dut = DUT()
+        generators = {"sys" : [generator(dut)]}
+        clocks     = {"sys": 10, "scope": 10}
+        run_simulation(dut, generators, clocks)
+        self.assertEqual(dut.ready, [0b11]*4)
+        for n, data in enumerate(dut.captures):
+            self.assertEqual(len(data), 6)
+            self.assertEqual(data, [data[0] + i for i in range(6)])
+            if n > 0:
+                # Re-triggered on each new match, in the other bank.
+                self.assertEqual(data[2] & 0xf, 0x5)
+                self.assertGreater(data[0], dut.captures[n - 1][0])
+
+    def test_analyzer_edge_trigger(self):
+        def generator(dut):
+            # Wait trigger memory reset flush.
+            for i in range(64):
+                yield
+            # Rising edge of bit 4 while bit 8 is set (0x110), then any change of bit 11 (0x800).
+            for value, mask, rising, change in [(0x100, 0x100, 0x10, 0), (0, 0, 0, 0x800)]:
+                yield from dut.analyzer.trigger.mem_value.write(value)
+                yield from dut.analyzer.trigger.mem_mask.write(mask)
+                yield from dut.analyzer.trigger.mem_rising.write(rising)
+                yield from dut.analyzer.trigger.mem_change.write(change)
+                yield from dut.analyzer.trigger.mem_write.write(1)
+
+            yield from dut.analyzer.subsampler.value.write(0)
+            yield from dut.analyzer.storage.length.write(4)
+            yield from dut.analyzer.storage.offset.write(0)
+            yield from dut.analyzer.storage.enable.write(1)
+            yield from dut.analyzer.trigger.enable.write(1)
+            yield
+
+            while not (yield from dut.analyzer.trigger.done.read()):
+                yield
+            while not (yield from dut.analyzer.storage.done.read()):
+                yield
+            dut.data = (yield from read_capture_words(dut.analyzer, 4))
+
+        class DUT(Module):
+            def __init__(self):
+                counter = Signal(16)
+                self.sync += counter.eq(counter + 1)
+                self.submodules.analyzer = LiteScopeAnalyzer(counter, 16,
+                    with_trigger_edges = True,
+                    csr_csv            = None)
+
+        dut = DUT()
+        generators = {"sys" : [generator(dut)]}
+        clocks     = {"sys": 10, "scope": 10}
+        run_simulation(dut, generators, clocks)
+        self.assertIn(dut.data[0], [0x800, 0x801])
+        self.assertEqual(dut.data, [dut.data[0] + i for i in range(4)])
+
+    def test_analyzer_range_count_trigger(self):
+        def generator(dut):
+            # Wait trigger memory reset flush.
+            for i in range(64):
+                yield
+            # 3rd sample with low nibble 0x7 while bits [11:8] are in [3, 5).
+            yield from dut.analyzer.trigger.mem_value.write(0x7)
+            yield from dut.analyzer.trigger.mem_mask.write(0xf)
+            yield from dut.analyzer.trigger.mem_range_mask.write(0xf00)
+            yield from dut.analyzer.trigger.mem_range_min.write(0x300)
+            yield from dut.analyzer.trigger.mem_range_max.write(0x400)
+            yield from dut.analyzer.trigger.mem_count.write(3)
+            yield from dut.analyzer.trigger.mem_write.write(1)
+
+            yield from dut.analyzer.subsampler.value.write(0)
+            yield from dut.analyzer.storage.length.write(4)
+            yield from dut.analyzer.storage.offset.write(0)
+            yield from dut.analyzer.storage.enable.write(1)
+            yield from dut.analyzer.trigger.enable.write(1)
+            yield
+
+            while not (yield from dut.analyzer.trigger.done.read()):
+                yield
+            while not (yield from dut.analyzer.storage.done.read()):
+                yield
+            dut.data = (yield from read_capture_words(dut.analyzer, 4))
+
+        class DUT(Module):
+            def __init__(self):
+                counter = Signal(16)
+                self.sync += counter.eq(counter + 1)
+                self.submodules.analyzer = LiteScopeAnalyzer(counter, 16,
+                    with_trigger_range = True,
+                    with_trigger_count = True,
+                    csr_csv            = None)
+
+        dut = DUT()
+        generators = {"sys" : [generator(dut)]}
+        clocks     = {"sys": 10, "scope": 10}
+        run_simulation(dut, generators, clocks)
+        # 0x307 (1st), 0x317 (2nd), 0x327 (3rd).
+        self.assertIn(dut.data[0], [0x327, 0x328])
+        self.assertEqual(dut.data, [dut.data[0] + i for i in range(4)])
+
+    def test_analyzer_pipelined_trigger(self):
+        def capture(stages):
+            def generator(dut):
+                for value in [0x40, 0x48]:
+                    yield from dut.analyzer.trigger.mem_value.write(value)
+                    yield from dut.analyzer.trigger.mem_mask.write(0xff)
+                    yield from dut.analyzer.trigger.mem_write.write(1)
+                yield from dut.analyzer.subsampler.value.write(0)
+                yield from dut.analyzer.storage.length.write(8)
+                yield from dut.analyzer.storage.offset.write(4)
+                yield from dut.analyzer.storage.enable.write(1)
+                yield from dut.analyzer.trigger.enable.write(1)
+                yield
+                while not (yield from dut.analyzer.storage.armed.read()):
+                    yield
+                while not (yield from dut.analyzer.storage.done.read()):
+                    yield
+                dut.data = (yield from read_capture(dut.analyzer))
+
+            class DUT(Module):
+                def __init__(self):
+                    counter = Signal(8)
+                    wide    = Signal(72)
+                    self.sync += counter.eq(counter + 1)
+                    self.comb += wide.eq(Cat(*[counter]*9))
+                    self.submodules.analyzer = LiteScopeAnalyzer(wide, 16,
+                        comparator_stages = stages,
+                        csr_csv           = None)
+
+            dut = DUT()
+            generators = {"sys" : [generator(dut)]}
+            clocks     = {"sys": 10, "scope": 10}
+            run_simulation(dut, generators, clocks)
+            return dut.data
+
+        # Pipelined comparators keep the exact sample/hit alignment.
+        reference = capture(0)
+        self.assertEqual([word & 0xff for word in reference[::3]], list(range(0x45, 0x4d)))
+        for stages in [1, 3]:
+            self.assertEqual(capture(stages), reference)
+
+    def test_analyzer_pipelined_rle(self):
+        def capture(stages):
+            def generator(dut):
+                yield from dut.analyzer.trigger.mem_value.write(0)
+                yield from dut.analyzer.trigger.mem_mask.write(0)
+                yield from dut.analyzer.trigger.mem_write.write(1)
+
+                yield from dut.analyzer.rle.enable.write(1)
+                yield from dut.analyzer.subsampler.value.write(0)
+                yield from dut.analyzer.storage.length.write(12)
+                yield from dut.analyzer.storage.offset.write(0)
+                yield from dut.analyzer.storage.enable.write(1)
+                yield from dut.analyzer.trigger.enable.write(1)
+                yield
+                while not (yield from dut.analyzer.storage.armed.read()):
+                    yield
+                while not (yield from dut.analyzer.storage.done.read()):
+                    yield
+                dut.data = (yield from read_capture_words(dut.analyzer, 12))
+
+            class DUT(Module):
+                def __init__(self):
+                    counter = Signal(8)
+                    value   = Signal(40)
+                    self.sync += counter.eq(counter + 1)
+                    self.comb += value.eq(Cat(counter[2:6], Constant(0, 32), counter[2:6]))
+                    self.submodules.analyzer = LiteScopeAnalyzer(value, 64,
+                        with_rle          = True,
+                        rle_length        = 8,
+                        comparator_stages = stages,
+                        csr_csv           = None)
+
+            dut = DUT()
+            generators = {"sys" : [generator(dut)]}
+            clocks     = {"sys": 10, "scope": 10}
+            run_simulation(dut, generators, clocks)
+            return dut.data
+
+        for stages in [0, 2]:
+            words   = capture(stages)
+            encoded = DumpData(41)
+            encoded.extend([words[i] | (words[i + 1] << 32) for i in range(0, len(words), 2)])
+            decoded = list(encoded.decode_rle(data_width=40))
+
+            # Runs are detected on the full width (a sample is dropped when the RLE stalls on a run
+            # change, so runs of 4 samples decode to 3 or 4 samples).
+            self.assertTrue(any(word >> 40 for word in encoded))
+            self.assertTrue(all((d & 0xf) == (d >> 36) for d in decoded))
+            runs = [[decoded[0]]]
+            for a, b in zip(decoded, decoded[1:]):
+                if a == b:
+                    runs[-1].append(b)
+                else:
+                    self.assertEqual(b & 0xf, ((a & 0xf) + 1) % 16)
+                    runs.append([b])
+            self.assertTrue(all(len(run) in [3, 4] for run in runs[1:-1]))
+
+    def test_analyzer_lanes(self):
+        def generator(dut):
+            yield from dut.analyzer.trigger.mem_value.write(0x41)
+            yield from dut.analyzer.trigger.mem_mask.write(0xff)
+            yield from dut.analyzer.trigger.mem_write.write(1)
+
+            yield from dut.analyzer.subsampler.value.write(0)
+            yield from dut.analyzer.storage.length.write(8)
+            yield from dut.analyzer.storage.offset.write(4)
+            yield from dut.analyzer.storage.enable.write(1)
+            yield from dut.analyzer.trigger.enable.write(1)
+            yield
+            while not (yield from dut.analyzer.storage.armed.read()):
+                yield
+            while not (yield from dut.analyzer.storage.done.read()):
+                yield
+            dut.lane = (yield from dut.analyzer.trigger.lane.read())
+            dut.data = (yield from read_capture(dut.analyzer))
+
+        class DUT(Module):
+            def __init__(self):
+                # 4 samples per cycle (deserialized counter, oldest sample in LSBs).
+                counter = Signal(6)
+                samples = Signal(32)
+                self.sync += counter.eq(counter + 1)
+                self.comb += samples.eq(Cat(*[Cat(Constant(n, 2), counter) for n in range(4)]))
+                self.submodules.analyzer = LiteScopeAnalyzer(samples, 16, lanes=4, csr_csv=None)
+
+        dut = DUT()
+        generators = {"sys" : [generator(dut)]}
+        clocks     = {"sys": 10, "scope": 10}
+        run_simulation(dut, generators, clocks)
+        self.assertEqual(dut.analyzer.data_width, 8)
+        self.assertEqual(dut.analyzer.storage_width, 32)
+
+        words = DumpData(32)
+        words.extend(dut.data)
+        samples = list(words.split_lanes(4, 8))
+        self.assertEqual(samples, list(range(samples[0], samples[0] + 32)))
+        # Hit on lane 1 of the last pre-trigger word (trigger marker on the following sample).
+        self.assertEqual(dut.lane, 1)
+        self.assertEqual(samples[(4 - 1)*4 + dut.lane], 0x41)
+
+    def test_analyzer_capture_metadata(self):
+        def generator(dut):
+            yield from dut.analyzer.trigger.mem_value.write(0x5)
+            yield from dut.analyzer.trigger.mem_mask.write(0xf)
+            yield from dut.analyzer.trigger.mem_write.write(1)
+
+            yield from dut.analyzer.subsampler.value.write(0)
+            yield from dut.analyzer.storage.length.write(24)
+            yield from dut.analyzer.storage.offset.write(15)
+            yield from dut.analyzer.storage.enable.write(1)
+            yield from dut.analyzer.trigger.enable.write(1)
+            yield
+            while not (yield from dut.analyzer.storage.armed.read()):
+                yield
+            while not (yield from dut.analyzer.storage.done.read()):
+                yield
+            dut.pre_trigger       = (yield from dut.analyzer.storage.pre_trigger.read())
+            dut.cycles            = (yield from dut.analyzer.storage.cycles.read())
+            dut.trigger_timestamp = (yield from dut.analyzer.storage.trigger_timestamp.read())
+            dut.data              = (yield from read_capture(dut.analyzer))
+
+        class DUT(Module):
+            def __init__(self):
+                counter = Signal(16)
+                self.sync += counter.eq(counter + 1)
+                self.submodules.analyzer = LiteScopeAnalyzer(counter, 32, csr_csv=None)
+
+        dut = DUT()
+        generators = {"sys" : [generator(dut)]}
+        clocks     = {"sys": 10, "scope": 10}
+        run_simulation(dut, generators, clocks)
+        self.assertEqual(len(dut.data), 24)
+        self.assertEqual(dut.data, [dut.data[0] + i for i in range(24)])
+        # Trigger before offset pre-trigger samples: actual pre-trigger count and trigger sample.
+        self.assertLess(dut.pre_trigger, 15)
+        self.assertEqual(dut.data[dut.pre_trigger - 1] & 0xf, 0x5)
+        # Counter and timestamp both count scope cycles from reset.
+        self.assertEqual(dut.trigger_timestamp, dut.data[dut.pre_trigger])
+        self.assertGreaterEqual(dut.cycles, 24)
+
+    def test_analyzer_cross_trigger(self):
+        def generator(dut):
+            # Analyzer a triggers on its own condition, analyzer b only on a's trigger_out.
+            yield from dut.a.trigger.mem_value.write(0x80)
+            yield from dut.a.trigger.mem_mask.write(0xff)
+            yield from dut.a.trigger.mem_write.write(1)
+            yield from dut.b.cross_trigger.enable.write(1)
+            yield from dut.b.cross_trigger.local.write(0)
+            for analyzer in [dut.a, dut.b]:
+                yield from analyzer.subsampler.value.write(0)
+                yield from analyzer.storage.length.write(16)
+                yield from analyzer.storage.offset.write(8)
+                yield from analyzer.storage.enable.write(1)
+            for analyzer in [dut.a, dut.b]:
+                yield from analyzer.trigger.enable.write(1)
+            yield
+            for analyzer in [dut.a, dut.b]:
+                while not (yield from analyzer.storage.armed.read()):
+                    yield
+                while not (yield from analyzer.storage.done.read()):
+                    yield
+            dut.captures = []
+            for analyzer in [dut.a, dut.b]:
+                pre_trigger       = (yield from analyzer.storage.pre_trigger.read())
+                trigger_timestamp = (yield from analyzer.storage.trigger_timestamp.read())
+                data              = (yield from read_capture(analyzer))
+                dut.captures.append((pre_trigger, trigger_timestamp, data))
+
+        class DUT(Module):
+            def __init__(self):
+                counter = Signal(16)
+                self.sync += counter.eq(counter + 1)
+                self.submodules.timestamp = LiteScopeTimestamp(frequency=100e6)
+                self.submodules.a = LiteScopeAnalyzer(counter, 32,
+                    with_cross_trigger = True,
+                    timestamp          = self.timestamp,
+                    csr_csv            = None)
+                self.submodules.b = LiteScopeAnalyzer(counter, 32,
+                    with_cross_trigger = True,
+                    timestamp          = self.timestamp,
+                    csr_csv            = None)
+                self.comb += self.b.trigger_in.eq(self.a.trigger_out)
+
+        dut = DUT()
+        generators = {"sys" : [generator(dut)]}
+        clocks     = {"sys": 10, "a_scope": 10, "b_scope": 10}
+        run_simulation(dut, generators, clocks)
+        (a_pre, a_timestamp, a_data), (b_pre, b_timestamp, b_data) = dut.captures
+        self.assertEqual(a_data[a_pre - 1] & 0xff, 0x80)
+        # b hits a few cycles after a (trigger_out/trigger_in resynchronization), both trigger
+        # timestamps come from the shared global timestamp.
+        delay = b_data[b_pre] - a_data[a_pre]
+        self.assertTrue(0 < delay <= 8)
+        self.assertEqual(b_timestamp - a_timestamp, delay)
+
+    def test_analyzer_pack(self):
+        def generator(dut):
+            yield from dut.analyzer.trigger.mem_value.write(0x41)
+            yield from dut.analyzer.trigger.mem_mask.write(0xff)
+            yield from dut.analyzer.trigger.mem_write.write(1)
+
+            yield from dut.analyzer.subsampler.value.write(0)
+            yield from dut.analyzer.storage.length.write(8)
+            yield from dut.analyzer.storage.offset.write(4)
+            yield from dut.analyzer.storage.enable.write(1)
+            yield from dut.analyzer.trigger.enable.write(1)
+            yield
+            while not (yield from dut.analyzer.storage.armed.read()):
+                yield
+            while not (yield from dut.analyzer.storage.done.read()):
+                yield
+            dut.position = (yield from dut.analyzer.packer.hit_position.read())
+            dut.data     = (yield from read_capture(dut.analyzer))
+
+        class DUT(Module):
+            def __init__(self):
+                counter = Signal(8)
+                self.sync += counter.eq(counter + 1)
+                self.submodules.analyzer = LiteScopeAnalyzer(counter, 16, pack=4, csr_csv=None)
+
+        dut = DUT()
+        generators = {"sys" : [generator(dut)]}
+        clocks     = {"sys": 10, "scope": 10}
+        run_simulation(dut, generators, clocks)
+        self.assertEqual(dut.analyzer.storage_width, 8)
+        self.assertEqual(len(dut.analyzer.storage.sink.data), 32)
+
+        words = DumpData(32)
+        words.extend(dut.data)
+        self.assertEqual(len(words), 8)
+        samples = list(words.split_lanes(4, 8))
+        self.assertEqual(samples, [(samples[0] + i) % 256 for i in range(32)])
+        # Trigger marker (sample following the match) in the first post-trigger word, at hit_position.
+        self.assertEqual(samples[4*4 + dut.position - 1], 0x41)
+
+    def test_analyzer_event_counters(self):
+        def generator(dut):
+            counter = dut.analyzer.counter
+            yield from counter.mask0.write(0x03)
+            yield from counter.value0.write(0x00)
+            yield from counter.mask1.write(0x00)
+            yield from counter.window.write(64)
+            yield from counter.enable.write(1)
+            yield
+            seen_busy = False
+            for i in range(1024):
+                done = (yield from counter.done.read())
+                if not done:
+                    seen_busy = True
+                elif seen_busy:
+                    break
+                yield
+            else:
+                raise TimeoutError("Event counters did not complete")
+            dut.elapsed = (yield from counter.elapsed.read())
+            dut.counts  = [(yield from counter.count0.read()), (yield from counter.count1.read())]
+
+        class DUT(Module):
+            def __init__(self):
+                counter = Signal(8)
+                self.sync += counter.eq(counter + 1)
+                self.submodules.analyzer = LiteScopeAnalyzer(counter, 16,
+                    counters      = 2,
+                    counter_width = 5,
+                    csr_csv       = None)
+
+        dut = DUT()
+        generators = {"sys" : [generator(dut)]}
+        clocks     = {"sys": 10, "scope": 10}
+        run_simulation(dut, generators, clocks)
+        self.assertEqual(dut.elapsed, 64)
+        # 1 sample in 4 matches, match-all saturates.
+        self.assertEqual(dut.counts, [16, 31])
+
+    def test_analyzer_histogram(self):
+        def accumulate(histogram, mask, shift, window):
+            yield from histogram.enable.write(0)
+            yield from histogram.mask.write(mask)
+            yield from histogram.shift.write(shift)
+            yield from histogram.window.write(window)
+            yield from histogram.enable.write(1)
+            yield
+            seen_busy = False
+            for i in range(1024):
+                done = (yield from histogram.done.read())
+                if not done:
+                    seen_busy = True
+                elif seen_busy:
+                    break
+                yield
+            else:
+                raise TimeoutError("Histogram did not complete")
+            counts = []
+            for i in range(16):
+                yield from histogram.index.write(i)
+                yield
+                counts.append((yield from histogram.count.read()))
+            return counts
+
+        def generator(dut):
+            # Bin changing every sample, then every 4 samples (with bin shift).
+            dut.counts = [
+                (yield from accumulate(dut.analyzer.histogram, 0x03, 0, 64)),
+                (yield from accumulate(dut.analyzer.histogram, 0x1c, 2, 64)),
+                (yield from accumulate(dut.analyzer.histogram, 0xff, 4, 70)),
+            ]
+
+        class DUT(Module):
+            def __init__(self):
+                counter = Signal(8)
+                self.sync += counter.eq(counter + 1)
+                self.submodules.analyzer = LiteScopeAnalyzer(counter, 16,
+                    with_histogram = True,
+                    histogram_bins = 16,
+                    csr_csv        = None)
+
+        dut = DUT()
+        generators = {"sys" : [generator(dut)]}
+        clocks     = {"sys": 10, "scope": 10}
+        run_simulation(dut, generators, clocks)
+        self.assertEqual(dut.counts[0], [16]*4 + [0]*12)
+        self.assertEqual(dut.counts[1], [8]*8 + [0]*8)
+        # Runs of 16 samples per bin (partial first/last runs).
+        self.assertEqual(sum(dut.counts[2]), 70)
+        self.assertEqual(sorted(dut.counts[2], reverse=True)[:3], [16, 16, 16])
+
+    def test_analyzer_latency(self):
+        def generator(dut):
+            latency = dut.analyzer.latency
+            yield from latency.start_mask.write(0x00f)
+            yield from latency.start_value.write(0x000)
+            yield from latency.stop_mask.write(0x100)
+            yield from latency.stop_value.write(0x100)
+            yield from latency.window.write(256)
+            yield from latency.enable.write(1)
+            yield
+            seen_busy = False
+            for i in range(1024):
+                done = (yield from latency.done.read())
+                if not done:
+                    seen_busy = True
+                elif seen_busy:
+                    break
+                yield
+            else:
+                raise TimeoutError("Latency measurement did not complete")
+            dut.count = (yield from latency.count.read())
+            dut.min   = (yield from latency.min.read())
+            dut.max   = (yield from latency.max.read())
+            dut.sum   = (yield from latency.sum.read())
+
+        class DUT(Module):
+            def __init__(self):
+                # Request every 16 cycles, response 3 to 6 cycles later.
+                counter = Signal(8)
+                ack     = Signal()
+                self.sync += counter.eq(counter + 1)
+                self.comb += ack.eq(counter[:4] == (counter[4:6] + 3))
+                self.submodules.analyzer = LiteScopeAnalyzer([counter, ack], 16,
+                    with_latency = True,
+                    csr_csv      = None)
+
+        dut = DUT()
+        generators = {"sys" : [generator(dut)]}
+        clocks     = {"sys": 10, "scope": 10}
+        run_simulation(dut, generators, clocks)
+        self.assertIn(dut.count, [15, 16])
+        self.assertEqual(dut.min, 3)
+        self.assertEqual(dut.max, 6)
+        # Latencies cycle through 3, 4, 5, 6.
+        self.assertLessEqual(abs(dut.sum - 4.5*dut.count), 3)
+
+    def test_analyzer_trigger_sequencer(self):
+        def write_state(dut, index, value, mask, count=1, next=0, final=0, timeout=0, timeout_next=0):
+            yield from dut.analyzer.trigger.mem_index.write(index)
+            yield from dut.analyzer.trigger.mem_value.write(value)
+            yield from dut.analyzer.trigger.mem_mask.write(mask)
+            yield from dut.analyzer.trigger.mem_count.write(count)
+            yield from dut.analyzer.trigger.mem_next.write(next)
+            yield from dut.analyzer.trigger.mem_final.write(final)
+            yield from dut.analyzer.trigger.mem_timeout.write(timeout)
+            yield from dut.analyzer.trigger.mem_timeout_next.write(timeout_next)
+            yield from dut.analyzer.trigger.mem_write.write(1)
+
+        def generator(dut):
+            # 2nd occurrence of 0x10, then 0x40 within 8 cycles (times out), else 0x20.
+            yield from write_state(dut, 0, 0x10, 0xff, count=2, next=1)
+            yield from write_state(dut, 1, 0x40, 0xff, next=2, final=1, timeout=8, timeout_next=2)
+            yield from write_state(dut, 2, 0x20, 0xff, final=1)
+
+            yield from dut.analyzer.subsampler.value.write(0)
+            yield from dut.analyzer.storage.length.write(4)
+            yield from dut.analyzer.storage.offset.write(0)
+            yield from dut.analyzer.storage.enable.write(1)
+            for i in range(32):
+                yield
+            yield from dut.analyzer.trigger.enable.write(1)
+            yield
+
+            while not (yield from dut.analyzer.trigger.done.read()):
+                yield
+            dut.state = (yield from dut.analyzer.trigger.state.read())
+            while not (yield from dut.analyzer.storage.done.read()):
+                yield
+            dut.data = (yield from read_capture_words(dut.analyzer, 4))
+
+        class DUT(Module):
+            def __init__(self):
+                counter = Signal(16)
+                self.sync += counter.eq(counter + 1)
+                self.submodules.analyzer = LiteScopeAnalyzer(counter, 16,
+                    with_sequencer = True,
+                    csr_csv        = None)
+
+        dut = DUT()
+        generators = {"sys" : [generator(dut)]}
+        clocks     = {"sys": 10, "scope": 10}
+        run_simulation(dut, generators, clocks)
+        self.assertEqual(dut.state, 2)
+        # Enabled after 0x010: 0x110 (1st), 0x210 (2nd), no 0x40 within 8 cycles, 0x220.
+        self.assertIn(dut.data[0], [0x220, 0x221])
+        self.assertEqual(dut.data, [dut.data[0] + i for i in range(4)])
+
+    def test_format_groups_splits_records_and_deduplicates(self):
+        signal = Signal(1)
+        record = Record([("field0", 3), ("field1", 5)])
+
+        analyzer = LiteScopeAnalyzer([signal, signal, record], 16, csr_csv=None)
+
+        self.assertEqual(analyzer.groups[0], [signal, record.field0, record.field1])
+        self.assertEqual(analyzer.data_width, 9)
+
+    def test_export_csv(self):
+        signal_a = Signal(3)
+        signal_b = Signal(5)
+        analyzer = LiteScopeAnalyzer({
+            0: signal_a,
+            1: signal_b,
+        }, depth=32, samplerate=125e6, subsampler_width=20, csr_csv=None)
+
+        class VNS:
+            def get_name(self, signal):
+                return {
+                    signal_a: "signal_a",
+                    signal_b: "signal_b",
+                }[signal]
+
+        with tempfile.NamedTemporaryFile() as f:
+            analyzer.export_csv(VNS(), f.name)
+            with open(f.name) as csv_file:
+                lines = csv_file.read().splitlines()
+
+        self.assertEqual(lines, [
+            "config,None,data_width,5",
+            "config,None,storage_width,5",
+            "config,None,depth,32",
+            "config,None,samplerate,125000000",
+            "config,None,subsampler_width,20",
+            "config,None,with_rle,0",
+            "config,None,rle_length,256",
+            "signal,0,signal_a,3",
+            "signal,1,signal_b,5",
+        ])
+
+    def test_export_csv_trigger_count_width(self):
+        signal   = Signal(4)
+        analyzer = LiteScopeAnalyzer(signal, depth=16, with_trigger_count=True, csr_csv=None)
+
+        class VNS:
+            def get_name(self, signal):
+                return "signal"
+
+        with tempfile.NamedTemporaryFile() as f:
+            analyzer.export_csv(VNS(), f.name)
+            with open(f.name) as csv_file:
+                lines = csv_file.read().splitlines()
+
+        self.assertIn("config,None,trigger_count_width,16", lines)
+
+    def test_export_csv_qualifier(self):
+        signal   = Signal(4)
+        analyzer = LiteScopeAnalyzer(signal, depth=16, with_qualifier=True, csr_csv=None)
+
+        class VNS:
+            def get_name(self, signal):
+                return "signal"
+
+        with tempfile.NamedTemporaryFile() as f:
+            analyzer.export_csv(VNS(), f.name)
+            with open(f.name) as csv_file:
+                lines = csv_file.read().splitlines()
+
+        self.assertIn("config,None,storage_width,20", lines)
+        self.assertIn("config,None,with_qualifier,1", lines)
+        self.assertIn("config,None,qualifier_timestamp_width,16", lines)
+        self.assertNotIn("config,None,with_transitional,1", lines)
+
+        analyzer = LiteScopeAnalyzer(signal, depth=16, with_transitional=True, csr_csv=None)
+        with tempfile.NamedTemporaryFile() as f:
+            analyzer.export_csv(VNS(), f.name)
+            with open(f.name) as csv_file:
+                lines = csv_file.read().splitlines()
+
+        self.assertIn("config,None,with_qualifier,1", lines)
+        self.assertIn("config,None,with_transitional,1", lines)
+
+    def test_export_csv_lanes(self):
+        signal   = Signal(16)
+        analyzer = LiteScopeAnalyzer(signal, depth=16, lanes=4, csr_csv=None)
+
+        class VNS:
+            def get_name(self, signal):
+                return "signal"
+
+        with tempfile.NamedTemporaryFile() as f:
+            analyzer.export_csv(VNS(), f.name)
+            with open(f.name) as csv_file:
+                lines = csv_file.read().splitlines()
+
+        self.assertIn("config,None,data_width,4", lines)
+        self.assertIn("config,None,storage_width,16", lines)
+        self.assertIn("config,None,lanes,4", lines)
+        self.assertIn("signal,0,signal,4", lines)
+
+    def test_export_csv_pack(self):
+        signal   = Signal(8)
+        analyzer = LiteScopeAnalyzer(signal, depth=16, pack=4, csr_csv=None)
+
+        class VNS:
+            def get_name(self, signal):
+                return "signal"
+
+        with tempfile.NamedTemporaryFile() as f:
+            analyzer.export_csv(VNS(), f.name)
+            with open(f.name) as csv_file:
+                lines = csv_file.read().splitlines()
+
+        self.assertIn("config,None,storage_width,8", lines)
+        self.assertIn("config,None,pack,4", lines)
+
+    def test_export_csv_counters(self):
+        signal   = Signal(8)
+        analyzer = LiteScopeAnalyzer(signal, depth=16, counters=4, csr_csv=None)
+
+        class VNS:
+            def get_name(self, signal):
+                return "signal"
+
+        with tempfile.NamedTemporaryFile() as f:
+            analyzer.export_csv(VNS(), f.name)
+            with open(f.name) as csv_file:
+                lines = csv_file.read().splitlines()
+
+        self.assertIn("config,None,counters,4", lines)
+        self.assertIn("config,None,counter_width,48", lines)
+
+    def test_export_csv_histogram(self):
+        signal   = Signal(8)
+        analyzer = LiteScopeAnalyzer(signal, depth=16, with_histogram=True, histogram_bins=64,
+            csr_csv=None)
+
+        class VNS:
+            def get_name(self, signal):
+                return "signal"
+
+        with tempfile.NamedTemporaryFile() as f:
+            analyzer.export_csv(VNS(), f.name)
+            with open(f.name) as csv_file:
+                lines = csv_file.read().splitlines()
+
+        self.assertIn("config,None,with_histogram,1", lines)
+        self.assertIn("config,None,histogram_bins,64", lines)
+        self.assertIn("config,None,histogram_width,32", lines)
+
+    def test_export_csv_latency(self):
+        signal   = Signal(8)
+        analyzer = LiteScopeAnalyzer(signal, depth=16, with_latency=True, latency_width=24,
+            csr_csv=None)
+
+        class VNS:
+            def get_name(self, signal):
+                return "signal"
+
+        with tempfile.NamedTemporaryFile() as f:
+            analyzer.export_csv(VNS(), f.name)
+            with open(f.name) as csv_file:
+                lines = csv_file.read().splitlines()
+
+        self.assertIn("config,None,with_latency,1", lines)
+        self.assertIn("config,None,latency_width,24", lines)
+
+    def test_export_csv_sniffer(self):
+        endpoint = stream.Endpoint([("data", 8)])
+        bus      = wishbone.Interface()
+        analyzer = LiteScopeAnalyzer({
+            0: LiteScopeSniffer(endpoint, fields=["data", "last"]),
+            1: LiteScopeSniffer(bus),
+        }, depth=16, csr_csv=None)
+        names = {
+            analyzer.sniffers[0].beat : "ep_beat",
+            endpoint.data             : "ep_data",
+            endpoint.last             : "ep_last",
+            analyzer.sniffers[1].beat : "wb_beat",
+        }
+
+        class VNS:
+            def get_name(self, signal):
+                return names.get(signal, "signal")
+
+        with tempfile.NamedTemporaryFile() as f:
+            analyzer.export_csv(VNS(), f.name)
+            with open(f.name) as csv_file:
+                lines = csv_file.read().splitlines()
+
+        self.assertEqual(analyzer.groups[0], [analyzer.sniffers[0].beat, endpoint.data, endpoint.last])
+        self.assertIn("config,None,with_qualifier,1", lines)
+        self.assertIn("signal,0,ep_beat,1", lines)
+        self.assertIn("transaction,0,ep_beat,stream", lines)
+        self.assertIn("transaction_field,0,ep_data,data", lines)
+        self.assertIn("transaction_field,0,ep_last,last", lines)
+        self.assertIn("transaction,1,wb_beat,wishbone", lines)
+        self.assertEqual(len([l for l in lines if l.startswith("transaction_field,1,")]), 5)
+
+    def test_export_csv_trigger_group(self):
+        analyzer = LiteScopeAnalyzer({0: Signal(8), 1: Signal(4)}, depth=16, with_trigger_group=True,
+            csr_csv=None)
+
+        class VNS:
+            def get_name(self, signal):
+                return "signal"
+
+        with tempfile.NamedTemporaryFile() as f:
+            analyzer.export_csv(VNS(), f.name)
+            with open(f.name) as csv_file:
+                lines = csv_file.read().splitlines()
+
+        self.assertIn("config,None,with_trigger_group,1", lines)
+
+    def test_export_csv_cross_trigger(self):
+        timestamp = LiteScopeTimestamp(frequency=125e6)
+        analyzer  = LiteScopeAnalyzer(Signal(8), depth=16, with_cross_trigger=True,
+            timestamp=timestamp, csr_csv=None)
+
+        class VNS:
+            def get_name(self, signal):
+                return "signal"
+
+        with tempfile.NamedTemporaryFile() as f:
+            analyzer.export_csv(VNS(), f.name)
+            with open(f.name) as csv_file:
+                lines = csv_file.read().splitlines()
+
+        self.assertIn("config,None,with_cross_trigger,1", lines)
+        self.assertIn("config,None,timestamp_frequency,125000000", lines)
+
+    def test_export_csv_read_width(self):
+        signal = Signal(72)
+
+        class VNS:
+            def get_name(self, signal):
+                return "signal"
+
+        for csr_data_width, read_width in [(32, None), (64, 64)]:
+            analyzer = LiteScopeAnalyzer(signal, depth=16, csr_data_width=csr_data_width, csr_csv=None)
+            with tempfile.NamedTemporaryFile() as f:
+                analyzer.export_csv(VNS(), f.name)
+                with open(f.name) as csv_file:
+                    lines = [l for l in csv_file.read().splitlines() if "read_width" in l]
+            self.assertEqual(lines, [] if read_width is None else [f"config,None,read_width,{read_width}"])
 
     def test_export_csv_with_fsm_enum(self):
         fsm = FSM(reset_state="IDLE")
@@ -47,6 +47,9 @@ class FakeAnalyzer:
     def configure_group(self, value):
         self.calls.append(("configure_group", value))
 
+    def configure_trigger_group(self, value):
+        self.calls.append(("configure_trigger_group", value))
+
     def configure_subsampler(self, value):
         self.calls.append(("configure_subsampler", value))
 
@@ -62,6 +65,9 @@ class FakeAnalyzer:
     def add_falling_edge_trigger(self, name):
         self.calls.append(("add_falling_edge_trigger", name))
 
+    def add_change_trigger(self, name):
+        self.calls.append(("add_change_trigger", name))
+
     def run(self, offset=0, length=None):
         self.calls.append(("run", offset, length))
 
@@ -74,6 +80,10 @@ class FakeAnalyzer:
     def save(self, filename):
         self.calls.append(("save", filename))
 
+    def histogram(self, name, window, shift=0):
+        self.calls.append(("histogram", name, window, shift))
+        return {"IDLE": 3, "RUN": 1}
+
 
 class TestCLI(unittest.TestCase):
     def write_csv(self, filename):
@@ -130,6 +140,7 @@ class TestCLI(unittest.TestCase):
         args = type("Args", (), {
             "rising_edge"   : ["flag"],
             "falling_edge"  : ["state"],
+            "change"        : ["state"],
             "value_trigger" : [("flag", "1"), ("state", "0b1x0")],
         })()
 
@@ -139,6 +150,7 @@ class TestCLI(unittest.TestCase):
         self.assertEqual(analyzer.calls, [
             ("add_rising_edge_trigger", "flag"),
             ("add_falling_edge_trigger", "state"),
+            ("add_change_trigger", "state"),
             ("add_trigger", {"flag": "1", "state": "0b1x0"}),
         ])
 
@@ -156,10 +168,12 @@ class TestCLI(unittest.TestCase):
                 "csr_csv"       : csr_csv,
                 "csv"           : csvname,
                 "group"         : 0,
+                "trigger_group" : None,
                 "subsampling"   : 4,
                 "rle"           : True,
                 "rising_edge"   : None,
                 "falling_edge"  : None,
+                "change"        : None,
                 "value_trigger" : None,
                 "offset"        : "0x10",
                 "length"        : "0x20",
@@ -190,6 +204,73 @@ class TestCLI(unittest.TestCase):
             ("save", args.dump),
         ])
 
+    def test_run_batch_configures_trigger_group(self):
+        FakeAnalyzer.instances = []
+        with tempfile.TemporaryDirectory() as tmpdir:
+            csvname = os.path.join(tmpdir, "analyzer.csv")
+            self.write_csv(csvname)
+            args = type("Args", (), {
+                "host"          : "127.0.0.1",
+                "port"          : "2345",
+                "csr_csv"       : "csr.csv",
+                "csv"           : csvname,
+                "group"         : 1,
+                "trigger_group" : 0,
+                "subsampling"   : 1,
+                "rle"           : False,
+                "rising_edge"   : ["flag"],
+                "falling_edge"  : None,
+                "change"        : None,
+                "value_trigger" : None,
+                "offset"        : "0",
+                "length"        : None,
+                "dump"          : os.path.join(tmpdir, "dump.vcd"),
+            })()
+
+            with mock.patch.object(litescope_cli, "RemoteClient", FakeBus):
+                with mock.patch.object(litescope_cli, "LiteScopeAnalyzerDriver", FakeAnalyzer):
+                    with mock.patch("sys.stdout", io.StringIO()):
+                        litescope_cli.run_batch(args)
+
+        # Triggers are looked up in the trigger group.
+        self.assertEqual(FakeAnalyzer.instances[0].calls[:4], [
+            ("configure_group", 1),
+            ("configure_trigger_group", 0),
+            ("configure_subsampler", 1),
+            ("configure_rle", False),
+        ])
+        self.assertIn(("add_rising_edge_trigger", "flag"), FakeAnalyzer.instances[0].calls)
+
+    def test_run_histogram_prints_occupancy(self):
+        FakeBus.instances = []
+        FakeAnalyzer.instances = []
+        with tempfile.TemporaryDirectory() as tmpdir:
+            csvname = os.path.join(tmpdir, "analyzer.csv")
+            self.write_csv(csvname)
+            args = type("Args", (), {
+                "host"             : "127.0.0.1",
+                "port"             : "2345",
+                "csr_csv"          : "csr.csv",
+                "csv"              : csvname,
+                "group"            : 0,
+                "histogram"        : "state",
+                "histogram_window" : "0x1000",
+                "histogram_shift"  : 1,
+            })()
+
+            stdout = io.StringIO()
+            with mock.patch.object(litescope_cli, "RemoteClient", FakeBus):
+                with mock.patch.object(litescope_cli, "LiteScopeAnalyzerDriver", FakeAnalyzer):
+                    with mock.patch("sys.stdout", stdout):
+                        litescope_cli.run_histogram(args)
+
+        self.assertTrue(FakeBus.instances[0].closed)
+        self.assertEqual(FakeAnalyzer.instances[0].calls, [
+            ("configure_group", 0),
+            ("histogram", "state", 0x1000, 1),
+        ])
+        self.assertEqual(stdout.getvalue().split(), ["IDLE:", "3", "(75.00%)", "RUN:", "1", "(25.00%)"])
+
 
 if __name__ == "__main__":
     unittest.main()
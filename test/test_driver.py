@@ -10,7 +10,8 @@ import tempfile
 import unittest
 import zipfile
 
-from litescope import LiteScopeAnalyzerDriver
+from litescope import LiteScopeAnalyzerDriver, LiteScopeMultiAnalyzerDriver
+from litescope import LiteScopeStreamReceiver
 from litescope.software.dump.common import DumpData
 
 
@@ -39,9 +40,25 @@ class FakeRegs:
         self.d = {f"{name}_{k}": v for k, v in regs.items()}
 
 
+class FakeWindowReg(FakeReg):
+    def __init__(self, base, words, value=0):
+        FakeReg.__init__(self, value=value)
+        self.base  = base
+        self.words = words
+
+    def readfn(self, addr, length, burst=None):
+        self.readfn_calls.append((addr, length, burst))
+        index = (addr - self.base)//4
+        return self.words[index:index + length]
+
+
 def write_config(filename, data_width=8, depth=16, samplerate=100000000,
                  storage_width=None, subsampler_width=None,
-                 with_rle=None, rle_length=None, enums=None):
+                 with_rle=None, rle_length=None, with_wishbone=None,
+                 with_dma=None, dma_base=None, stream_packet_length=None, segments=None,
+                 sequencer_states=None, qualifier_timestamp_width=None, with_transitional=None,
+                 with_pingpong=None, lanes=None, read_width=None, pack=None, counters=None,
+                 histogram_bins=None, with_latency=None, with_delta=None, enums=None):
     with open(filename, "w") as f:
         f.write(f"config,None,data_width,{data_width}\n")
         if storage_width is not None:
@@ -54,6 +71,44 @@ def write_config(filename, data_width=8, depth=16, samplerate=100000000,
             f.write(f"config,None,with_rle,{int(with_rle)}\n")
         if rle_length is not None:
             f.write(f"config,None,rle_length,{rle_length}\n")
+        if with_delta is not None:
+            f.write(f"config,None,with_delta,{int(with_delta)}\n")
+        if qualifier_timestamp_width is not None:
+            f.write(f"config,None,with_qualifier,1\n")
+            f.write(f"config,None,qualifier_timestamp_width,{qualifier_timestamp_width}\n")
+        if with_transitional is not None:
+            f.write(f"config,None,with_transitional,{int(with_transitional)}\n")
+        if with_wishbone is not None:
+            f.write(f"config,None,with_wishbone,{int(with_wishbone)}\n")
+        if with_dma is not None:
+            f.write(f"config,None,with_dma,{int(with_dma)}\n")
+            f.write(f"config,None,dma_base,{dma_base}\n")
+        if segments is not None:
+            f.write(f"config,None,segments,{segments}\n")
+        if with_pingpong is not None:
+            f.write(f"config,None,with_pingpong,{int(with_pingpong)}\n")
+        if lanes is not None:
+            f.write(f"config,None,lanes,{lanes}\n")
+        if read_width is not None:
+            f.write(f"config,None,read_width,{read_width}\n")
+        if pack is not None:
+            f.write(f"config,None,pack,{pack}\n")
+        if counters is not None:
+            f.write(f"config,None,counters,{counters}\n")
+            f.write(f"config,None,counter_width,48\n")
+        if histogram_bins is not None:
+            f.write(f"config,None,with_histogram,1\n")
+            f.write(f"config,None,histogram_bins,{histogram_bins}\n")
+            f.write(f"config,None,histogram_width,32\n")
+        if with_latency is not None:
+            f.write(f"config,None,with_latency,{int(with_latency)}\n")
+            f.write(f"config,None,latency_width,32\n")
+        if sequencer_states is not None:
+            f.write(f"config,None,with_sequencer,1\n")
+            f.write(f"config,None,sequencer_states,{sequencer_states}\n")
+        if stream_packet_length is not None:
+            f.write(f"config,None,with_streaming,1\n")
+            f.write(f"config,None,stream_packet_length,{stream_packet_length}\n")
         f.write("signal,0,flag,1\n")
         f.write("signal,0,state,3\n")
         f.write(f"signal,1,wide,{data_width}\n")
@@ -62,7 +117,9 @@ def write_config(filename, data_width=8, depth=16, samplerate=100000000,
                 f.write(f"enum,{group},{name},{value},{label}\n")
 
 
-def make_regs(name="analyzer", mem_level=0, mem_data=None, with_rle=False):
+def make_regs(name="analyzer", mem_level=0, mem_data=None, with_rle=False, with_sequencer=False,
+              with_edges=True, with_range=False, with_count=False, with_qualifier=False,
+              with_transitional=False, with_delta=False):
     regs = {
         "mux_value":             FakeReg(),
         "trigger_mem_full":      FakeReg(),
@@ -79,7 +136,27 @@ def make_regs(name="analyzer", mem_level=0, mem_data=None, with_rle=False):
         "storage_mem_data":      FakeReg(data=mem_data, addr=0x1234),
     }
     if with_rle:
-        regs["rle_enable"] = FakeReg()
+        for reg in ["enable", "ignore", "zero"]:
+            regs["rle_" + reg] = FakeReg()
+    if with_delta:
+        regs["delta_mode"] = FakeReg()
+    if with_edges:
+        for reg in ["rising", "falling", "change"]:
+            regs["trigger_mem_" + reg] = FakeReg()
+    if with_range:
+        for reg in ["range_mask", "range_min", "range_max"]:
+            regs["trigger_mem_" + reg] = FakeReg()
+    if with_count:
+        regs["trigger_mem_count"] = FakeReg()
+    if with_qualifier:
+        for reg in ["enable", "mask", "value"]:
+            regs["qualifier_" + reg] = FakeReg()
+    if with_transitional:
+        regs["qualifier_change"] = FakeReg()
+    if with_sequencer:
+        for reg in ["index", "count", "next", "final", "timeout", "timeout_next"]:
+            regs["trigger_mem_" + reg] = FakeReg()
+        del regs["trigger_mem_full"]
     return FakeRegs(name, regs)
 
 
@@ -111,6 +188,19 @@ def encode_rle(samples, data_width, storage_width, max_count):
     return encoded
 
 
+def encode_delta(samples, start, mode, data_width):
+    # Samples following start replaced by their delta with the previous sample.
+    encoded = list(samples[:start + 1])
+    for prev, sample in zip(samples[start:], samples[start + 1:]):
+        if mode == "xor":
+            encoded.append(prev ^ sample)
+        elif mode == "sub":
+            encoded.append((sample - prev) % 2**data_width)
+        else:
+            encoded.append(sample)
+    return encoded
+
+
 def pack_storage_words(words, storage_width):
     datas = []
     swpw  = (storage_width + 31) // 32
@@ -180,6 +270,24 @@ class TestAnalyzerDriver(unittest.TestCase):
         self.assertFalse(driver.rle_enabled)
         self.assertEqual(regs.d["analyzer_rle_enable"].writes, [1, 0])
 
+    def test_configure_rle_ignore_mask(self):
+        driver, regs = self.make_driver(data_width=4, storage_width=5, with_rle=True)
+        self.clear_writes(regs)
+
+        driver.configure_rle(True, ignore=["flag"], zero=True)
+        driver.configure_rle(True)
+
+        self.assertEqual(regs.d["analyzer_rle_ignore"].writes, [0x1, 0])
+        self.assertEqual(regs.d["analyzer_rle_zero"].writes,   [1, 0])
+        self.assertEqual(regs.d["analyzer_rle_enable"].writes, [1, 1])
+
+        # Older gateware without ignore mask.
+        driver, regs = self.make_driver(data_width=4, storage_width=5, with_rle=True)
+        del driver.rle_ignore, driver.rle_zero
+        driver.configure_rle(True)
+        with self.assertRaises(ValueError):
+            driver.configure_rle(True, ignore=["flag"])
+
     def test_configure_rle_rejects_unavailable_analyzer(self):
         driver, regs = self.make_driver()
         with self.assertRaises(ValueError):
@@ -219,6 +327,33 @@ class TestAnalyzerDriver(unittest.TestCase):
         driver, regs = self.make_driver()
         self.clear_writes(regs)
 
+        driver.add_rising_edge_trigger("flag")
+        self.assertEqual(regs.d["analyzer_trigger_mem_rising"].writes,  [1])
+        self.assertEqual(regs.d["analyzer_trigger_mem_falling"].writes, [0])
+        self.assertEqual(regs.d["analyzer_trigger_mem_mask"].writes,    [0])
+        self.assertEqual(regs.d["analyzer_trigger_mem_write"].writes,   [1])
+
+        self.clear_writes(regs)
+        driver.add_falling_edge_trigger("flag")
+        self.assertEqual(regs.d["analyzer_trigger_mem_falling"].writes, [1])
+        self.assertEqual(regs.d["analyzer_trigger_mem_write"].writes,   [1])
+
+        self.clear_writes(regs)
+        driver.add_trigger(cond={"flag": "rising", "state": "0b1x1"})
+        driver.add_change_trigger("state")
+        self.assertEqual(regs.d["analyzer_trigger_mem_value"].writes,  [0xa, 0])
+        self.assertEqual(regs.d["analyzer_trigger_mem_mask"].writes,   [0xa, 0])
+        self.assertEqual(regs.d["analyzer_trigger_mem_rising"].writes, [0x1, 0])
+        self.assertEqual(regs.d["analyzer_trigger_mem_change"].writes, [0x0, 0xe])
+        self.assertEqual(regs.d["analyzer_trigger_mem_write"].writes,  [1, 1])
+
+    def test_edge_trigger_helpers_without_edge_comparators(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        config_csv  = os.path.join(self.tmpdir.name, "analyzer.csv")
+        write_config(config_csv)
+        regs   = make_regs(with_edges=False)
+        driver = LiteScopeAnalyzerDriver(regs, "analyzer", config_csv=config_csv)
+
         driver.add_rising_edge_trigger("flag")
         self.assertEqual(regs.d["analyzer_trigger_mem_value"].writes, [0, 1])
         self.assertEqual(regs.d["analyzer_trigger_mem_mask"].writes,  [1, 1])
@@ -228,6 +363,83 @@ class TestAnalyzerDriver(unittest.TestCase):
         self.assertEqual(regs.d["analyzer_trigger_mem_value"].writes, [1, 0])
         self.assertEqual(regs.d["analyzer_trigger_mem_mask"].writes,  [1, 1])
 
+        with self.assertRaises(ValueError):
+            driver.add_change_trigger("flag")
+
+    def test_range_and_count_triggers(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        config_csv  = os.path.join(self.tmpdir.name, "analyzer.csv")
+        write_config(config_csv)
+        regs   = make_regs(with_range=True, with_count=True)
+        driver = LiteScopeAnalyzerDriver(regs, "analyzer", config_csv=config_csv)
+
+        driver.add_trigger(cond={"flag": "1", "state": ">=3"}, count=1000)
+        driver.add_trigger(cond={"state": "[2,5)"})
+        driver.add_trigger(cond={"state": "<2"})
+        self.assertEqual(regs.d["analyzer_trigger_mem_value"].writes,      [0x1, 0, 0])
+        self.assertEqual(regs.d["analyzer_trigger_mem_mask"].writes,       [0x1, 0, 0])
+        self.assertEqual(regs.d["analyzer_trigger_mem_range_mask"].writes, [0xe, 0xe, 0xe])
+        self.assertEqual(regs.d["analyzer_trigger_mem_range_min"].writes,  [3 << 1, 2 << 1, 0])
+        self.assertEqual(regs.d["analyzer_trigger_mem_range_max"].writes,  [7 << 1, 4 << 1, 1 << 1])
+        self.assertEqual(regs.d["analyzer_trigger_mem_count"].writes,      [1000, 1, 1])
+        self.assertEqual(regs.d["analyzer_trigger_mem_write"].writes,      [1, 1, 1])
+
+        for cond in [{"state": "<0"}, {"state": ">7"}, {"state": "[4,4)"}, {"flag": ">0", "state": "<3"}]:
+            with self.assertRaises(ValueError):
+                driver.add_trigger(cond=cond)
+        with self.assertRaises(ValueError):
+            driver.add_trigger(cond={"flag": "1"}, count=0)
+        with self.assertRaises(ValueError):
+            driver.add_trigger(cond={"flag": "1"}, count=70000) # Does not fit the 16-bit counter.
+        self.assertEqual(regs.d["analyzer_trigger_mem_write"].writes, [1, 1, 1])
+
+    def test_range_and_count_triggers_require_gateware_support(self):
+        driver, regs = self.make_driver()
+
+        with self.assertRaises(ValueError):
+            driver.add_trigger(cond={"state": ">3"})
+        with self.assertRaises(ValueError):
+            driver.add_trigger(cond={"flag": "1"}, count=2)
+        self.assertEqual(regs.d["analyzer_trigger_mem_write"].writes, [])
+
+    def test_done_waits_for_armed_storage(self):
+        driver, regs = self.make_driver()
+        self.assertTrue(driver.done())
+
+        regs.d["analyzer_storage_armed"] = FakeReg(0)
+        driver.build()
+        self.assertFalse(driver.done())
+        regs.d["analyzer_storage_armed"].value = 1
+        self.assertTrue(driver.done())
+
+    def test_trigger_sequencer_programming(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        config_csv  = os.path.join(self.tmpdir.name, "analyzer.csv")
+        write_config(config_csv, sequencer_states=4)
+        regs   = make_regs(with_sequencer=True)
+        driver = LiteScopeAnalyzerDriver(regs, "analyzer", config_csv=config_csv)
+
+        driver.add_sequencer_state(cond={"state": "0b101"}, count=3)
+        driver.add_sequencer_state(cond={"flag": 1}, timeout=100, timeout_next=0)
+        driver.add_trigger(cond={"flag": "0"})
+        self.assertEqual(regs.d["analyzer_trigger_mem_write"].writes, [])
+
+        driver.run(offset=0, length=8)
+
+        self.assertEqual(regs.d["analyzer_trigger_mem_index"].writes,        [0, 1, 2])
+        self.assertEqual(regs.d["analyzer_trigger_mem_value"].writes,        [0xa, 0x1, 0x0])
+        self.assertEqual(regs.d["analyzer_trigger_mem_mask"].writes,         [0xe, 0x1, 0x1])
+        self.assertEqual(regs.d["analyzer_trigger_mem_count"].writes,        [3, 1, 1])
+        self.assertEqual(regs.d["analyzer_trigger_mem_next"].writes,         [1, 2, 0])
+        self.assertEqual(regs.d["analyzer_trigger_mem_final"].writes,        [0, 0, 1])
+        self.assertEqual(regs.d["analyzer_trigger_mem_timeout"].writes,      [0, 100, 0])
+        self.assertEqual(regs.d["analyzer_trigger_mem_timeout_next"].writes, [0, 0, 0])
+        self.assertEqual(regs.d["analyzer_trigger_mem_write"].writes,        [1, 1, 1])
+
+        driver.add_sequencer_state()
+        with self.assertRaises(ValueError):
+            driver.add_sequencer_state()
+
     def test_add_trigger_checks_memory_full(self):
         driver, regs = self.make_driver()
         regs.d["analyzer_trigger_mem_full"].value = 1
@@ -288,6 +500,458 @@ class TestAnalyzerDriver(unittest.TestCase):
             (0x1234, 6, "fixed"),
         ])
 
+    def test_upload_packs_wide_csr_subwords(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        config_csv  = os.path.join(self.tmpdir.name, "analyzer.csv")
+        write_config(config_csv, data_width=72, read_width=64)
+        mem_data = [
+            0x0123456789abcdef, 0x01,
+            0xfedcba9876543210, 0xff,
+        ]
+        regs   = make_regs(mem_level=2, mem_data=mem_data)
+        driver = LiteScopeAnalyzerDriver(regs, "analyzer", config_csv=config_csv)
+
+        data = driver.upload()
+
+        self.assertEqual(list(data), [0x010123456789abcdef, 0xfffedcba9876543210])
+        self.assertEqual(regs.d["analyzer_storage_mem_data"].readfn_calls, [
+            (0x1234, 4, "fixed"),
+        ])
+
+    def test_upload_through_wishbone_window(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        config_csv  = os.path.join(self.tmpdir.name, "analyzer.csv")
+        write_config(config_csv, data_width=40, depth=256, with_wishbone=1)
+        samples = [0xab00000000 + i for i in range(200)]
+        words   = []
+        for sample in samples:
+            words += [sample & 0xffffffff, sample >> 32]
+        regs = make_regs()
+        regs.d["analyzer_storage_mem_level"] = FakeWindowReg(0x80000000, words, value=len(samples))
+
+        driver = LiteScopeAnalyzerDriver(regs, "analyzer", config_csv=config_csv, mem_base=0x80000000)
+        data = driver.upload()
+
+        self.assertEqual(list(data), samples)
+        self.assertEqual(regs.d["analyzer_storage_mem_level"].readfn_calls, [
+            (0x80000000,            192, "incr"),
+            (0x80000000 + 4*2*96,   192, "incr"),
+            (0x80000000 + 4*2*192,   16, "incr"),
+        ])
+
+        # Arbitrary range.
+        self.assertEqual(list(driver.read_storage(start=150, length=3)), samples[150:153])
+
+    def test_upload_dma_ring_buffer_wraps(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        config_csv  = os.path.join(self.tmpdir.name, "analyzer.csv")
+        write_config(config_csv, data_width=8, depth=8, with_dma=1, dma_base=0x40000000)
+        ring = [0x15, 0x16, 0x17, 0x10, 0x11, 0x12, 0x13, 0x14]
+        regs = make_regs()
+        regs.d["analyzer_storage_mem_level"] = FakeWindowReg(0x40000000, ring, value=6)
+        regs.d["analyzer_storage_mem_start"] = FakeReg(4)
+
+        driver = LiteScopeAnalyzerDriver(regs, "analyzer", config_csv=config_csv)
+        data = driver.upload()
+
+        self.assertEqual(list(data), [0x11, 0x12, 0x13, 0x14, 0x15, 0x16])
+        self.assertEqual(regs.d["analyzer_storage_mem_level"].readfn_calls, [
+            (0x40000000 + 4*4, 4, "incr"),
+            (0x40000000 + 4*0, 2, "incr"),
+        ])
+
+    def test_upload_segments(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        config_csv  = os.path.join(self.tmpdir.name, "analyzer.csv")
+        write_config(config_csv, data_width=8, depth=16, segments=4)
+        segments = [([0x10, 0x11, 0x12], 1, 100), ([0x20, 0x21], 0, 164)]
+        state    = {"sel": 0}
+
+        class SelReg(FakeReg):
+            def write(self, value):
+                FakeReg.write(self, value)
+                state["sel"] = value
+
+        class SegmentReg(FakeReg):
+            def __init__(self, index, **kwargs):
+                FakeReg.__init__(self, **kwargs)
+                self.index = index
+
+            def read(self):
+                return segments[state["sel"]][self.index]
+
+        class LevelReg(FakeReg):
+            def read(self):
+                return len(segments[state["sel"]][0])
+
+        class DataReg(FakeReg):
+            def readfn(self, addr, length, burst=None):
+                return segments[state["sel"]][0][:length]
+
+        regs = make_regs()
+        regs.d["analyzer_storage_segment_count"]     = FakeReg(2)
+        regs.d["analyzer_storage_segment_sel"]       = SelReg()
+        regs.d["analyzer_storage_segment_trigger"]   = SegmentReg(1)
+        regs.d["analyzer_storage_segment_timestamp"] = SegmentReg(2)
+        regs.d["analyzer_storage_mem_level"]         = LevelReg()
+        regs.d["analyzer_storage_mem_data"]          = DataReg()
+
+        driver   = LiteScopeAnalyzerDriver(regs, "analyzer", config_csv=config_csv)
+        captures = driver.upload_segments()
+
+        self.assertEqual([list(c) for c in captures], [[0x10, 0x11, 0x12], [0x20, 0x21]])
+        self.assertEqual([c.trigger   for c in captures], [1, 0])
+        self.assertEqual([c.timestamp for c in captures], [100, 164])
+        self.assertEqual(regs.d["analyzer_storage_segment_sel"].writes, [0, 1])
+
+        # Run length/offset are checked against segment depth.
+        driver.run(offset=1, length=4)
+        with self.assertRaises(AssertionError):
+            driver.run(offset=0, length=5)
+
+    def test_pingpong_captures(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        config_csv  = os.path.join(self.tmpdir.name, "analyzer.csv")
+        write_config(config_csv, data_width=8, depth=16, with_pingpong=True)
+        banks = [[0x10, 0x11], [0x20, 0x21]]
+        state = {"sel": 0}
+
+        class SelReg(FakeReg):
+            def write(self, value):
+                FakeReg.write(self, value)
+                state["sel"] = value
+
+        class LevelReg(FakeReg):
+            def read(self):
+                return len(banks[state["sel"]])
+
+        class DataReg(FakeReg):
+            def readfn(self, addr, length, burst=None):
+                return banks[state["sel"]][:length]
+
+        regs = make_regs()
+        regs.d["analyzer_storage_bank_ready"]   = FakeReg(0b11)
+        regs.d["analyzer_storage_bank_sel"]     = SelReg()
+        regs.d["analyzer_storage_bank_release"] = FakeReg()
+        regs.d["analyzer_storage_mem_level"]    = LevelReg()
+        regs.d["analyzer_storage_mem_data"]     = DataReg()
+
+        driver   = LiteScopeAnalyzerDriver(regs, "analyzer", config_csv=config_csv)
+        captures = [list(c) for c in driver.captures(count=3, delay=0)]
+
+        self.assertEqual(captures, [[0x10, 0x11], [0x20, 0x21], [0x10, 0x11]])
+        self.assertEqual(regs.d["analyzer_storage_bank_sel"].writes, [0, 1, 0])
+        self.assertEqual(regs.d["analyzer_storage_bank_release"].writes, [1, 1, 1])
+
+        # Run length/offset are checked against bank depth.
+        driver.run(offset=1, length=8)
+        with self.assertRaises(AssertionError):
+            driver.run(offset=0, length=9)
+
+    def test_pingpong_captures_require_gateware_support(self):
+        driver, regs = self.make_driver()
+        with self.assertRaises(ValueError):
+            next(driver.captures())
+
+    def test_event_counters(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        config_csv  = os.path.join(self.tmpdir.name, "analyzer.csv")
+        write_config(config_csv, data_width=8, counters=2)
+        regs = make_regs()
+        for reg in ["enable", "window", "mask0", "value0", "mask1", "value1"]:
+            regs.d["analyzer_counter_" + reg] = FakeReg()
+        regs.d["analyzer_counter_done"]   = FakeReg(1)
+        regs.d["analyzer_counter_count0"] = FakeReg(12)
+        regs.d["analyzer_counter_count1"] = FakeReg(2**40)
+        driver = LiteScopeAnalyzerDriver(regs, "analyzer", config_csv=config_csv)
+
+        driver.configure_counter(0, cond={"state": 5})
+        driver.configure_counter(1, cond={"flag": 1})
+        counts = driver.count(window=10**9, delay=0)
+
+        self.assertEqual(counts, [12, 2**40])
+        self.assertEqual(regs.d["analyzer_counter_mask0"].writes,  [0b1110])
+        self.assertEqual(regs.d["analyzer_counter_value0"].writes, [0b1010])
+        self.assertEqual(regs.d["analyzer_counter_mask1"].writes,  [0b0001])
+        self.assertEqual(regs.d["analyzer_counter_window"].writes, [10**9])
+        self.assertEqual(regs.d["analyzer_counter_enable"].writes, [0, 1, 0])
+
+        with self.assertRaises(ValueError):
+            driver.configure_counter(2, cond={"flag": 1})
+        with self.assertRaises(ValueError):
+            driver.count(window=0)
+
+    def test_event_counters_require_gateware_support(self):
+        driver, regs = self.make_driver()
+        with self.assertRaises(ValueError):
+            driver.configure_counter(0, cond={"flag": 1})
+        with self.assertRaises(ValueError):
+            driver.count(window=100)
+
+    def test_histogram(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        config_csv  = os.path.join(self.tmpdir.name, "analyzer.csv")
+        write_config(config_csv, data_width=8, histogram_bins=8,
+            enums={(0, "state"): {0: "IDLE", 1: "RUN", 2: "DONE"}})
+        counts = [5, 0, 3, 0, 0, 0, 0, 1]
+        state  = {"index": 0}
+
+        class IndexReg(FakeReg):
+            def write(self, value):
+                FakeReg.write(self, value)
+                state["index"] = value
+
+        class CountReg(FakeReg):
+            def read(self):
+                return counts[state["index"]]
+
+        regs = make_regs()
+        for reg in ["enable", "window", "mask", "shift"]:
+            regs.d["analyzer_histogram_" + reg] = FakeReg()
+        regs.d["analyzer_histogram_done"]  = FakeReg(1)
+        regs.d["analyzer_histogram_index"] = IndexReg()
+        regs.d["analyzer_histogram_count"] = CountReg()
+        driver = LiteScopeAnalyzerDriver(regs, "analyzer", config_csv=config_csv)
+
+        histogram = driver.histogram("state", window=1000, delay=0)
+
+        self.assertEqual(histogram, {"IDLE": 5, "RUN": 0, "DONE": 3, 7: 1})
+        self.assertEqual(regs.d["analyzer_histogram_mask"].writes,   [0b1110])
+        self.assertEqual(regs.d["analyzer_histogram_shift"].writes,  [1])
+        self.assertEqual(regs.d["analyzer_histogram_window"].writes, [1000])
+        self.assertEqual(regs.d["analyzer_histogram_index"].writes,  list(range(8)))
+        self.assertEqual(regs.d["analyzer_histogram_enable"].writes, [0, 1, 0])
+
+        # Binned values (bins lower value).
+        self.assertEqual(driver.histogram("state", window=1000, shift=1, delay=0), {0: 5, 4: 3})
+        self.assertEqual(regs.d["analyzer_histogram_shift"].writes[-1], 2)
+
+        # Wider fields need a bin shift.
+        driver.configure_group(1)
+        with self.assertRaises(ValueError):
+            driver.histogram("wide", window=1000)
+        self.assertEqual(driver.histogram("wide", window=1000, shift=5, delay=0), {0: 5, 64: 3, 224: 1})
+        self.assertEqual(regs.d["analyzer_histogram_mask"].writes[-1],  0xff)
+        self.assertEqual(regs.d["analyzer_histogram_shift"].writes[-1], 5)
+
+    def test_histogram_requires_gateware_support(self):
+        driver, regs = self.make_driver()
+        with self.assertRaises(ValueError):
+            driver.histogram("state", window=1000)
+
+    def test_latency(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        config_csv  = os.path.join(self.tmpdir.name, "analyzer.csv")
+        write_config(config_csv, data_width=8, with_latency=True)
+        regs = make_regs()
+        for reg in ["enable", "window", "start_mask", "start_value", "stop_mask", "stop_value"]:
+            regs.d["analyzer_latency_" + reg] = FakeReg()
+        regs.d["analyzer_latency_done"]  = FakeReg(1)
+        regs.d["analyzer_latency_count"] = FakeReg(4)
+        regs.d["analyzer_latency_min"]   = FakeReg(3)
+        regs.d["analyzer_latency_max"]   = FakeReg(12)
+        regs.d["analyzer_latency_sum"]   = FakeReg(26)
+        driver = LiteScopeAnalyzerDriver(regs, "analyzer", config_csv=config_csv)
+
+        driver.configure_latency(start={"flag": 1}, stop={"state": "0b1x1"})
+        stats = driver.latency(window=10**6, delay=0)
+
+        self.assertEqual(stats, {"count": 4, "min": 3, "max": 12, "sum": 26, "mean": 6.5})
+        self.assertEqual(regs.d["analyzer_latency_start_mask"].writes,  [0b0001])
+        self.assertEqual(regs.d["analyzer_latency_start_value"].writes, [0b0001])
+        self.assertEqual(regs.d["analyzer_latency_stop_mask"].writes,   [0b1010])
+        self.assertEqual(regs.d["analyzer_latency_stop_value"].writes,  [0b1010])
+        self.assertEqual(regs.d["analyzer_latency_window"].writes,      [10**6])
+        self.assertEqual(regs.d["analyzer_latency_enable"].writes,      [0, 1, 0])
+
+        regs.d["analyzer_latency_count"].value = 0
+        stats = driver.latency(window=10**6, delay=0)
+        self.assertEqual((stats["count"], stats["min"], stats["mean"]), (0, None, None))
+
+    def test_latency_requires_gateware_support(self):
+        driver, regs = self.make_driver()
+        with self.assertRaises(ValueError):
+            driver.configure_latency(start={"flag": 1}, stop={"flag": 0})
+        with self.assertRaises(ValueError):
+            driver.latency(window=100)
+
+    def test_configure_trigger_group(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        config_csv  = os.path.join(self.tmpdir.name, "analyzer.csv")
+        write_config(config_csv, data_width=8)
+        with open(config_csv, "a") as f:
+            f.write("config,None,with_trigger_group,1\n")
+        regs = make_regs()
+        regs.d["analyzer_trigger_mux_value"] = FakeReg()
+        driver = LiteScopeAnalyzerDriver(regs, "analyzer", config_csv=config_csv)
+
+        driver.configure_group(1)
+        driver.configure_trigger_group(0)
+        driver.add_trigger(cond={"state": "0b101"})
+
+        self.assertEqual(regs.d["analyzer_mux_value"].writes,         [1])
+        self.assertEqual(regs.d["analyzer_trigger_mux_value"].writes, [0])
+        self.assertEqual((driver.group, driver.trigger_group), (1, 0))
+        self.assertEqual(regs.d["analyzer_trigger_mem_value"].writes, [0b1010])
+
+    def test_configure_trigger_group_requires_gateware_support(self):
+        driver, regs = self.make_driver()
+        with self.assertRaises(ValueError):
+            driver.configure_trigger_group(0)
+
+    def make_cross_trigger_driver(self, name, samplerate=100000000):
+        config_csv = os.path.join(self.tmpdir.name, f"{name}.csv")
+        write_config(config_csv, data_width=4, samplerate=samplerate)
+        with open(config_csv, "a") as f:
+            f.write("config,None,with_cross_trigger,1\n")
+            f.write("config,None,timestamp_frequency,100000000\n")
+        regs = make_regs(name=name)
+        regs.d[f"{name}_cross_trigger_enable"] = FakeReg()
+        regs.d[f"{name}_cross_trigger_local"]  = FakeReg(1)
+        return LiteScopeAnalyzerDriver(regs, name, config_csv=config_csv), regs
+
+    def test_configure_cross_trigger(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        driver, regs = self.make_cross_trigger_driver("analyzer")
+
+        driver.configure_cross_trigger(trigger_in=True, local=False)
+
+        self.assertEqual(driver.timestamp_frequency, 100000000)
+        self.assertEqual(regs.d["analyzer_cross_trigger_enable"].writes, [1])
+        self.assertEqual(regs.d["analyzer_cross_trigger_local"].writes,  [0])
+
+    def test_configure_cross_trigger_requires_gateware_support(self):
+        driver, regs = self.make_driver()
+        with self.assertRaises(ValueError):
+            driver.configure_cross_trigger()
+
+    def test_multi_analyzer_run_arms_triggers_last(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        drivers = [self.make_cross_trigger_driver(name) for name in ["a", "b"]]
+        log = []
+        for driver, regs in drivers:
+            for reg in ["storage_enable", "trigger_enable"]:
+                regs.d[f"{driver.name}_{reg}"].write = lambda value, name=f"{driver.name}_{reg}": \
+                    log.append((name, value))
+
+        LiteScopeMultiAnalyzerDriver([driver for driver, regs in drivers]).run(offset=2, length=8)
+
+        self.assertEqual(log, [
+            ("a_trigger_enable", 0), ("b_trigger_enable", 0),
+            ("a_storage_enable", 1), ("b_storage_enable", 1),
+            ("a_trigger_enable", 1), ("b_trigger_enable", 1),
+        ])
+        self.assertEqual([(driver.offset, driver.length) for driver, regs in drivers], [(2, 8)]*2)
+
+    def test_multi_analyzer_save_aligns_captures(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        a, _ = self.make_cross_trigger_driver("a", samplerate=100000000)
+        b, _ = self.make_cross_trigger_driver("b", samplerate=50000000)
+        a.data = DumpData(4)
+        a.data.extend([i << 1 for i in range(8)])
+        a.data.trigger           = 2
+        a.data.trigger_timestamp = 1000
+        b.data = DumpData(4)
+        b.data.extend([i << 1 for i in [4, 5, 6, 7]])
+        b.data.trigger           = 1
+        b.data.trigger_timestamp = 1004 # 40ns after a's trigger.
+
+        filename = os.path.join(self.tmpdir.name, "capture.py")
+        LiteScopeMultiAnalyzerDriver([a, b]).save(filename)
+        scope = {}
+        with open(filename) as f:
+            exec(f.read(), scope)
+        dump = scope["dump"]
+
+        # Resampled at the fastest (10ns) period, from a's first sample to b's last sample.
+        self.assertEqual(dump["a_state"][::2], [0, 1, 2, 3, 4, 5, 6, 7, 7, 7, 7, 7])
+        self.assertEqual(dump["b_state"][::2], [4, 4, 4, 4, 4, 4, 5, 5, 6, 6, 7, 7])
+        self.assertEqual(dump["scope_trig"].index(1), 2)
+
+    def test_multi_analyzer_save_requires_global_timestamp(self):
+        driver, regs = self.make_driver()
+        driver.data = DumpData(8)
+        driver.data.extend([0, 1])
+        with self.assertRaises(ValueError):
+            LiteScopeMultiAnalyzerDriver([driver]).save("capture.vcd")
+
+    def write_sniffer_config(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        config_csv  = os.path.join(self.tmpdir.name, "analyzer.csv")
+        with open(config_csv, "w") as f:
+            f.write("config,None,data_width,22\n")
+            f.write("config,None,storage_width,30\n")
+            f.write("config,None,depth,16\n")
+            f.write("config,None,samplerate,100000000\n")
+            f.write("config,None,with_qualifier,1\n")
+            f.write("config,None,qualifier_timestamp_width,8\n")
+            for group, name, width in [
+                (0, "ep_beat", 1), (0, "ep_last", 1), (0, "ep_data", 8),
+                (1, "wb_beat", 1), (1, "wb_we", 1), (1, "wb_adr", 4), (1, "wb_dat_w", 8),
+                (1, "wb_dat_r", 8)]:
+                f.write(f"signal,{group},{name},{width}\n")
+            f.write("transaction,0,ep_beat,stream\n")
+            f.write("transaction_field,0,ep_last,last\n")
+            f.write("transaction_field,0,ep_data,data\n")
+            f.write("transaction,1,wb_beat,wishbone\n")
+            for field in ["we", "adr", "dat_w", "dat_r"]:
+                f.write(f"transaction_field,1,wb_{field},{field}\n")
+        return config_csv
+
+    def test_stream_transactions(self):
+        config_csv = self.write_sniffer_config()
+        mem_data = [
+            (0 << 22) | (0x05 << 2),               # Trigger sample (not a beat).
+            (1 << 22) | (0x11 << 2) | 0b01,
+            (1 << 22) | (0x22 << 2) | 0b11,
+            (5 << 22) | (0x33 << 2) | 0b11,
+        ]
+        regs   = make_regs(mem_level=4, mem_data=mem_data, with_qualifier=True)
+        driver = LiteScopeAnalyzerDriver(regs, "analyzer", config_csv=config_csv)
+        self.clear_writes(regs)
+
+        driver.configure_transactions()
+        driver.upload()
+
+        self.assertEqual(regs.d["analyzer_qualifier_mask"].writes,   [0b1])
+        self.assertEqual(regs.d["analyzer_qualifier_value"].writes,  [0b1])
+        self.assertEqual(regs.d["analyzer_qualifier_enable"].writes, [1])
+        self.assertEqual(driver.get_transactions(), [
+            {"timestamp": 1, "beats": [{"last": 0, "data": 0x11}, {"last": 1, "data": 0x22}]},
+            {"timestamp": 7, "beats": [{"last": 1, "data": 0x33}]},
+        ])
+
+    def test_wishbone_transactions(self):
+        config_csv = self.write_sniffer_config()
+        mem_data = [
+            (0 << 22) | (0xaa << 6) | (3 << 2) | 0b11,  # Write.
+            (3 << 22) | (0x55 << 14) | (4 << 2) | 0b01, # Read.
+        ]
+        regs   = make_regs(mem_level=2, mem_data=mem_data, with_qualifier=True)
+        driver = LiteScopeAnalyzerDriver(regs, "analyzer", config_csv=config_csv)
+
+        driver.configure_group(1)
+        driver.configure_transactions()
+        driver.upload()
+
+        self.assertEqual(regs.d["analyzer_qualifier_mask"].writes[-1], 0b1)
+        self.assertEqual(driver.get_transactions(), [
+            {"timestamp": 0, "we": 1, "adr": 3, "dat_w": 0xaa, "dat_r": 0x00, "data": 0xaa},
+            {"timestamp": 3, "we": 0, "adr": 4, "dat_w": 0x00, "dat_r": 0x55, "data": 0x55},
+        ])
+
+    def test_transactions_require_sniffer(self):
+        driver, regs = self.make_driver()
+        with self.assertRaises(ValueError):
+            driver.configure_transactions()
+        with self.assertRaises(ValueError):
+            driver.get_transactions()
+
+    def test_read_storage_requires_wishbone_window(self):
+        driver, regs = self.make_driver(data_width=8, mem_level=4)
+        with self.assertRaises(ValueError):
+            driver.read_storage(0, 4)
+
     def test_upload_empty_raw_capture(self):
         driver, regs = self.make_driver(data_width=16, mem_level=0, mem_data=[0x12345678])
 
@@ -373,6 +1037,239 @@ class TestAnalyzerDriver(unittest.TestCase):
             (0x1234, 4, "fixed"),
         ])
 
+    def test_configure_delta(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        config_csv  = os.path.join(self.tmpdir.name, "analyzer.csv")
+        write_config(config_csv, data_width=4, storage_width=8, with_rle=True, rle_length=128,
+            with_delta=True)
+        regs   = make_regs(with_rle=True, with_delta=True)
+        driver = LiteScopeAnalyzerDriver(regs, "analyzer", config_csv=config_csv)
+
+        for mode in ["xor", "sub", None]:
+            driver.configure_delta(mode)
+        with self.assertRaises(ValueError):
+            driver.configure_delta("add")
+
+        self.assertEqual(regs.d["analyzer_delta_mode"].writes, [0, 1, 2, 0])
+        self.assertIsNone(driver.delta_enabled)
+
+    def test_configure_delta_requires_gateware_support(self):
+        driver, regs = self.make_driver(data_width=4, storage_width=8, with_rle=True)
+        with self.assertRaises(ValueError):
+            driver.configure_delta("sub")
+        driver.configure_delta(None)
+
+    def test_upload_decodes_delta_rle(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        config_csv  = os.path.join(self.tmpdir.name, "analyzer.csv")
+        write_config(config_csv, data_width=8, storage_width=9, with_rle=True, rle_length=256,
+            with_delta=True)
+        samples  = [0x07, 0x08, 0x10, 0x11, 0x12, 0x13, 0x14, 0x15, 0x16]
+        encoded  = encode_delta(samples, 3, "sub", 8) # Trigger sample at 2.
+        mem_data = encoded[:4] + encode_rle(encoded[4:], 8, 9, 255)
+        self.assertEqual(mem_data, [0x07, 0x08, 0x10, 0x11, 0x01, 0x100 | 4])
+        regs = make_regs(mem_level=len(mem_data), mem_data=mem_data, with_rle=True, with_delta=True)
+        regs.d["analyzer_storage_pre_trigger"] = FakeReg(2)
+        driver = LiteScopeAnalyzerDriver(regs, "analyzer", config_csv=config_csv)
+
+        driver.configure_rle(True)
+        driver.configure_delta("sub")
+
+        self.assertEqual(list(driver.upload()), samples)
+        self.assertEqual(driver.trigger_index(), 2)
+
+    def test_delta_rle_compression_benchmark(self):
+        # Compression ratio (samples per storage word) of RLE alone vs delta + RLE on representative
+        # 32-bit traces.
+        rng    = random.Random(0)
+        bursts = []
+        while len(bursts) < 1024:
+            base    = rng.randrange(2**20)*64
+            bursts += [base + 4*i for i in range(16)]
+        slow = []
+        for i in range(1024):
+            if i % 50 == 0:
+                value = rng.randrange(2**32)
+            slow.append(value)
+        traces = {
+            "counter"        : list(range(1024)),
+            "address bursts" : bursts[:1024],
+            "toggling bits"  : [(i & 1) | ((i//64) << 8) for i in range(1024)],
+            "slow bus"       : slow,
+        }
+        ratios = {}
+        for name, samples in traces.items():
+            for mode in [None, "xor", "sub"]:
+                # Trigger sample (0) and anchor sample (1) stored raw, then delta + RLE.
+                encoded = encode_delta(samples, 1, mode, 32)
+                words   = DumpData(33)
+                words.extend([encoded[0]] + encode_rle(encoded[1:], 32, 33, 255))
+                decoded = words.decode_rle(data_width=32)
+                if mode is not None:
+                    decoded = decoded.decode_delta(1, xor=(mode == "xor"))
+                self.assertTrue(list(decoded) == samples)
+                ratios[(name, mode)] = len(samples)/len(words)
+
+        self.assertEqual(ratios[("counter", None)], 1)
+        self.assertGreater(ratios[("counter", "sub")], 100)
+        self.assertGreater(ratios[("address bursts", "sub")], 4)
+        self.assertGreater(ratios[("toggling bits", "xor")], 10)
+        self.assertEqual(ratios[("toggling bits", "sub")], 1)
+        # Delta encoding doesn't help on held values (a change costs an extra word).
+        self.assertGreater(ratios[("slow bus", None)], ratios[("slow bus", "sub")])
+
+    def test_upload_uses_capture_metadata(self):
+        mem_data = [
+            0x00000003,
+            0x00000082,
+            0x0000000a,
+            0x00000081,
+        ]
+        driver, regs = self.make_driver(
+            data_width    = 4,
+            storage_width = 8,
+            with_rle      = True,
+            mem_level     = 4,
+            mem_data      = mem_data)
+        regs.d["analyzer_storage_pre_trigger"]       = FakeReg(2)
+        regs.d["analyzer_storage_cycles"]            = FakeReg(100)
+        regs.d["analyzer_storage_trigger_timestamp"] = FakeReg(2**40)
+        driver.build()
+
+        driver.configure_rle(True)
+        driver.run(offset=4, length=8)
+        data = driver.upload()
+
+        # Trigger word 2 (after 3 samples, not at offset) is the 4th sample.
+        self.assertEqual(list(data), [3, 3, 3, 10, 10])
+        self.assertEqual(data.trigger, 3)
+        self.assertEqual(data.cycles, 100)
+        self.assertEqual(data.trigger_timestamp, 2**40)
+        self.assertEqual(driver.trigger_index(), 3)
+
+    def test_configure_qualifier(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        config_csv  = os.path.join(self.tmpdir.name, "analyzer.csv")
+        write_config(config_csv, data_width=4, storage_width=12, qualifier_timestamp_width=8)
+        regs   = make_regs(with_qualifier=True)
+        driver = LiteScopeAnalyzerDriver(regs, "analyzer", config_csv=config_csv)
+        self.assertEqual(regs.d["analyzer_qualifier_enable"].writes, [0])
+        self.clear_writes(regs)
+
+        driver.configure_qualifier(cond={"flag": "1"})
+        driver.clear()
+
+        self.assertEqual(regs.d["analyzer_qualifier_mask"].writes,   [0x1])
+        self.assertEqual(regs.d["analyzer_qualifier_value"].writes,  [0x1])
+        self.assertEqual(regs.d["analyzer_qualifier_enable"].writes, [1, 0])
+
+    def test_configure_qualifier_rejects_unavailable_analyzer(self):
+        driver, regs = self.make_driver()
+        with self.assertRaises(ValueError):
+            driver.configure_qualifier(cond={"flag": "1"})
+        driver.configure_qualifier(enable=False)
+
+    def test_upload_decodes_qualifier_timestamps(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        config_csv  = os.path.join(self.tmpdir.name, "analyzer.csv")
+        write_config(config_csv, data_width=4, storage_width=12, qualifier_timestamp_width=8)
+        mem_data = [
+            (0x05 << 4) | 0x3, # First sample: delta is ignored.
+            (0x01 << 4) | 0x5,
+            (0x10 << 4) | 0x7,
+            (0xff << 4) | 0x1,
+        ]
+        regs   = make_regs(mem_level=4, mem_data=mem_data, with_qualifier=True)
+        driver = LiteScopeAnalyzerDriver(regs, "analyzer", config_csv=config_csv)
+
+        data = driver.upload()
+
+        self.assertEqual(data.width, 4)
+        self.assertEqual(list(data), [0x3, 0x5, 0x7, 0x1])
+        self.assertEqual(data.timestamps, [0, 1, 17, 272])
+
+        data = driver.upload(max_samples=2)
+        self.assertEqual(data.timestamps, [0, 1])
+
+    def test_upload_decodes_transitional_storage(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        config_csv  = os.path.join(self.tmpdir.name, "analyzer.csv")
+        write_config(config_csv, data_width=4, storage_width=12, qualifier_timestamp_width=8,
+            with_transitional=True)
+        mem_data = [
+            (0x00 << 4) | 0x3,
+            (0x03 << 4) | 0x5,
+            (0x01 << 4) | 0x7,
+            (0x02 << 4) | 0x1,
+        ]
+        regs   = make_regs(mem_level=4, mem_data=mem_data, with_qualifier=True, with_transitional=True)
+        driver = LiteScopeAnalyzerDriver(regs, "analyzer", config_csv=config_csv)
+        self.clear_writes(regs)
+
+        driver.configure_transitional(["state"])
+        data = driver.upload()
+
+        self.assertEqual(regs.d["analyzer_qualifier_change"].writes, [0xe])
+        self.assertEqual(regs.d["analyzer_qualifier_enable"].writes, [1])
+        self.assertEqual(data.width, 4)
+        self.assertEqual(list(data), [0x3, 0x3, 0x3, 0x5, 0x7, 0x7, 0x1])
+
+        regs.d["analyzer_storage_pre_trigger"] = FakeReg(2)
+        driver.build()
+        self.assertEqual(driver.trigger_index(), 4) # 3rd stored sample, after 3 + 1 samples.
+
+        driver.configure_transitional(enable=False)
+        self.assertEqual(list(driver.upload()), [0x3, 0x5, 0x7, 0x1])
+        self.assertEqual(regs.d["analyzer_qualifier_change"].writes, [0xe, 0])
+
+    def test_configure_transitional_rejects_unavailable_analyzer(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        config_csv  = os.path.join(self.tmpdir.name, "analyzer.csv")
+        write_config(config_csv, data_width=4, storage_width=12, qualifier_timestamp_width=8)
+        driver = LiteScopeAnalyzerDriver(make_regs(with_qualifier=True), "analyzer", config_csv=config_csv)
+        with self.assertRaises(ValueError):
+            driver.configure_transitional(["flag"])
+        driver.configure_transitional(enable=False)
+        self.assertFalse(driver.transitional_enabled)
+
+    def test_upload_splits_lanes(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        config_csv  = os.path.join(self.tmpdir.name, "analyzer.csv")
+        with open(config_csv, "w") as f:
+            f.write("config,None,data_width,4\n")
+            f.write("config,None,storage_width,16\n")
+            f.write("config,None,depth,16\n")
+            f.write("config,None,samplerate,100000000\n")
+            f.write("config,None,lanes,4\n")
+            f.write("signal,0,value,4\n")
+        regs = make_regs(mem_level=2, mem_data=[0x3210, 0x7654])
+        regs.d["analyzer_trigger_lane"] = FakeReg(2)
+        driver = LiteScopeAnalyzerDriver(regs, "analyzer", config_csv=config_csv)
+
+        data = driver.upload()
+
+        self.assertEqual(data.width, 4)
+        self.assertEqual(list(data), list(range(8)))
+        driver.offset = 1
+        self.assertEqual(driver.trigger_index(), 3) # Sample after the hit (lane 2 of word 0).
+        driver.offset = 0
+        self.assertEqual(driver.trigger_index(), 0)
+
+    def test_upload_unpacks_packed_samples(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        config_csv  = os.path.join(self.tmpdir.name, "analyzer.csv")
+        write_config(config_csv, data_width=8, storage_width=8, pack=4)
+        regs = make_regs(mem_level=2, mem_data=[0x03020100, 0x07060504])
+        regs.d["analyzer_packer_hit_position"] = FakeReg(2)
+        driver = LiteScopeAnalyzerDriver(regs, "analyzer", config_csv=config_csv)
+
+        data = driver.upload()
+
+        self.assertEqual(data.width, 8)
+        self.assertEqual(list(data), list(range(8)))
+        driver.offset = 1
+        self.assertEqual(driver.trigger_index(), 6) # Hit sample at position 2 of word 1.
+
     def test_upload_limits_decoded_rle_samples(self):
         mem_data = [
             0x00000003,
@@ -559,5 +1456,71 @@ class TestAnalyzerDriver(unittest.TestCase):
         ])
 
 
+def stream_packet(sequence, overflow, words):
+    return [(0x5c << 24) | sequence, overflow] + words
+
+
+class TestStreamReceiver(unittest.TestCase):
+    def make_receiver(self, **kwargs):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        config_csv  = os.path.join(self.tmpdir.name, "analyzer.csv")
+        write_config(config_csv, **kwargs)
+        return LiteScopeStreamReceiver(config_csv)
+
+    def tearDown(self):
+        if hasattr(self, "tmpdir"):
+            self.tmpdir.cleanup()
+
+    def test_reassembles_byte_chunks(self):
+        receiver = self.make_receiver(data_width=40, stream_packet_length=2)
+        samples  = [0xab00000000 + i for i in range(6)]
+        words    = []
+        for n in range(3):
+            words += stream_packet(n, 0, [w for s in samples[2*n:2*n + 2] for w in (s & 0xffffffff, s >> 32)])
+        raw = b"".join(w.to_bytes(4, "little") for w in words)
+
+        decoded = []
+        for i in range(0, len(raw), 7):
+            decoded += list(receiver.feed(raw[i:i + 7]))
+
+        self.assertEqual(decoded, samples)
+        self.assertEqual(list(receiver.data), samples)
+        self.assertEqual(receiver.lost, 0)
+
+    def test_tracks_lost_packets_overflow_and_resync(self):
+        receiver = self.make_receiver(data_width=8, stream_packet_length=2)
+
+        receiver.feed(stream_packet(0, 0, [1, 2]))
+        receiver.feed([0x12345678] + stream_packet(3, 5, [3, 4]))
+
+        self.assertEqual(list(receiver.data), [1, 2, 3, 4])
+        self.assertEqual(receiver.lost, 2)
+        self.assertEqual(receiver.overflow, 5)
+        self.assertEqual(receiver.resyncs, 1)
+
+    def test_decodes_rle_across_packets(self):
+        receiver = self.make_receiver(data_width=4, storage_width=8, with_rle=True, rle_length=128,
+            stream_packet_length=2)
+
+        receiver.feed(stream_packet(0, 0, [0x3, 0x5]))
+        receiver.feed(stream_packet(1, 0, [0x82, 0x9]))
+
+        self.assertEqual(list(receiver.data), [3, 5, 5, 5, 9])
+
+    def test_splits_lanes(self):
+        receiver = self.make_receiver(data_width=4, storage_width=8, lanes=2, stream_packet_length=2)
+
+        receiver.feed(stream_packet(0, 0, [0x10, 0x32]))
+
+        self.assertEqual(list(receiver.data), [0, 1, 2, 3])
+
+    def test_unpacks_packed_samples(self):
+        receiver = self.make_receiver(data_width=8, storage_width=8, pack=2, stream_packet_length=2)
+
+        receiver.feed(stream_packet(0, 0, [0x0100, 0x0302]))
+
+        self.assertEqual(list(receiver.data), [0, 1, 2, 3])
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -153,6 +153,30 @@ class TestDump(unittest.TestCase):
             if samples:
                 self.assertLessEqual(len(encoded), len(samples))
 
+    def test_dumpdata_decode_delta(self):
+        data = DumpData(8)
+        data.extend([0x10, 0x20, 0x01, 0xff, 0x02])
+
+        self.assertEqual(list(data.decode_delta(start=1)), [0x10, 0x20, 0x21, 0x20, 0x22])
+        self.assertEqual(list(data.decode_delta(start=1, xor=True)), [0x10, 0x20, 0x21, 0xde, 0xdc])
+        self.assertEqual(list(data.decode_delta(start=4)), list(data))
+        self.assertEqual(data.decode_delta(start=0).width, 8)
+
+    def test_dumpdata_decode_and_expand_timestamps(self):
+        data = DumpData(12)
+        data.extend([
+            (0x07 << 4) | 0x3, # First delta is ignored.
+            (0x02 << 4) | 0x5,
+            (0x01 << 4) | 0x3,
+        ])
+
+        decoded = data.decode_timestamps(data_width=4)
+
+        self.assertEqual(decoded.width, 4)
+        self.assertEqual(list(decoded), [0x3, 0x5, 0x3])
+        self.assertEqual(decoded.timestamps, [0, 2, 3])
+        self.assertEqual(list(decoded.expand_timestamps()), [0x3, 0x3, 0x5, 0x3])
+
     def test_add_from_layout(self):
         data = DumpData(8)
         data.extend([0b10110001, 0b01001110])